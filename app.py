@@ -1,19 +1,149 @@
 import streamlit as st
-import pandas as pd
-from io import BytesIO
+
+import instrumentation
 
 from inputs import validate_user_inputs
-from assumption_generator import generate_assumptions
-from case_constructor import build_cases
-from lbo_engine import run_lbo_case
-from sensitivity_analysis import sensitivity_analysis
+from assumption_cache import get_default_cache
+from assumption_providers import get_provider
+from case_constructor import CASE_ORDER, build_case_batch, build_cases
+from incremental_engine import IncrementalEngine
+from lbo_engine import project_exit_curve, project_schedules
+from goal_seek import METRICS, SEARCH_BOUNDS, GoalSeeker
+from global_sensitivity import driver_ranges, sobol_indices, tornado
+from sensitivity_analysis import DEFAULT_STEPS, sensitivity_analysis, sensitivity_values, two_way_sensitivity
+from monte_carlo import run_monte_carlo
+from scheduler import default_workers
+from results_store import get_default_store
 
 from exporter import convert_to_excel
 
+
+# ------------------------
+# Cached pipeline stages
+# ------------------------
+# Streamlit reruns this script on every interaction. Each stage is
+# cached on its own inputs only, so e.g. changing the hold period
+# re-runs the engine but never the Gemini call.
+
+@st.cache_resource
+def get_assumption_cache():
+    return get_default_cache()
+
+
+@st.cache_data(show_spinner=False)
+def cached_validation_error(user_inputs):
+    try:
+        validate_user_inputs(user_inputs)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+@st.cache_resource
+def get_assumption_provider(source):
+    return get_provider(source, cache=get_assumption_cache())
+
+
+@st.cache_data(show_spinner=False)
+def cached_assumptions(industry, geography, revenue, ebitda, source="llm"):
+    # Only the fields used in the prompt are part of the cache key
+    context = {"industry": industry, "geography": geography, "revenue": revenue, "ebitda": ebitda}
+    return get_assumption_provider(source).get(context)
+
+
+@st.cache_data(show_spinner=False)
+def cached_cases(ai_assumptions):
+    return build_cases(ai_assumptions)
+
+
+@st.cache_resource
+def get_engine():
+    # Layered cache: a financing-only change reuses the operating path
+    return IncrementalEngine()
+
+
+@st.cache_resource
+def get_results_store():
+    return get_default_store()
+
+
+@st.cache_resource
+def get_seeker():
+    # Keeps solved targets and warm starts across reruns
+    return GoalSeeker()
+
+
+def cached_case_result(user_inputs, case_assumptions):
+    return get_engine().run(user_inputs, case_assumptions)
+
+
+@st.cache_data(show_spinner=False)
+def cached_schedules(user_inputs, ai_assumptions):
+    # All three cases in one vectorized pass, as columns (case i = CASE_ORDER[i])
+    return project_schedules(user_inputs, build_case_batch(ai_assumptions))
+
+
+def cached_sensitivities(user_inputs, base_case):
+    return sensitivity_analysis(user_inputs, base_case, engine=get_engine())
+
+
+@st.cache_data(show_spinner=False)
+def cached_exit_curve(user_inputs, ai_assumptions, max_years):
+    # Every exit year of all three cases from one projection pass
+    curve = project_exit_curve(user_inputs, build_case_batch(ai_assumptions), max_years)
+    return {name: curve[name] for name in ("exit_year", "irr", "money_multiple", "best_year")}
+
+
+@st.cache_data(show_spinner=False)
+def cached_two_way(user_inputs, base_case, row_variable, col_variable, points):
+    return two_way_sensitivity(
+        user_inputs, base_case, row_variable, col_variable, {"n": points}, {"n": points},
+        workers=default_workers(),
+    )
+
+
+@st.cache_data(show_spinner=False)
+def cached_global_sensitivity(user_inputs, base_case, ai_assumptions):
+    # Case drivers span the AI ranges; deal inputs move around their base
+    ranges = driver_ranges(user_inputs, base_case, ai_assumptions)
+    return tornado(user_inputs, base_case, ranges), sobol_indices(user_inputs, base_case, ranges)
+
+
+@st.cache_data(show_spinner=False)
+def cached_monte_carlo(user_inputs, ai_assumptions, n_paths, hurdle_irr):
+    # Fixed seed so a cached result and a recomputed one agree; chunks
+    # beyond the first go to the shared process pool
+    return run_monte_carlo(
+        user_inputs, ai_assumptions, n_paths=n_paths, hurdle_irr=hurdle_irr, seed=0, workers=default_workers()
+    )
+
+
+@st.cache_data(show_spinner=False)
+def cached_excel(user_inputs, ai_assumptions, all_results, sensitivities, monte_carlo):
+    return convert_to_excel(user_inputs, ai_assumptions, all_results, sensitivities, monte_carlo)
+
+
+ASSUMPTION_SOURCES = {"llm": "Gemini", "benchmark": "Benchmark table", "hybrid": "Hybrid"}
+
+
 st.set_page_config(page_title="AI-assisted LBO Model", layout="wide")
 
 st.title("AI-assisted LBO Model")
 
+with st.sidebar:
+    show_performance = st.checkbox("Performance panel", value=False, help="Show per-stage timings for this run.")
+    track_memory = st.checkbox("Track peak memory", value=False, disabled=not show_performance, help="Uses tracemalloc; slows the run.")
+    record_profile = st.checkbox("Record cProfile", value=False, disabled=not show_performance, help="Function-level profile of this run.")
+
+# Each session records into its own profiler, so concurrent sessions
+# never reset or switch off each other's timings
+profiler = st.session_state.setdefault("profiler", instrumentation.Profiler())
+profiler.reset()
+profiler.enabled = show_performance
+profiler.track_memory = show_performance and track_memory
+instrumentation.activate(profiler)
+profile_dump = instrumentation.ProfileDump().start() if show_performance and record_profile else None
+
 # SECTION 1: USER INPUTS
 st.header("1. Deal Inputs")
 st.markdown("Provide the financial and contextual details for the LBO model below.")
@@ -36,13 +166,38 @@ with st.form("deal_inputs"):
         hold_period = st.number_input("Hold Period (Years)", min_value=1, value=5, help="Number of years the investment is held.")
         industry = st.text_input("Industry", value="Healthcare", help="Company's primary industry.")
         geography = st.text_input("Geography", value="India", help="Primary operating region.")
+        assumption_source = st.selectbox(
+            "Assumption Source",
+            list(ASSUMPTION_SOURCES),
+            format_func=ASSUMPTION_SOURCES.get,
+            help="Benchmark answers instantly from a local industry/geography table; Hybrid asks Gemini only when the table has no match.",
+        )
+
+    with st.expander("Two-Way Sensitivity"):
+        grid_variables = list(DEFAULT_STEPS)
+        tw_col1, tw_col2, tw_col3 = st.columns(3)
+        with tw_col1:
+            row_variable = st.selectbox("Rows", grid_variables, index=grid_variables.index("entry_multiple"))
+        with tw_col2:
+            col_variable = st.selectbox("Columns", grid_variables, index=grid_variables.index("exit_multiple"))
+        with tw_col3:
+            grid_points = st.number_input("Points per side", min_value=1, max_value=50, value=4, help="Grid steps either side of the base case.")
+
+    with st.expander("Monte Carlo Simulation (optional)"):
+        mc_col1, mc_col2, mc_col3 = st.columns(3)
+        with mc_col1:
+            run_mc = st.checkbox("Run Monte Carlo", value=False, help="Sample assumptions from the AI ranges instead of using midpoints.")
+        with mc_col2:
+            mc_paths = st.number_input("Paths", min_value=1000, max_value=1_000_000, value=100_000, step=10_000, help="Number of simulated scenarios.")
+        with mc_col3:
+            hurdle_irr = st.number_input("Hurdle IRR (%)", value=20.0, help="Target IRR used for the probability of success.")
 
     submitted = st.form_submit_button("Generate LBO")
 
 
 # RUN MODEL
 if submitted:
-    user_inputs = {
+    st.session_state["user_inputs"] = {
         "revenue": revenue,
         "ebitda": ebitda,
         "depreciation_amortization": da,
@@ -54,13 +209,28 @@ if submitted:
         "industry": industry,
         "geography": geography,
     }
+    st.session_state["options"] = {
+        "row_variable": row_variable,
+        "col_variable": col_variable,
+        "grid_points": int(grid_points),
+        "assumption_source": assumption_source,
+        "run_mc": run_mc,
+        "mc_paths": int(mc_paths),
+        "hurdle_irr": hurdle_irr,
+    }
+    st.session_state["excel_requested"] = False
+    st.session_state["stored_run"] = None
+
+# Results stay on screen across reruns (e.g. the download click)
+if "user_inputs" in st.session_state:
+    user_inputs = st.session_state["user_inputs"]
+    options = st.session_state["options"]
 
     # VALIDATE INPUTS
     with st.spinner("Validating inputs..."):
-        try:
-            validate_user_inputs(user_inputs)
-        except ValueError as e:
-            st.error(f"Input Error: {str(e)}")
+        error = cached_validation_error(user_inputs)
+        if error:
+            st.error(f"Input Error: {error}")
             st.stop()
 
     st.success("Inputs validated successfully.")
@@ -69,7 +239,13 @@ if submitted:
     st.header("2. AI-Generated Assumptions")
 
     with st.spinner("Generating AI assumptions..."):
-        ai_assumptions = generate_assumptions(user_inputs)
+        ai_assumptions = cached_assumptions(
+            user_inputs["industry"],
+            user_inputs["geography"],
+            user_inputs["revenue"],
+            user_inputs["ebitda"],
+            options.get("assumption_source", "llm"),
+        )
 
     st.subheader("Assumption Ranges by Case")
     cols = st.columns(3)
@@ -89,17 +265,21 @@ if submitted:
 
     # CASE CONSTRUCTION
     with st.spinner("Building cases..."):
-        cases = build_cases(ai_assumptions)
+        cases = cached_cases(ai_assumptions)
 
     # SECTION 3: LBO RESULTS
     st.header("3. LBO Results")
     st.markdown("Key metrics for each scenario based on the LBO engine.")
 
+    schedules = cached_schedules(user_inputs, ai_assumptions)
+
     all_results = {} # To store for Excel export
     cols = st.columns(3)
     for idx, case_name in enumerate(["downside", "base", "upside"]):
         with st.spinner(f"Running {case_name.capitalize()} case..."):
-            results = run_lbo_case(user_inputs, cases[case_name])
+            results = dict(cached_case_result(user_inputs, cases[case_name]))
+            # Column views into the shared schedule; the exporter reads them directly
+            results["schedule"] = schedules.case(CASE_ORDER.index(case_name))
             all_results[case_name] = results
         with cols[idx]:
             st.subheader(case_name.capitalize())
@@ -109,29 +289,229 @@ if submitted:
                 st.write(f"Entry Equity: {results['entry_equity']:.2f}")
                 st.write(f"Exit Equity: {results['exit_equity']:.2f}")
 
+    st.subheader("Projections")
+    for tab, case_name in zip(st.tabs([name.capitalize() for name in CASE_ORDER]), CASE_ORDER):
+        with tab:
+            frame = schedules.to_frame(CASE_ORDER.index(case_name))
+            st.line_chart(frame[["revenue", "ebitda", "fcf", "debt"]])
+            with st.expander("Yearly schedule"):
+                st.dataframe(frame, use_container_width=True)
+
+    st.subheader("Optimal Exit Timing")
+    hold_years = int(user_inputs["hold_period_years"])
+    # Long holds extend the slider so its default always fits
+    max_exit = st.slider(
+        "Latest exit year", min_value=1, max_value=max(15, hold_years), value=max(7, hold_years),
+        help="IRR and money multiple if the investment were sold at the end of each year.",
+    )
+    curve = cached_exit_curve(user_inputs, ai_assumptions, max_exit)
+    exit_cols = st.columns(3)
+    for idx, case_name in enumerate(CASE_ORDER):
+        best = int(curve["best_year"][idx])
+        exit_cols[idx].metric(
+            f"{case_name.capitalize()}: best exit year",
+            best,
+            f"{curve['irr'][idx][best - 1] * 100:.2f}% IRR",
+            delta_color="off",
+        )
+    st.line_chart(
+        {
+            "Exit year": curve["exit_year"],
+            **{f"{name.capitalize()} IRR (%)": curve["irr"][idx] * 100 for idx, name in enumerate(CASE_ORDER)},
+        },
+        x="Exit year",
+    )
+
     # SECTION 4: SENSITIVITY ANALYSIS
     st.header("4. Sensitivity Analysis (Base Case)")
-    st.markdown("One-way sensitivities showing IRR impact from varying key assumptions.")
+    st.markdown("One-way and two-way sensitivities showing IRR impact from varying key assumptions.")
 
     with st.spinner("Running sensitivity analysis..."):
-        sensitivities = sensitivity_analysis(user_inputs, cases["base"])
+        sensitivities = cached_sensitivities(user_inputs, cases["base"])
 
     for variable, table in sensitivities.items():
         st.subheader(variable.replace("_", " ").title())
         sorted_table = sorted(table.items(), key=lambda x: x[0])
         st.table([{"Assumption": k, "IRR (%)": v} for k, v in sorted_table])
 
-    
+    row_variable, col_variable = options["row_variable"], options["col_variable"]
+    if row_variable != col_variable:
+        st.subheader(f"IRR (%): {row_variable.replace('_', ' ').title()} × {col_variable.replace('_', ' ').title()}")
+        with st.spinner("Running two-way sensitivity..."):
+            grid = cached_two_way(
+                user_inputs, cases["base"], row_variable, col_variable, options["grid_points"]
+            )
+        st.dataframe(grid, use_container_width=True)
+        export_sensitivities = {**sensitivities, f"{row_variable} x {col_variable}": grid}
+    else:
+        export_sensitivities = sensitivities
+
+    st.subheader("Global Sensitivity")
+    st.markdown("All drivers varied together across their ranges; bars show each driver's IRR swing on its own.")
+    with st.spinner("Running global sensitivity..."):
+        swings, sobol = cached_global_sensitivity(user_inputs, cases["base"], ai_assumptions)
+
+    gl_col1, gl_col2 = st.columns(2)
+    with gl_col1:
+        # Rank prefixes keep the widest bar on top of the chart
+        st.bar_chart(
+            {
+                "Driver": [f"{rank}. {bar['driver'].replace('_', ' ')}" for rank, bar in enumerate(swings["bars"], 1)],
+                "Low end": [bar["metric_low"] - swings["base"] for bar in swings["bars"]],
+                "High end": [bar["metric_high"] - swings["base"] for bar in swings["bars"]],
+            },
+            x="Driver",
+            y=["Low end", "High end"],
+            y_label=f"IRR change vs base ({swings['base']:.2f}%)",
+            horizontal=True,
+        )
+    with gl_col2:
+        st.table([
+            {
+                "Driver": row["driver"].replace("_", " ").title(),
+                "Range": f"{row['low']:,.4g} – {row['high']:,.4g}",
+                "First order": round(row["first_order"], 3),
+                "Total order": round(row["total_order"], 3),
+            }
+            for row in sobol.ranking()
+        ])
+    st.caption(
+        f"Sobol indices of IRR from {sobol.evaluations:,} evaluations ({sobol.method} points, N = {sobol.n_base:,}); "
+        f"{'converged' if sobol.converged else 'not converged'}, {sobol.interactions:.1%} of variance from interactions."
+    )
+
+    # SECTION 5: GOAL SEEK
+    st.header("5. Goal Seek (Base Case)")
+    st.markdown("Solve for the value of one input that hits a target return, with everything else at the base case.")
+
+    seek_variables = list(SEARCH_BOUNDS)
+    gs_col1, gs_col2, gs_col3 = st.columns(3)
+    with gs_col1:
+        seek_variable = st.selectbox("Solve for", seek_variables, index=seek_variables.index("entry_multiple"))
+    with gs_col2:
+        seek_metric = st.selectbox("Target metric", METRICS, format_func=lambda m: "IRR (%)" if m == "irr" else "Money Multiple (x)")
+    with gs_col3:
+        seek_target = st.number_input("Target", value=20.0 if seek_metric == "irr" else 2.5, step=0.5)
+
+    seek = get_seeker().seek(user_inputs, cases["base"], seek_variable, seek_target, seek_metric)
+    if seek.status == "solved":
+        st.metric(seek_variable.replace("_", " ").title(), f"{seek.value:,.4f}")
+    else:
+        st.warning(
+            f"Target not reachable within {SEARCH_BOUNDS[seek_variable]}; "
+            f"the closest {seek_metric.replace('_', ' ')} is {seek.achieved:,.2f}."
+        )
+
+    with st.expander("Frontier"):
+        fr_col1, fr_col2 = st.columns(2)
+        with fr_col1:
+            frontier_x = st.selectbox("Across", seek_variables, index=seek_variables.index("entry_multiple"), key="frontier_x")
+        with fr_col2:
+            frontier_y = st.selectbox("Solve", seek_variables, index=seek_variables.index("debt_percentage"), key="frontier_y")
+        if frontier_x != frontier_y:
+            x_values = sensitivity_values(user_inputs, cases["base"], frontier_x, {"n": 10})
+            frontier = get_seeker().frontier(
+                user_inputs, cases["base"], frontier_x, x_values, frontier_y, seek_target, seek_metric
+            )
+            st.caption(f"{frontier_y.replace('_', ' ').title()} that gives {seek_target} {seek_metric.replace('_', ' ')} at each {frontier_x.replace('_', ' ')} (gaps: out of reach).")
+            st.line_chart({frontier_x: frontier[frontier_x], frontier_y: frontier[frontier_y]}, x=frontier_x, y=frontier_y)
+
+    # SECTION 6: MONTE CARLO (OPTIONAL)
+    mc_results = None
+    if options["run_mc"]:
+        hurdle_irr = options["hurdle_irr"]
+        st.header("6. Monte Carlo Simulation (Base Case Ranges)")
+        st.markdown("IRR and money multiple distribution from sampling the AI assumption ranges.")
+
+        with st.spinner(f"Simulating {options['mc_paths']:,} paths..."):
+            mc_results = cached_monte_carlo(user_inputs, ai_assumptions, options["mc_paths"], hurdle_irr)
+
+        cols = st.columns(3)
+        cols[0].metric("Median IRR (%)", f"{mc_results['irr']['percentiles'][50]}%")
+        cols[1].metric("Median Money Multiple", f"{mc_results['money_multiple']['percentiles'][50]}x")
+        cols[2].metric(f"P(IRR ≥ {hurdle_irr}%)", f"{mc_results['prob_irr_above_hurdle']:.1%}")
+
+        st.table([
+            {
+                "Percentile": f"P{p}",
+                "IRR (%)": mc_results["irr"]["percentiles"][p],
+                "Money Multiple (x)": mc_results["money_multiple"]["percentiles"][p],
+            }
+            for p in mc_results["irr"]["percentiles"]
+        ])
+
+    # Each submitted run is recorded once, for the Scenario Comparison page
+    if st.session_state.get("stored_run") is None:
+        store = get_results_store()
+        # The grid and Monte Carlo settings are part of the run's identity
+        run_options = {
+            "two_way": (
+                [row_variable, col_variable, options["grid_points"]] if row_variable != col_variable else None
+            ),
+            "monte_carlo": [options["mc_paths"], options["hurdle_irr"]] if options["run_mc"] else None,
+        }
+        key = store.record(
+            user_inputs,
+            ai_assumptions,
+            {name: {k: v for k, v in results.items() if k != "schedule"} for name, results in all_results.items()},
+            export_sensitivities,
+            mc_results,
+            options=run_options,
+        )
+        st.session_state["stored_run"] = store.get(key)
+    stored_run = st.session_state["stored_run"]
+    st.caption(
+        f"Run {stored_run['key'][:12]} saved to the results store"
+        + (f" (identical to {stored_run['hits']} earlier run(s))." if stored_run["hits"] else ".")
+    )
+
+    st.divider()
+    st.header("7. Export Model")
+
+    # The workbook is only built once it is asked for
+    if st.button("Prepare Excel file"):
+        st.session_state["excel_requested"] = True
+
+    if st.session_state.get("excel_requested"):
+        with st.spinner("Preparing Excel file..."):
+            excel_data = cached_excel(user_inputs, ai_assumptions, all_results, export_sensitivities, mc_results)
+
+        st.download_button(
+            label="📥 Download Full LBO Model (Excel)",
+            data=excel_data,
+            file_name=f"LBO_Model_{user_inputs['industry']}_{user_inputs['geography']}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            help="Click to download all assumptions and results in a formatted Excel file."
+        )
+
+
+# PERFORMANCE PANEL (OPTIONAL)
+if show_performance:
+    if profile_dump is not None:
+        profile_dump.stop()
+
     st.divider()
-    st.header("5. Export Model")
-    
-    with st.spinner("Preparing Excel file..."):
-        excel_data = convert_to_excel(user_inputs, ai_assumptions, all_results)
-        
-    st.download_button(
-        label="📥 Download Full LBO Model (Excel)",
-        data=excel_data,
-        file_name=f"LBO_Model_{industry}_{geography}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        help="Click to download all assumptions and results in a formatted Excel file."
-    )
\ No newline at end of file
+    st.header("Performance")
+    st.markdown("Stages that were served from the Streamlit cache on this rerun do not appear.")
+
+    report = profiler.report()
+    st.table([
+        {
+            "Stage": name,
+            "Calls": entry["calls"],
+            "Total (ms)": round(entry["total_s"] * 1e3, 2),
+            "Mean (ms)": round(entry["mean_s"] * 1e3, 3),
+            "Max (ms)": round(entry["max_s"] * 1e3, 2),
+            "Peak Memory (MB)": (
+                round(entry["peak_memory_bytes"] / 2**20, 2)
+                if entry["peak_memory_bytes"] is not None else None
+            ),
+        }
+        for name, entry in report["stages"].items()
+    ])
+    if report["counters"]:
+        st.table([{"Counter": name, "Count": n} for name, n in report["counters"].items()])
+
+    if profile_dump is not None:
+        with st.expander("cProfile (top 25 by cumulative time)"):
+            st.code(profile_dump.text())
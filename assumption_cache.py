@@ -0,0 +1,248 @@
+"""
+
+Content-addressed cache for AI assumption responses.
+
+Entries are keyed on the normalized prompt, the model name and a hash
+of the response schema, so an identical deal context never triggers a
+second Gemini call. A small in-process LRU sits in front of an on-disk
+SQLite store with TTL and size-based eviction.
+
+
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import settings
+from instrumentation import count
+
+
+DEFAULT_CACHE_PATH = os.path.join(".lbo_cache", "assumptions.sqlite")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+
+def normalize_prompt(contents: str) -> str:
+    """
+    Case-folds and collapses whitespace so cosmetic differences in the
+    prompt (e.g. "Healthcare" vs "healthcare ") share a cache entry.
+    """
+    return re.sub(r"\s+", " ", contents).strip().casefold()
+
+
+def schema_hash(schema: Dict) -> str:
+    """
+    Stable hash of a JSON schema.
+    """
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def cache_key(contents: str, model: str, schema: Dict, system_instruction: str = "") -> str:
+    """
+    Builds the content-addressed key for one assumption request.
+    """
+
+    payload = json.dumps(
+        {
+            "prompt": normalize_prompt(contents),
+            "model": model,
+            "schema": schema_hash(schema),
+            "system": normalize_prompt(system_instruction),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AssumptionCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of validated assumption dicts.
+
+    ``path=None`` keeps everything in memory. ``ttl_seconds=None``
+    disables expiry. Counters are available through ``stats()``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS assumptions ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_assumptions_accessed ON assumptions (accessed_at)"
+            )
+            self._db.commit()
+
+    # ------------------------
+    # Public API
+    # ------------------------
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns a copy of the cached assumptions, or None on a miss.
+        """
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if self._expired(created_at, now):
+                    del self._memory[key]
+                    self._delete_disk(key)
+                    self._counters["expired"] += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    count("assumption_cache.memory_hit")
+                    return copy.deepcopy(value)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM assumptions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if self._expired(row[1], now):
+                        self._delete_disk(key)
+                        self._counters["expired"] += 1
+                    else:
+                        self._db.execute(
+                            "UPDATE assumptions SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self._counters["disk_hits"] += 1
+                        count("assumption_cache.disk_hit")
+                        return copy.deepcopy(value)
+
+            self._counters["misses"] += 1
+            count("assumption_cache.miss")
+            return None
+
+    def set(self, key: str, value: Dict) -> None:
+        """
+        Stores assumptions in both tiers, evicting the least recently
+        used entries when a tier is full.
+        """
+
+        now = time.time()
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO assumptions (key, value, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                rows = self._db.execute("SELECT COUNT(*) FROM assumptions").fetchone()[0]
+                overflow = rows - self.max_disk_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM assumptions WHERE key IN ("
+                        " SELECT key FROM assumptions ORDER BY accessed_at LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._counters["evictions"] += overflow
+                self._db.commit()
+            self._counters["writes"] += 1
+
+    def clear(self) -> None:
+        """
+        Drops every entry from both tiers.
+        """
+
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM assumptions")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """
+        Hit/miss counters plus current tier sizes.
+        """
+
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = (
+                self._db.execute("SELECT COUNT(*) FROM assumptions").fetchone()[0]
+                if self._db is not None else 0
+            )
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ------------------------
+    # Internals
+    # ------------------------
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: Dict, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete_disk(self, key: str) -> None:
+        if self._db is not None:
+            self._db.execute("DELETE FROM assumptions WHERE key = ?", (key,))
+            self._db.commit()
+
+
+_default_cache = None
+
+
+def get_default_cache() -> AssumptionCache:
+    """
+    Process-wide cache stored at $LBO_ASSUMPTION_CACHE (or .lbo_cache/).
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AssumptionCache(settings.get("LBO_ASSUMPTION_CACHE", DEFAULT_CACHE_PATH))
+    return _default_cache
@@ -7,15 +7,19 @@ Uses Gemini to generate STRUCTURED assumption ranges
 """
 
 
+import asyncio
+import copy
 import json
-from typing import Dict
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
 
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import settings
+from assumption_cache import AssumptionCache, cache_key
+from instrumentation import count, stage, timed
+from validation import compile_assumption_schema
 
 # Define the JSON schema for structured output
 ASSUMPTION_SCHEMA = {
@@ -77,32 +81,104 @@ ASSUMPTION_SCHEMA = {
 }
 
 
-def generate_assumptions(user_inputs: Dict) -> Dict:
+# Shape, types, enums, low <= high ranges and the margin sign convention
+ASSUMPTION_RULES = compile_assumption_schema(ASSUMPTION_SCHEMA)
+
+
+MODEL_NAME = "gemini-2.5-flash"
+SYSTEM_INSTRUCTION = "You are a private equity investment analyst."
+
+
+@timed("assumptions.generate_assumptions")
+def generate_assumptions(
+    user_inputs: Dict,
+    client=None,
+    cache: Optional[AssumptionCache] = None
+) -> Dict:
     """
     Calls Gemini and returns structured assumption ranges.
+
+    Pass a ``cache`` to reuse responses for identical deal contexts, and
+    a ``client`` (e.g. StubClient) to run without network access.
     """
 
-    system_instruction = "You are a private equity investment analyst."
     contents = build_contents(user_inputs)
 
-    client = genai.Client()
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=contents,
-        config=types.GenerateContentConfig(
-            system_instruction=system_instruction,
-            response_mime_type="application/json",
-            response_schema=ASSUMPTION_SCHEMA
+    key = None
+    if cache is not None:
+        key = cache_key(contents, MODEL_NAME, ASSUMPTION_SCHEMA, SYSTEM_INSTRUCTION)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    client = client or get_client()
+    with stage("assumptions.llm_call"):
+        response = client.models.generate_content(
+            model=MODEL_NAME,
+            contents=contents,
+            config=generation_config()
         )
-    )
+
+    assumptions = parse_response(response)
+    validate_assumptions(assumptions)
+
+    if cache is not None:
+        cache.set(key, assumptions)
+    return assumptions
+
+
+def generation_config() -> Dict:
+    """
+    Structured-output config shared by every Gemini request.
+
+    The dict form of GenerateContentConfig: the SDK validates it the
+    same way, and building it does not import google.genai.types.
+    """
+
+    return {
+        "system_instruction": SYSTEM_INSTRUCTION,
+        "response_mime_type": "application/json",
+        "response_schema": ASSUMPTION_SCHEMA,
+    }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared genai.Client, created (and google.genai imported) on first use.
+
+    The client keeps one HTTP connection pool, so reusing it also saves
+    a TLS handshake per request.
+    """
+
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                settings.load_environment()
+                from google import genai
+                _client = genai.Client()
+    return _client
+
+
+def parse_response(response) -> Dict:
+    """
+    Extracts the assumptions dict from a generate_content response.
+    """
 
     try:
         assumptions = response.parsed
     except AttributeError:
+        assumptions = None
+
+    if assumptions is None:
         # Fallback if parsed not available; parse text as JSON
         assumptions = json.loads(response.text)
 
-    validate_assumptions(assumptions)
     return assumptions
 
 
@@ -130,17 +206,217 @@ Rules:
 
 def validate_assumptions(assumptions: Dict) -> None:
     """
-    Basic sanity checks on AI output.
+    Checks AI output against ASSUMPTION_SCHEMA and its stated
+    conventions; the ValueError lists every problem found.
     """
 
-    required_keys = [
-        "entry_multiple",
-        "revenue_growth",
-        "exit_multiple",
-        "margin_change_bps",
-        "confidence"
-    ]
+    errors = ASSUMPTION_RULES(assumptions)
+    if errors:
+        raise ValueError("; ".join(errors))
+
+
+# ------------------------
+# Concurrent generation
+# ------------------------
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    True for errors worth retrying: rate limits, server errors, timeouts
+    and dropped connections.
+    """
+
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS_CODES
+
+    # google-genai's httpx transport errors (ConnectError, ReadTimeout,
+    # RemoteProtocolError, ...) are not builtin ConnectionErrors. One can
+    # only be raised once httpx is loaded, so this never imports it.
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return not isinstance(error, httpx.UnsupportedProtocol)
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+async def _call_model(client, contents: str):
+    """
+    Uses the client's native async API when present, else a worker thread.
+    """
+
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        return await aio.models.generate_content(
+            model=MODEL_NAME, contents=contents, config=generation_config()
+        )
+    return await asyncio.to_thread(
+        client.models.generate_content,
+        model=MODEL_NAME, contents=contents, config=generation_config()
+    )
+
+
+async def generate_assumptions_many(
+    list_of_inputs: List[Dict],
+    client=None,
+    cache: Optional[AssumptionCache] = None,
+    max_concurrency: int = 8,
+    max_retries: int = 3,
+    base_delay: float = 0.5,
+    max_delay: float = 8.0,
+    return_exceptions: bool = False
+) -> List:
+    """
+    Generates assumptions for many deals concurrently over one client.
+
+    At most ``max_concurrency`` requests are in flight. Transient errors
+    are retried up to ``max_retries`` times with full-jitter exponential
+    backoff. Deals with an identical context share a single request.
+    Results are validated and come back in input order. With
+    ``return_exceptions`` a failed deal yields its exception instead of
+    failing the whole batch.
+    """
+
+    client = client or get_client()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    in_flight = {}
+
+    async def fetch(contents: str, key: str) -> Dict:
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    with stage("assumptions.llm_call"):
+                        response = await _call_model(client, contents)
+                break
+            except Exception as error:
+                if attempt >= max_retries or not is_transient_error(error):
+                    raise
+                count("assumptions.llm_retry")
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                attempt += 1
+                await asyncio.sleep(delay)
+
+        assumptions = parse_response(response)
+        validate_assumptions(assumptions)
+        if cache is not None:
+            cache.set(key, assumptions)
+        return assumptions
+
+    tasks = []
+    for user_inputs in list_of_inputs:
+        contents = build_contents(user_inputs)
+        key = cache_key(contents, MODEL_NAME, ASSUMPTION_SCHEMA, SYSTEM_INSTRUCTION)
+        if key not in in_flight:
+            in_flight[key] = asyncio.ensure_future(fetch(contents, key))
+        tasks.append(in_flight[key])
+
+    results = await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    # Duplicated contexts share one result object; hand out independent copies
+    return [r if isinstance(r, BaseException) else copy.deepcopy(r) for r in results]
+
+
+# ------------------------
+# Offline client
+# ------------------------
+
+STUB_ASSUMPTIONS = {
+    "entry_multiple": {"downside": [8.0, 9.0], "base": [9.0, 11.0], "upside": [11.0, 12.5]},
+    "revenue_growth": {"downside": [2.0, 4.0], "base": [5.0, 8.0], "upside": [8.0, 12.0]},
+    "exit_multiple": {"downside": [7.0, 8.0], "base": [8.0, 10.0], "upside": [10.0, 11.5]},
+    "margin_change_bps": {"downside": -50, "base": 0, "upside": 75},
+    "confidence": "Medium"
+}
+
+
+class StubResponse:
+    """
+    Minimal stand-in for a generate_content response.
+    """
+
+    def __init__(self, assumptions: Dict):
+        self.parsed = assumptions
+        self.text = json.dumps(assumptions)
+
+
+class StubTransientError(Exception):
+    """
+    Simulated retryable API failure (HTTP 503).
+    """
+
+    code = 503
+
+
+class _StubModels:
+    def __init__(self, client: "StubClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str, config=None) -> StubResponse:
+        client = self._client
+        client.calls += 1
+        if client.latency:
+            time.sleep(client.latency)
+        return client.respond(contents)
+
+
+class _StubAsyncModels:
+    def __init__(self, client: "StubClient"):
+        self._client = client
+
+    async def generate_content(self, model: str, contents: str, config=None) -> StubResponse:
+        client = self._client
+        client.calls += 1
+        client.in_flight += 1
+        client.peak_in_flight = max(client.peak_in_flight, client.in_flight)
+        try:
+            if client.latency:
+                await asyncio.sleep(client.latency)
+            return client.respond(contents)
+        finally:
+            client.in_flight -= 1
+
+
+class _StubAio:
+    def __init__(self, client: "StubClient"):
+        self.models = _StubAsyncModels(client)
+
+
+class StubClient:
+    """
+    Offline replacement for genai.Client.
+
+    ``responses`` is either a fixed assumptions dict or a callable that
+    receives the prompt and returns one. ``latency`` (seconds) simulates
+    the round-trip and ``transient_failures`` makes the first N requests
+    raise StubTransientError. ``calls`` counts requests actually made and
+    ``peak_in_flight`` the highest async concurrency seen.
+    """
+
+    def __init__(
+        self,
+        responses: Union[Dict, Callable[[str], Dict], None] = None,
+        latency: float = 0.0,
+        transient_failures: int = 0
+    ):
+        self.responses = STUB_ASSUMPTIONS if responses is None else responses
+        self.latency = latency
+        self.transient_failures = transient_failures
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.models = _StubModels(self)
+        self.aio = _StubAio(self)
 
-    for key in required_keys:
-        if key not in assumptions:
-            raise ValueError(f"Missing key in assumptions: {key}")
\ No newline at end of file
+    def respond(self, contents: str) -> StubResponse:
+        if self.transient_failures > 0:
+            self.transient_failures -= 1
+            raise StubTransientError("Service unavailable")
+        if callable(self.responses):
+            return StubResponse(self.responses(contents))
+        return StubResponse(copy.deepcopy(self.responses))
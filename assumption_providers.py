@@ -0,0 +1,464 @@
+"""
+
+Pluggable sources of assumption ranges.
+
+Every provider returns dicts shaped by ASSUMPTION_SCHEMA and validated
+with validate_assumptions, so cases, the engine and the exporter never
+know where the ranges came from:
+
+    llm        - Gemini (generate_assumptions), the original behaviour
+    benchmark  - a local industry x geography table, no network, a few
+                 microseconds per lookup
+    hybrid     - the benchmark table first, Gemini only for contexts the
+                 table does not cover
+
+Free-text industries and geographies ("healthcare services", "USA")
+are normalized onto the table's canonical names before the lookup.
+
+
+"""
+
+import asyncio
+import csv
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from assumption_cache import AssumptionCache, cache_key
+from assumption_generator import (
+    ASSUMPTION_SCHEMA,
+    MODEL_NAME,
+    SYSTEM_INSTRUCTION,
+    build_contents,
+    generate_assumptions,
+    generate_assumptions_many,
+    validate_assumptions,
+)
+from instrumentation import count, timed
+
+
+DEFAULT_BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "benchmark_assumptions.csv")
+
+PROVIDERS = ("llm", "benchmark", "hybrid")
+
+CASES = ("downside", "base", "upside")
+RANGE_FIELDS = ("entry_multiple", "revenue_growth", "exit_multiple")
+
+# Geography used when the table has no row for the requested region
+FALLBACK_GEOGRAPHY = "Global"
+
+# Minimum difflib ratio for a typo-level match ("helthcare")
+FUZZY_CUTOFF = 0.85
+
+# Words that qualify rather than identify a sector
+INDUSTRY_STOPWORDS = {
+    "services", "service", "sector", "industry", "industries",
+    "company", "companies", "products", "solutions", "group",
+}
+
+INDUSTRY_ALIASES = {
+    "health care": "Healthcare",
+    "health": "Healthcare",
+    "hospitals": "Healthcare",
+    "pharma": "Healthcare",
+    "pharmaceuticals": "Healthcare",
+    "medical devices": "Healthcare",
+    "life sciences": "Healthcare",
+    "tech": "Technology",
+    "it": "Technology",
+    "information technology": "Technology",
+    "hardware": "Technology",
+    "semiconductors": "Technology",
+    "saas": "Software",
+    "enterprise software": "Software",
+    "retail": "Consumer",
+    "consumer goods": "Consumer",
+    "food and beverage": "Consumer",
+    "restaurants": "Consumer",
+    "manufacturing": "Industrials",
+    "industrial": "Industrials",
+    "aerospace": "Industrials",
+    "transportation": "Industrials",
+    "logistics": "Industrials",
+    "financials": "Financial Services",
+    "financial": "Financial Services",
+    "banking": "Financial Services",
+    "insurance": "Financial Services",
+    "fintech": "Financial Services",
+    "oil and gas": "Energy",
+    "utilities": "Energy",
+    "power": "Energy",
+    "renewables": "Energy",
+    "property": "Real Estate",
+    "reit": "Real Estate",
+    "telecom": "Telecommunications",
+    "telco": "Telecommunications",
+    "professional": "Business Services",
+    "business": "Business Services",
+    "outsourcing": "Business Services",
+    "entertainment": "Media",
+    "publishing": "Media",
+    "chemicals": "Materials",
+    "mining": "Materials",
+    "metals": "Materials",
+}
+
+GEOGRAPHY_ALIASES = {
+    "us": "North America",
+    "usa": "North America",
+    "united states": "North America",
+    "united states of america": "North America",
+    "america": "North America",
+    "canada": "North America",
+    "na": "North America",
+    "uk": "Europe",
+    "united kingdom": "Europe",
+    "eu": "Europe",
+    "western europe": "Europe",
+    "germany": "Europe",
+    "france": "Europe",
+    "spain": "Europe",
+    "italy": "Europe",
+    "netherlands": "Europe",
+    "nordics": "Europe",
+    "apac": "Asia Pacific",
+    "asia": "Asia Pacific",
+    "china": "Asia Pacific",
+    "japan": "Asia Pacific",
+    "singapore": "Asia Pacific",
+    "australia": "Asia Pacific",
+    "southeast asia": "Asia Pacific",
+    "latam": "Latin America",
+    "brazil": "Latin America",
+    "mexico": "Latin America",
+    "south america": "Latin America",
+    "mea": "Middle East & Africa",
+    "emea": "Europe",
+    "middle east": "Middle East & Africa",
+    "africa": "Middle East & Africa",
+    "uae": "Middle East & Africa",
+    "saudi arabia": "Middle East & Africa",
+    "south africa": "Middle East & Africa",
+    "worldwide": "Global",
+    "international": "Global",
+}
+
+
+# ------------------------
+# Normalization
+# ------------------------
+
+def canonical_text(text: str) -> str:
+    """
+    Case-folds, turns "&" into "and" and reduces punctuation to single
+    spaces.
+    """
+
+    text = str(text).casefold().replace("&", " and ")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def normalize_name(text: str, known: Tuple[str, ...], aliases: Dict[str, str], stopwords=frozenset()) -> Optional[str]:
+    """
+    Maps free text onto one of ``known`` (or None).
+
+    Tries, in order: an exact or alias match, the same with ``stopwords``
+    removed, any contained word pair or word, then a close typo match.
+    """
+
+    lookup = {canonical_text(name): name for name in known}
+    lookup.update({alias: target for alias, target in aliases.items() if target in known})
+
+    key = canonical_text(text)
+    if key in lookup:
+        return lookup[key]
+
+    words = [w for w in key.split() if w not in stopwords]
+    stripped = " ".join(words)
+    if stripped in lookup:
+        return lookup[stripped]
+
+    # Longest phrases first, so "oil and gas services" beats "services"
+    for size in (3, 2, 1):
+        for i in range(len(words) - size + 1):
+            phrase = " ".join(words[i:i + size])
+            if phrase in lookup:
+                return lookup[phrase]
+
+    close = difflib.get_close_matches(stripped or key, list(lookup), n=1, cutoff=FUZZY_CUTOFF)
+    return lookup[close[0]] if close else None
+
+
+# ------------------------
+# Benchmark index
+# ------------------------
+
+def _row_to_assumptions(row: Dict) -> Dict:
+    assumptions = {
+        field: {
+            case: [float(row[f"{field}_{case}_low"]), float(row[f"{field}_{case}_high"])]
+            for case in CASES
+        }
+        for field in RANGE_FIELDS
+    }
+    assumptions["margin_change_bps"] = {case: float(row[f"margin_change_bps_{case}"]) for case in CASES}
+    assumptions["confidence"] = row["confidence"]
+    return assumptions
+
+
+class BenchmarkIndex:
+    """
+    Assumption ranges keyed by (industry, geography) in SQLite.
+
+    A ``.csv`` path is loaded into an in-memory database; any other path
+    is opened as a database previously written with ``save``. Rows are
+    validated on load. Resolved lookups are memoized per raw
+    (industry, geography) pair.
+    """
+
+    def __init__(self, path: str = DEFAULT_BENCHMARK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path.endswith(".csv"):
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE benchmarks ("
+                " industry TEXT NOT NULL,"
+                " geography TEXT NOT NULL,"
+                " assumptions TEXT NOT NULL,"
+                " PRIMARY KEY (industry, geography)) WITHOUT ROWID"
+            )
+            with open(path, newline="") as f:
+                rows = []
+                for row in csv.DictReader(f):
+                    assumptions = _row_to_assumptions(row)
+                    validate_assumptions(assumptions)
+                    rows.append((row["industry"], row["geography"], json.dumps(assumptions)))
+            self._db.executemany("INSERT INTO benchmarks VALUES (?, ?, ?)", rows)
+            self._db.commit()
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+
+        self.industries = tuple(r[0] for r in self._db.execute("SELECT DISTINCT industry FROM benchmarks"))
+        self.geographies = tuple(r[0] for r in self._db.execute("SELECT DISTINCT geography FROM benchmarks"))
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM benchmarks").fetchone()[0]
+
+    def normalize_industry(self, text: str) -> Optional[str]:
+        return normalize_name(text, self.industries, INDUSTRY_ALIASES, INDUSTRY_STOPWORDS)
+
+    def normalize_geography(self, text: str) -> Optional[str]:
+        return normalize_name(text, self.geographies, GEOGRAPHY_ALIASES)
+
+    def _resolve(self, industry: str, geography: str) -> Optional[Tuple[str, str]]:
+        """
+        Table key for a raw context, falling back to the global row when
+        the region is unknown or not covered for that industry.
+        """
+
+        canonical_industry = self.normalize_industry(industry)
+        if canonical_industry is None:
+            return None
+        canonical_geography = self.normalize_geography(geography) or FALLBACK_GEOGRAPHY
+        for candidate in (canonical_geography, FALLBACK_GEOGRAPHY):
+            with self._lock:
+                found = self._db.execute(
+                    "SELECT 1 FROM benchmarks WHERE industry = ? AND geography = ?",
+                    (canonical_industry, candidate),
+                ).fetchone()
+            if found is not None:
+                return canonical_industry, candidate
+        return None
+
+    def lookup(self, industry: str, geography: str) -> Optional[Dict]:
+        """
+        A fresh assumptions dict for the context, or None if the industry
+        is not covered.
+        """
+
+        key = self.resolve(industry, geography)
+        if key is None:
+            count("benchmark_index.miss")
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT assumptions FROM benchmarks WHERE industry = ? AND geography = ?", key
+            ).fetchone()
+        count("benchmark_index.hit")
+        return json.loads(row[0])
+
+    def save(self, path: str) -> None:
+        """
+        Writes the index to an SQLite file that can be opened directly.
+        """
+
+        target = sqlite3.connect(path)
+        with self._lock:
+            self._db.backup(target)
+        target.close()
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_index() -> BenchmarkIndex:
+    """
+    Process-wide index over the bundled benchmark table.
+    """
+
+    global _default_index
+
+    with _default_lock:
+        if _default_index is None:
+            _default_index = BenchmarkIndex()
+        return _default_index
+
+
+# ------------------------
+# Providers
+# ------------------------
+
+class AssumptionProvider:
+    """
+    Interface: ``get`` returns validated assumptions for one deal or
+    raises; ``get_many`` returns one dict or exception per deal, in
+    order.
+    """
+
+    name = ""
+
+    def get(self, user_inputs: Dict) -> Dict:
+        raise NotImplementedError
+
+    def get_many(self, deals: List[Dict]) -> List:
+        results = []
+        for deal in deals:
+            try:
+                results.append(self.get(deal))
+            except Exception as error:
+                results.append(error)
+        return results
+
+
+class LLMProvider(AssumptionProvider):
+    """
+    Gemini, through the assumption cache when one is given.
+    """
+
+    name = "llm"
+
+    def __init__(self, client=None, cache: Optional[AssumptionCache] = None, max_concurrency: int = 8):
+        self.client = client
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+
+    def get(self, user_inputs: Dict) -> Dict:
+        return generate_assumptions(user_inputs, client=self.client, cache=self.cache)
+
+    def get_many(self, deals: List[Dict]) -> List:
+        if not deals:
+            return []
+        return asyncio.run(
+            generate_assumptions_many(
+                deals,
+                client=self.client,
+                cache=self.cache,
+                max_concurrency=self.max_concurrency,
+                return_exceptions=True,
+            )
+        )
+
+
+class CachedLLMProvider(AssumptionProvider):
+    """
+    Previously generated LLM answers only; never calls the model.
+    """
+
+    name = "llm"
+
+    def __init__(self, cache: Optional[AssumptionCache]):
+        self.cache = cache
+
+    def get(self, user_inputs: Dict) -> Dict:
+        key = cache_key(build_contents(user_inputs), MODEL_NAME, ASSUMPTION_SCHEMA, SYSTEM_INSTRUCTION)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is None:
+            raise LookupError("No cached assumptions")
+        return cached
+
+
+class BenchmarkProvider(AssumptionProvider):
+    """
+    Offline, deterministic ranges from a BenchmarkIndex.
+    """
+
+    name = "benchmark"
+
+    def __init__(self, index: Optional[BenchmarkIndex] = None):
+        self.index = index or get_default_index()
+
+    @timed("assumptions.benchmark_lookup")
+    def get(self, user_inputs: Dict) -> Dict:
+        assumptions = self.index.lookup(user_inputs["industry"], user_inputs["geography"])
+        if assumptions is None:
+            raise LookupError(f"No benchmark for industry {user_inputs['industry']!r}")
+        return assumptions
+
+
+class HybridProvider(AssumptionProvider):
+    """
+    Benchmark index first; only deals it cannot answer go to the LLM,
+    concurrently in ``get_many``.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, index: Optional[BenchmarkIndex] = None, fallback: Optional[AssumptionProvider] = None):
+        self.benchmark = BenchmarkProvider(index)
+        self.fallback = fallback or LLMProvider()
+
+    def get(self, user_inputs: Dict) -> Dict:
+        try:
+            return self.benchmark.get(user_inputs)
+        except LookupError:
+            count("assumptions.hybrid_fallback")
+            return self.fallback.get(user_inputs)
+
+    def get_many(self, deals: List[Dict]) -> List:
+        results = self.benchmark.get_many(deals)
+        misses = [i for i, r in enumerate(results) if isinstance(r, LookupError)]
+        if misses:
+            count("assumptions.hybrid_fallback", len(misses))
+            for i, result in zip(misses, self.fallback.get_many([deals[i] for i in misses])):
+                results[i] = result
+        return results
+
+
+def get_provider(
+    name: str,
+    client=None,
+    cache: Optional[AssumptionCache] = None,
+    index: Optional[BenchmarkIndex] = None,
+    max_concurrency: int = 8,
+    offline: bool = False
+) -> AssumptionProvider:
+    """
+    Builds a provider by name (one of PROVIDERS). With ``offline`` the
+    LLM is replaced by the answers already in ``cache``.
+    """
+
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown assumption provider: {name}; choose one of {', '.join(PROVIDERS)}")
+    if name == "benchmark":
+        return BenchmarkProvider(index)
+    llm = CachedLLMProvider(cache) if offline else LLMProvider(client, cache, max_concurrency)
+    return llm if name == "llm" else HybridProvider(index, llm)
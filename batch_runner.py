@@ -0,0 +1,603 @@
+"""
+
+Headless batch runner: streams a deal book from CSV or Parquet, runs
+every deal through validation, assumptions, cases and sensitivities,
+and writes one result row per deal incrementally.
+
+Usage:
+    python batch_runner.py deals.csv --output results.parquet --workers 8
+
+
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+import instrumentation
+from inputs import validate_user_inputs_batch
+from assumption_cache import AssumptionCache, get_default_cache
+from assumption_generator import validate_assumptions
+from assumption_providers import PROVIDERS, AssumptionProvider, get_provider
+from capital_structure import CapitalStructure
+from case_constructor import CASE_ORDER, build_case_batch
+from engine_backends import run_batch as run_engine_batch
+from lbo_engine import CASE_FIELDS, project_schedules, run_lbo_batch
+from results_store import ResultsStore, run_key
+from schedules import ScheduleTable, ScheduleWriter
+from sensitivity_analysis import sensitivity_analysis
+
+
+NUMERIC_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "tax_rate",
+    "debt_percentage",
+    "interest_rate",
+    "hold_period_years",
+)
+
+CASE_NAMES = CASE_ORDER
+
+OUTPUT_FIELDS = (
+    ["deal_id", "industry", "geography", "status", "error"]
+    + [
+        f"{case}_{metric}"
+        for case in CASE_NAMES
+        for metric in ("irr", "money_multiple", "entry_equity", "exit_equity")
+    ]
+    + ["confidence", "sensitivities"]
+)
+
+
+# ------------------------
+# Reading
+# ------------------------
+
+def _coerce_row(row: Dict, index: int) -> Dict:
+    """
+    Turns a raw CSV/Parquet row into a user_inputs dict.
+
+    Values that cannot be parsed are left as-is so input validation
+    reports them.
+    """
+
+    deal = dict(row)
+    deal.setdefault("deal_id", str(index))
+    for field in NUMERIC_FIELDS:
+        value = deal.get(field)
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+        if isinstance(value, float) and field == "hold_period_years" and value.is_integer():
+            value = int(value)
+        if value is not None:
+            deal[field] = value
+    for field in ("industry", "geography"):
+        if deal.get(field) is None:
+            deal[field] = ""
+    return deal
+
+
+def iter_deal_chunks(path: str, chunk_size: int = 500) -> Iterator[List[Dict]]:
+    """
+    Streams deals from a CSV or Parquet file in chunks of ``chunk_size``.
+    """
+
+    index = 0
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            chunk = []
+            for row in batch.to_pylist():
+                chunk.append(_coerce_row(row, index))
+                index += 1
+            yield chunk
+        return
+
+    with open(path, newline="") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(_coerce_row(row, index))
+            index += 1
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# ------------------------
+# Writing
+# ------------------------
+
+class ResultWriter:
+    """
+    Appends result rows to CSV or Parquet without holding the book in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = path.endswith(".parquet")
+        self._writer = None
+        self._file = None
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            columns = {field: [row.get(field) for row in rows] for field in OUTPUT_FIELDS}
+            table = pa.table(columns, schema=self._parquet_schema(pa))
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._writer is None:
+                self._file = open(self.path, "w", newline="")
+                self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+                self._writer.writeheader()
+            self._writer.writerows(rows)
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._parquet and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+    @staticmethod
+    def _parquet_schema(pa):
+        text = {"deal_id", "industry", "geography", "status", "error", "confidence", "sensitivities"}
+        return pa.schema([
+            (field, pa.string() if field in text else pa.float64())
+            for field in OUTPUT_FIELDS
+        ])
+
+
+# ------------------------
+# Assumptions
+# ------------------------
+
+def resolve_assumptions(
+    deals: List[Dict],
+    fixed: Optional[Dict] = None,
+    cache: Optional[AssumptionCache] = None,
+    offline: bool = False,
+    client=None,
+    max_concurrency: int = 8,
+    provider: Optional[AssumptionProvider] = None
+) -> List:
+    """
+    Returns an assumptions dict (or the exception raised) for each deal.
+
+    ``fixed`` applies one assumption set to every deal. Otherwise the
+    ``provider`` answers (by default the LLM: the cache is consulted
+    and, unless ``offline``, misses go to Gemini concurrently).
+    """
+
+    if fixed is not None:
+        return [fixed] * len(deals)
+
+    if provider is None:
+        provider = get_provider("llm", client=client, cache=cache, max_concurrency=max_concurrency, offline=offline)
+    return provider.get_many(deals)
+
+
+# ------------------------
+# Per-deal computation
+# ------------------------
+
+def run_deal(deal: Dict, ai_assumptions: Dict, structure: Optional[CapitalStructure] = None) -> Dict:
+    """
+    Runs the three cases and base-case sensitivities for one deal, under
+    ``structure`` when given (instead of the deal's single debt tranche).
+    """
+
+    cases = build_case_batch(ai_assumptions)
+    results = run_lbo_batch(deal, cases) if structure is None else run_engine_batch(deal, cases, structure=structure)
+
+    row = {
+        "deal_id": str(deal["deal_id"]),
+        "industry": deal["industry"],
+        "geography": deal["geography"],
+        "status": "ok",
+        "error": "",
+        "confidence": ai_assumptions.get("confidence"),
+    }
+    for i, name in enumerate(CASE_NAMES):
+        for metric in ("irr", "money_multiple", "entry_equity", "exit_equity"):
+            row[f"{name}_{metric}"] = float(results[metric][i])
+
+    sensitivities = sensitivity_analysis(deal, cases[CASE_NAMES.index("base")], structure=structure)
+    row["sensitivities"] = json.dumps(
+        {var: {str(k): v for k, v in table.items()} for var, table in sensitivities.items()}
+    )
+    return row
+
+
+def chunk_schedules(work: List, first_row: int) -> ScheduleTable:
+    """
+    Yearly schedules for every (deal, assumptions) pair of a chunk in one
+    vectorized pass, with "deal" (row in the book), "scenario" (index in
+    CASE_NAMES) and a book-wide "case" = 3 * deal + scenario.
+    """
+
+    deals = [deal for deal, _ in work]
+    batches = [build_case_batch(ai_assumptions) for _, ai_assumptions in work]
+    inputs = {field: np.array([float(deal[field]) for deal in deals])[:, None] for field in NUMERIC_FIELDS}
+    cases = {field: np.stack([getattr(batch, field) for batch in batches]) for field in CASE_FIELDS}
+    table = project_schedules(inputs, cases)
+
+    local = table["case"]
+    deal_rows = np.array([first_row + deal["_order"] for deal in deals], dtype=np.int64)[local // len(CASE_NAMES)]
+    scenario = local % len(CASE_NAMES)
+    columns = {"case": deal_rows * len(CASE_NAMES) + scenario, "deal": deal_rows, "scenario": scenario}
+    columns.update({name: values for name, values in table.columns.items() if name != "case"})
+    return ScheduleTable(columns, {"scenarios": list(CASE_NAMES)})
+
+
+def _stored_row(deal: Dict, run: Dict) -> Dict:
+    """
+    The result row for a deal whose identical run is already stored.
+    """
+
+    row = {
+        "deal_id": str(deal["deal_id"]),
+        "industry": deal["industry"],
+        "geography": deal["geography"],
+        "status": "ok",
+        "error": "",
+        "confidence": run["assumptions"].get("confidence"),
+        "sensitivities": json.dumps(run["sensitivities"]),
+    }
+    for name in CASE_NAMES:
+        for metric in ("irr", "money_multiple", "entry_equity", "exit_equity"):
+            row[f"{name}_{metric}"] = run["cases"][name][metric]
+    return row
+
+
+def _store_entries(rows: List[Dict], computed: Dict, options: Optional[Dict] = None) -> List[Dict]:
+    """
+    ResultsStore entries for freshly computed ok rows (``computed`` maps
+    a deal's order in its chunk to its (deal, assumptions) pair).
+    """
+
+    entries = []
+    for row in rows:
+        if row["status"] != "ok" or row["_order"] not in computed:
+            continue
+        deal, ai_assumptions = computed[row["_order"]]
+        entries.append({
+            "inputs": deal,
+            "assumptions": ai_assumptions,
+            "cases": {
+                name: {metric: row[f"{name}_{metric}"] for metric in ("irr", "money_multiple", "entry_equity", "exit_equity")}
+                for name in CASE_NAMES
+            },
+            "sensitivities": json.loads(row["sensitivities"]),
+            "options": options,
+        })
+    return entries
+
+
+def _failed_row(deal: Dict, status: str, error: Exception) -> Dict:
+    return {
+        "deal_id": str(deal.get("deal_id")),
+        "industry": deal.get("industry"),
+        "geography": deal.get("geography"),
+        "status": status,
+        "error": str(error),
+    }
+
+
+def process_chunk(work: List, structure: Optional[CapitalStructure] = None) -> List[Dict]:
+    """
+    Computes result rows for (deal, assumptions) pairs; runs in a worker.
+    """
+
+    rows = []
+    for deal, ai_assumptions in work:
+        try:
+            rows.append(run_deal(deal, ai_assumptions, structure))
+        except Exception as e:
+            rows.append(_failed_row(deal, "failed", e))
+    return rows
+
+
+# ------------------------
+# Driver
+# ------------------------
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    fixed_assumptions: Optional[Dict] = None,
+    cache: Optional[AssumptionCache] = None,
+    offline: bool = False,
+    client=None,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    max_concurrency: int = 8,
+    provider: Optional[AssumptionProvider] = None,
+    schedules_path: Optional[str] = None,
+    store: Optional[ResultsStore] = None,
+    structure: Optional[CapitalStructure] = None,
+    progress=None,
+    log=None
+) -> Dict:
+    """
+    Runs a whole deal book and returns throughput statistics.
+
+    ``provider`` overrides where assumptions come from (see
+    assumption_providers); ``cache``, ``offline`` and ``client``
+    configure the default LLM provider. ``schedules_path`` also writes
+    every case's yearly projection there (see schedules.ScheduleWriter
+    for the formats). With a results ``store``, deals whose identical
+    run (same inputs and assumptions) is already stored are read back
+    instead of recomputed, and new runs are recorded. ``structure`` runs
+    the cases and sensitivities under a multi-tranche CapitalStructure;
+    it cannot be combined with ``schedules_path``, whose projections are
+    single-tranche.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded
+    regardless of book size. Output rows keep the input order.
+
+    ``log`` is an optional text file that receives one JSON event per
+    chunk and a final summary, including per-stage timings from worker
+    processes when instrumentation is enabled.
+    """
+
+    if structure is not None and schedules_path:
+        raise ValueError("Yearly schedules are single-tranche; they cannot be written with a capital structure")
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    stats = {"deals": 0, "ok": 0, "invalid": 0, "no_assumptions": 0, "failed": 0}
+    if store is not None:
+        stats["reused"] = 0
+        # Runs under a capital structure are different runs from the same deal's plain ones
+        store_options = {"structure": structure.to_dict()} if structure is not None else None
+    started = time.perf_counter()
+
+    writer = ResultWriter(output_path)
+    schedule_writer = ScheduleWriter(schedules_path, {"scenarios": list(CASE_NAMES)}) if schedules_path else None
+    first_row = 0
+    pool = None
+    if workers > 1:
+        from scheduler import get_executor
+
+        # The shared pool outlives this run, so later jobs skip worker startup
+        pool = get_executor(workers)
+    profile = instrumentation.PROFILER.enabled
+    pending = deque()
+
+    def drain(limit: int) -> None:
+        while len(pending) > limit:
+            prefix_rows, future, computed = pending.popleft()
+            worker_rows, report = future.result()
+            if report is not None:
+                instrumentation.PROFILER.merge(report)
+            if store is not None and worker_rows:
+                with instrumentation.stage("batch.store_record"):
+                    store.record_many(_store_entries(worker_rows, computed, store_options))
+            rows = prefix_rows + worker_rows
+            rows.sort(key=lambda r: r["_order"])
+            for row in rows:
+                del row["_order"]
+                stats[row["status"]] += 1
+                stats["deals"] += 1
+            with instrumentation.stage("batch.write"):
+                writer.write(rows)
+            elapsed = time.perf_counter() - started
+            if progress is not None:
+                progress(stats, elapsed)
+            if log is not None:
+                _log_event(log, "chunk", rows=len(rows), elapsed_s=round(elapsed, 3), **stats)
+
+    try:
+        for chunk in iter_deal_chunks(input_path, chunk_size):
+            early_rows, valid = [], []
+            with instrumentation.stage("batch.validate"):
+                errors = validate_user_inputs_batch(chunk).first_errors()
+            for order, (deal, error) in enumerate(zip(chunk, errors)):
+                deal["_order"] = order
+                if error is None:
+                    valid.append(deal)
+                else:
+                    early_rows.append({**_failed_row(deal, "invalid", ValueError(error)), "_order": order})
+
+            work = []
+            with instrumentation.stage("batch.resolve_assumptions"):
+                assumptions = resolve_assumptions(
+                    valid, fixed_assumptions, cache, offline, client, max_concurrency, provider
+                )
+            for deal, ai_assumptions in zip(valid, assumptions):
+                if isinstance(ai_assumptions, BaseException):
+                    early_rows.append({**_failed_row(deal, "no_assumptions", ai_assumptions), "_order": deal["_order"]})
+                else:
+                    work.append((deal, ai_assumptions))
+
+            if schedule_writer is not None and work:
+                with instrumentation.stage("batch.schedules"):
+                    schedule_writer.write(chunk_schedules(work, first_row))
+            first_row += len(chunk)
+
+            if store is not None and work:
+                with instrumentation.stage("batch.store_lookup"):
+                    keys = [run_key(deal, ai_assumptions, options=store_options) for deal, ai_assumptions in work]
+                    stored = store.get_many(keys)
+                fresh = []
+                for (deal, ai_assumptions), key in zip(work, keys):
+                    if key in stored:
+                        early_rows.append({**_stored_row(deal, stored[key]), "_order": deal["_order"]})
+                        stats["reused"] += 1
+                    else:
+                        fresh.append((deal, ai_assumptions))
+                work = fresh
+
+            if pool is not None and work:
+                future = pool.submit(_process_ordered, work, profile, structure)
+            else:
+                # In-process work records straight into this process's profiler
+                future = _Done(_process_ordered(work, False, structure))
+            pending.append((early_rows, future, {deal["_order"]: (deal, ai) for deal, ai in work}))
+            drain(2 * max(workers, 1))
+
+        drain(0)
+    finally:
+        writer.close()
+        if schedule_writer is not None:
+            schedule_writer.close()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["deals_per_second"] = round(stats["deals"] / elapsed, 1) if elapsed > 0 else 0.0
+    if log is not None:
+        summary = {"profile": instrumentation.PROFILER.report()} if profile else {}
+        _log_event(log, "summary", **stats, **summary)
+    return stats
+
+
+def _process_ordered(work: List, profile: bool, structure: Optional[CapitalStructure] = None):
+    """
+    Runs a chunk and tags rows with their position; in a worker with
+    ``profile`` set, also returns that worker's stage timings.
+    """
+
+    if profile:
+        instrumentation.enable()
+        instrumentation.PROFILER.reset()
+    rows = process_chunk(work, structure)
+    for row, (deal, _) in zip(rows, work):
+        row["_order"] = deal["_order"]
+    return rows, (instrumentation.PROFILER.report() if profile else None)
+
+
+def _log_event(log, event: str, **fields) -> None:
+    log.write(json.dumps({"event": event, "time": time.time(), **fields}) + "\n")
+    log.flush()
+
+
+class _Done:
+    """
+    Already-computed stand-in for a Future when running in-process.
+    """
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def _print_progress(stats: Dict, elapsed: float) -> None:
+    rate = stats["deals"] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"\r{stats['deals']} deals | ok {stats['ok']} | invalid {stats['invalid']} | "
+        f"no assumptions {stats['no_assumptions']} | failed {stats['failed']} | {rate:,.1f} deals/s",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Run the LBO pipeline over a deal book.")
+    parser.add_argument("input", help="Deal book (.csv or .parquet) with one deal per row.")
+    parser.add_argument("--output", default="lbo_results.csv", help="Results file (.csv or .parquet).")
+    parser.add_argument("--assumptions", help="JSON file with one assumption set applied to every deal.")
+    parser.add_argument(
+        "--provider",
+        choices=PROVIDERS,
+        default="llm",
+        help="Assumption source: the LLM, the local benchmark table, or the table with LLM fallback.",
+    )
+    parser.add_argument("--offline", action="store_true", help="Only use cached assumptions; never call the LLM.")
+    parser.add_argument("--cache", help="Assumption cache path (defaults to the shared cache).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Deals per chunk.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM requests.")
+    parser.add_argument(
+        "--schedules",
+        help="Also write yearly projections: .parquet, .arrow (Arrow IPC) or a directory of memory-mappable columns.",
+    )
+    parser.add_argument(
+        "--store",
+        help="Results store (SQLite) to reuse identical past runs from and record new ones to.",
+    )
+    parser.add_argument(
+        "--structure",
+        help="JSON capital structure (see capital_structure.CapitalStructure.from_dict) to run every deal under.",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Suppress progress output.")
+    parser.add_argument("--log-json", help="Write JSON-lines progress and summary events to this file.")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage timings (included in the JSON log).")
+    parser.add_argument("--cprofile", help="Write a cProfile dump of the driver process to this path.")
+    args = parser.parse_args(argv)
+    if args.structure and args.schedules:
+        parser.error("--schedules cannot be combined with --structure (schedules are single-tranche)")
+
+    if args.profile:
+        instrumentation.enable()
+
+    fixed = None
+    if args.assumptions:
+        with open(args.assumptions) as f:
+            fixed = json.load(f)
+        validate_assumptions(fixed)
+
+    structure = None
+    if args.structure:
+        with open(args.structure) as f:
+            structure = CapitalStructure.from_dict(json.load(f))
+
+    cache = AssumptionCache(args.cache) if args.cache else get_default_cache()
+    provider = get_provider(args.provider, cache=cache, max_concurrency=args.concurrency, offline=args.offline)
+
+    log = open(args.log_json, "a") if args.log_json else None
+    dump = instrumentation.ProfileDump().start() if args.cprofile else None
+    try:
+        stats = run_batch(
+            args.input,
+            args.output,
+            fixed_assumptions=fixed,
+            cache=cache,
+            offline=args.offline,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            max_concurrency=args.concurrency,
+            provider=provider,
+            schedules_path=args.schedules,
+            store=ResultsStore(args.store) if args.store else None,
+            structure=structure,
+            progress=None if args.quiet else _print_progress,
+            log=log,
+        )
+    finally:
+        if dump is not None:
+            dump.stop().save(args.cprofile)
+        if log is not None:
+            log.close()
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(json.dumps(stats))
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,642 @@
+"""
+
+Benchmark suite and regression harness for the LBO pipeline.
+
+Runs offline (assumptions come from StubClient) against synthetic deals
+at several scales, checks that the fast paths reproduce the reference
+per-case loop exactly, and emits machine-readable JSON.
+
+Usage:
+    python benchmarks.py                      # all benchmarks + golden checks
+    python benchmarks.py --quick -k engine    # fewer repeats, name filter
+    python benchmarks.py --json out.json --compare baseline.json
+
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from assumption_cache import AssumptionCache
+from assumption_generator import STUB_ASSUMPTIONS, StubClient, generate_assumptions
+from assumption_providers import BenchmarkIndex, BenchmarkProvider
+from capital_structure import STANDARD_STRUCTURE, CapitalStructure, project_structure
+from case_constructor import build_cases
+from engine_backends import available_backends
+from engine_backends import run_batch as run_backend_batch
+from engine_backends import run_batch_parallel
+from exporter import convert_to_excel
+from global_sensitivity import driver_ranges, sobol_indices
+from goal_seek import goal_seek
+from incremental_engine import IncrementalEngine
+from inputs import validate_user_inputs_batch
+from irr import equity_cash_flows, irr
+from lbo_engine import (
+    CASE_FIELDS,
+    USER_INPUT_FIELDS,
+    project_batch,
+    project_exit_curve,
+    project_schedules,
+    run_case,
+    run_case_batch,
+    run_lbo_batch,
+    run_lbo_case,
+)
+from lbo_types import CaseAssumptions, CaseBatch, DealBatch, DealInputs
+from monte_carlo import run_monte_carlo
+from results_store import ResultsStore
+from sensitivity_analysis import sensitivity_analysis
+
+
+# ------------------------
+# Synthetic data
+# ------------------------
+
+def synthetic_deals(n: int, seed: int = 0) -> List[Dict]:
+    """
+    Plausible deal inputs, including some edge cases (zero revenue,
+    deep margin cuts, short and long holds).
+    """
+
+    rng = np.random.default_rng(seed)
+    revenue = rng.uniform(50, 5000, n)
+    revenue[rng.random(n) < 0.01] = 0.0
+    margin = rng.uniform(0.02, 0.4, n)
+
+    deals = []
+    for i in range(n):
+        deals.append({
+            "revenue": float(revenue[i]),
+            "ebitda": float(revenue[i] * margin[i]) if revenue[i] else float(rng.uniform(1, 50)),
+            "depreciation_amortization": float(revenue[i] * rng.uniform(0.01, 0.06)),
+            "capex": float(revenue[i] * rng.uniform(0.01, 0.08)),
+            "tax_rate": float(rng.uniform(0.1, 0.35)),
+            "debt_percentage": float(rng.uniform(0.2, 0.8)),
+            "interest_rate": float(rng.uniform(0.04, 0.14)),
+            "hold_period_years": int(rng.integers(1, 9)),
+            "industry": str(rng.choice(["Healthcare", "Technology", "Industrials", "Consumer"])),
+            "geography": str(rng.choice(["India", "US", "UK", "Germany"])),
+        })
+    return deals
+
+
+def synthetic_cases(n: int, seed: int = 1) -> List[Dict]:
+    """
+    Case assumptions spanning downside to upside territory.
+    """
+
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "entry_multiple": float(rng.uniform(4, 18)),
+            "revenue_growth": float(rng.uniform(-15, 25)),
+            "exit_multiple": float(rng.uniform(3, 18)),
+            "margin_change_bps": float(rng.uniform(-600, 600)),
+        }
+        for _ in range(n)
+    ]
+
+
+def stack(records: List[Dict], fields) -> Dict[str, np.ndarray]:
+    """
+    Turns a list of dicts into one array per field.
+    """
+    return {field: np.array([r[field] for r in records]) for field in fields}
+
+
+# ------------------------
+# Golden checks
+# ------------------------
+
+def reference_sensitivity(user_inputs: Dict, base_case: Dict) -> Dict:
+    """
+    The original one-way sensitivity loop, one run_lbo_case per point,
+    with the original 2-decimal range.
+    """
+
+    specs = {"entry_multiple": 0.5, "exit_multiple": 0.5, "revenue_growth": 1.0}
+    results = {}
+    for variable, step in specs.items():
+        table = {}
+        center = base_case[variable]
+        for val in [round(center + i * step, 2) for i in range(-2, 3)]:
+            modified_case = base_case.copy()
+            modified_case[variable] = val
+            table[val] = run_lbo_case(user_inputs, modified_case)["irr"]
+        results[variable] = table
+    return results
+
+
+def golden_checks(n: int = 5000) -> Dict:
+    """
+    Compares every fast path against the reference loop; any mismatch
+    is reported with its first offending index.
+    """
+
+    deals = synthetic_deals(n, seed=11)
+    cases = synthetic_cases(n, seed=12)
+    expected = [run_lbo_case(d, c) for d, c in zip(deals, cases)]
+
+    checks = {}
+
+    overrides = {**stack(deals, USER_INPUT_FIELDS), **stack(cases, CASE_FIELDS)}
+    batch = run_lbo_batch({}, overrides)
+    mismatches = [
+        i for i, e in enumerate(expected)
+        if any(batch[k][i] != e[k] for k in e)
+    ]
+    checks["run_lbo_batch"] = {"cases": n, "mismatches": len(mismatches), "first": mismatches[:1]}
+
+    sens_mismatches = [
+        i for i in range(min(n, 500))
+        if sensitivity_analysis(deals[i], cases[i]) != reference_sensitivity(deals[i], cases[i])
+    ]
+    checks["sensitivity_analysis"] = {
+        "cases": min(n, 500), "mismatches": len(sens_mismatches), "first": sens_mismatches[:1]
+    }
+
+    # General solver vs the closed form on plain entry/exit flows
+    projected = project_batch({}, overrides)
+    flows = equity_cash_flows(
+        projected["entry_equity"], projected["exit_equity"], overrides["hold_period_years"]
+    )
+    solved = irr(flows)
+    priced = projected["money_multiple"] > 0
+    closed_form = projected["irr"][priced]
+    irr_mismatches = np.flatnonzero(
+        ~solved.converged[priced] | ~np.isclose(solved.rate[priced], closed_form, rtol=1e-9, atol=1e-12)
+    )
+    checks["irr"] = {
+        "cases": int(priced.sum()), "mismatches": len(irr_mismatches), "first": irr_mismatches[:1].tolist()
+    }
+
+    # Single-tranche structure vs the engine, on cases where the engine's
+    # simplifications (no cash build, no shortfall) do not bite
+    structured = project_structure(
+        {}, overrides, CapitalStructure.single_tranche(overrides["debt_percentage"], overrides["interest_rate"]),
+        include_schedule=True,
+    )
+    years = np.arange(len(structured["schedule"]["fcf"]))[:, None] < overrides["hold_period_years"]
+    balances = structured["schedule"]["tranches"]["debt"]["balance"]
+    clean = np.all(~years | ((structured["schedule"]["fcf"] > 0) & (balances > 0)), axis=0)
+    structure_mismatches = np.flatnonzero(
+        ~np.isclose(structured["exit_equity"][clean], projected["exit_equity"][clean], rtol=1e-9)
+    )
+    checks["capital_structure"] = {
+        "cases": int(clean.sum()),
+        "mismatches": len(structure_mismatches),
+        "first": structure_mismatches[:1].tolist(),
+    }
+
+    # Columnar schedules vs run_lbo_case's yearly dicts
+    schedules = project_schedules({}, overrides)
+    schedule_mismatches = [
+        i for i in range(min(n, 500))
+        if schedules.records(i) != run_lbo_case(deals[i], cases[i], include_schedule=True)["schedule"]
+    ]
+    checks["project_schedules"] = {
+        "cases": min(n, 500), "mismatches": len(schedule_mismatches), "first": schedule_mismatches[:1]
+    }
+
+    # Exit-year curve vs one engine run per hold period
+    curve = project_exit_curve({}, overrides, 10)
+    curve_mismatches = set()
+    for year in range(1, 11):
+        held = project_batch({}, {**overrides, "hold_period_years": year})
+        for metric in ("exit_equity", "money_multiple", "irr"):
+            curve_mismatches.update(np.flatnonzero(held[metric] != curve[metric][:, year - 1]).tolist())
+    checks["exit_curve"] = {
+        "cases": n, "mismatches": len(curve_mismatches), "first": sorted(curve_mismatches)[:1]
+    }
+
+    # Every installed engine backend vs the reference loop
+    for backend in available_backends():
+        rounded = run_backend_batch({}, overrides, backend)
+        backend_mismatches = [
+            i for i, e in enumerate(expected)
+            if any(rounded[k][i] != e[k] for k in e)
+        ]
+        checks[f"backend.{backend}"] = {
+            "cases": n, "mismatches": len(backend_mismatches), "first": backend_mismatches[:1]
+        }
+
+    checks["passed"] = all(c["mismatches"] == 0 for c in checks.values() if isinstance(c, dict))
+    return checks
+
+
+# ------------------------
+# Benchmarks
+# ------------------------
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, items: int = 1):
+    """
+    Registers a benchmark. The decorated function does any setup and
+    returns the zero-argument callable that is timed; ``items`` is the
+    number of deals/cases/paths one call processes.
+    """
+
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS.append({"name": name, "items": items, "setup": setup})
+        return setup
+
+    return register
+
+
+@benchmark("engine.run_lbo_case[1 deal]")
+def bench_run_lbo_case():
+    deal, case = synthetic_deals(1)[0], synthetic_cases(1)[0]
+    return lambda: run_lbo_case(deal, case)
+
+
+@benchmark("engine.run_lbo_case_loop[1k deals]", items=1000)
+def bench_run_lbo_case_loop():
+    deals, cases = synthetic_deals(1000), synthetic_cases(1000)
+    return lambda: [run_lbo_case(d, c) for d, c in zip(deals, cases)]
+
+
+@benchmark("engine.run_lbo_batch[1k deals]", items=1000)
+def bench_run_lbo_batch():
+    arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+    return lambda: run_lbo_batch({}, arrays)
+
+
+@benchmark("engine.run_batch_parallel[1M cases]", items=1_000_000)
+def bench_run_batch_parallel():
+    arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+    arrays = {name: np.tile(values, 1000) for name, values in arrays.items()}
+    return lambda: run_batch_parallel({}, arrays, backend="numpy")
+
+
+@benchmark("engine.project_schedules[100k cases]", items=100_000)
+def bench_project_schedules():
+    arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+    arrays = {name: np.tile(values, 100) for name, values in arrays.items()}
+    return lambda: project_schedules({}, arrays)
+
+
+@benchmark("engine.project_exit_curve[100k cases x 10 exit years]", items=100_000)
+def bench_project_exit_curve():
+    arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+    arrays = {name: np.tile(values, 100) for name, values in arrays.items()}
+    return lambda: project_exit_curve({}, arrays, 10)
+
+
+def _register_backend_benchmarks():
+    # The interpreted reference is ~20x slower, so it gets a smaller batch
+    for backend in available_backends():
+        n = 10_000 if backend == "python" else 100_000
+
+        def setup(backend=backend, n=n):
+            arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+            arrays = {name: np.tile(values, n // 1000) for name, values in arrays.items()}
+            run_backend_batch({}, arrays, backend)  # compile / warm up outside the timing
+            return lambda: run_backend_batch({}, arrays, backend)
+
+        benchmark(f"engine.backend[{backend}, {n // 1000}k cases]", items=n)(setup)
+
+
+_register_backend_benchmarks()
+
+
+@benchmark("capital_structure.project_structure[1k cases, 4 tranches + revolver]", items=1000)
+def bench_project_structure():
+    arrays = {**stack(synthetic_deals(1000), USER_INPUT_FIELDS), **stack(synthetic_cases(1000), CASE_FIELDS)}
+    return lambda: project_structure({}, arrays, STANDARD_STRUCTURE)
+
+
+@benchmark("engine.run_case[typed, 1 deal]")
+def bench_run_case_typed():
+    deal = DealInputs.from_dict(synthetic_deals(1)[0])
+    case = CaseAssumptions.from_dict(synthetic_cases(1)[0])
+    return lambda: run_case(deal, case)
+
+
+@benchmark("engine.run_case_batch[typed, 1k deals]", items=1000)
+def bench_run_case_batch_typed():
+    deals = DealBatch.from_records(synthetic_deals(1000))
+    cases = CaseBatch.from_records(synthetic_cases(1000))
+    return lambda: run_case_batch(deals, cases)
+
+
+@benchmark("cases.build_cases[1 deal]")
+def bench_build_cases():
+    return lambda: build_cases(STUB_ASSUMPTIONS)
+
+
+@benchmark("sensitivity.sensitivity_analysis[1 deal]")
+def bench_sensitivity():
+    deal, case = synthetic_deals(1)[0], synthetic_cases(1)[0]
+    return lambda: sensitivity_analysis(deal, case)
+
+
+@benchmark("sensitivity.sensitivity_analysis[incremental, rate nudge]")
+def bench_sensitivity_incremental():
+    deal, case = synthetic_deals(1)[0], synthetic_cases(1)[0]
+    engine = IncrementalEngine()
+    nudges = iter(range(10**9))
+    # Each call moves the interest rate, so only the operating layer is reused
+    return lambda: sensitivity_analysis(
+        {**deal, "interest_rate": deal["interest_rate"] + next(nudges) * 1e-6}, case, engine=engine
+    )
+
+
+@benchmark("sensitivity.sobol_indices[8 drivers, N=4096 fixed]", items=4096 * 10)
+def bench_sobol_indices():
+    deal, case = synthetic_deals(1)[0], synthetic_cases(1)[0]
+    ranges = driver_ranges(deal, case)
+    # tol=0 runs every doubling up to max_n, so timings stay comparable
+    return lambda: sobol_indices(deal, case, ranges, max_n=4096, tol=0, n_bootstrap=0)
+
+
+@benchmark("goal_seek.seek[entry multiple @ 20% IRR, uncached]")
+def bench_goal_seek():
+    deal, case = synthetic_deals(1)[0], synthetic_cases(1)[0]
+    case["entry_multiple"] = 8.0
+    return lambda: goal_seek(deal, case, "entry_multiple", 20.0)
+
+
+@benchmark("assumptions.generate_assumptions[stub, cached]")
+def bench_generate_assumptions():
+    deal = synthetic_deals(1)[0]
+    client, cache = StubClient(), AssumptionCache(None)
+    generate_assumptions(deal, client=client, cache=cache)
+    return lambda: generate_assumptions(deal, client=client, cache=cache)
+
+
+@benchmark("inputs.validate_user_inputs_batch[100k deals]", items=100_000)
+def bench_validate_batch():
+    deals = synthetic_deals(100_000)
+    return lambda: validate_user_inputs_batch(deals)
+
+
+@benchmark("assumptions.benchmark_provider[1k deals]", items=1000)
+def bench_benchmark_provider():
+    deals = synthetic_deals(1000)
+    provider = BenchmarkProvider(BenchmarkIndex())
+    return lambda: provider.get_many(deals)
+
+
+def _store_entries(deals: List[Dict]) -> List[Dict]:
+    cases = build_cases(STUB_ASSUMPTIONS)
+    inputs = {field: values[:, None] for field, values in stack(deals, USER_INPUT_FIELDS).items()}
+    results = run_lbo_batch(inputs, {
+        field: np.array([cases[name][field] for name in ("downside", "base", "upside")])[None, :]
+        for field in CASE_FIELDS
+    })
+    return [
+        {
+            "inputs": deal,
+            "assumptions": STUB_ASSUMPTIONS,
+            "cases": {
+                name: {metric: float(results[metric][i, j]) for metric in results.dtype.names}
+                for j, name in enumerate(("downside", "base", "upside"))
+            },
+        }
+        for i, deal in enumerate(deals)
+    ]
+
+
+@benchmark("results_store.record_many[1k runs, in memory]", items=1000)
+def bench_store_record():
+    entries = _store_entries(synthetic_deals(1000))
+
+    def run():
+        store = ResultsStore(None)
+        store.record_many(entries)
+        store.close()
+
+    return run
+
+
+@benchmark("results_store.summary[300k scenarios, industry x geography]", items=300_000)
+def bench_store_summary():
+    store = ResultsStore(None)
+    store.record_many(_store_entries(synthetic_deals(100_000, seed=3)))
+    return lambda: store.summary(("industry", "geography"), scenario="base")
+
+
+@benchmark("pipeline.end_to_end[1k deals]", items=1000)
+def bench_pipeline():
+    deals = synthetic_deals(1000)
+    client = StubClient()
+
+    def run():
+        for deal in deals:
+            cases = build_cases(generate_assumptions(deal, client=client))
+            for name in ("downside", "base", "upside"):
+                run_lbo_case(deal, cases[name])
+            sensitivity_analysis(deal, cases["base"])
+
+    return run
+
+
+@benchmark("irr.irr[1M streams, fees + recap]", items=1_000_000)
+def bench_irr():
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    hold = rng.integers(3, 8, n)
+    interim = np.full((n, 7), -1.0)
+    interim[:, 1] += np.where(rng.random(n) < 0.2, rng.uniform(0, 80, n), 0.0)
+    flows = equity_cash_flows(rng.uniform(50, 150, n), rng.uniform(0, 600, n), hold, interim)
+    return lambda: irr(flows)
+
+
+@benchmark("montecarlo.run_monte_carlo[1M paths]", items=1_000_000)
+def bench_monte_carlo():
+    deal = synthetic_deals(1)[0]
+    deal["hold_period_years"] = 5
+    return lambda: run_monte_carlo(deal, STUB_ASSUMPTIONS, n_paths=1_000_000, seed=0)
+
+
+@benchmark("export.convert_to_excel[1 deal]")
+def bench_convert_to_excel():
+    deal = synthetic_deals(1)[0]
+    cases = build_cases(STUB_ASSUMPTIONS)
+    results = {name: run_lbo_case(deal, cases[name], include_schedule=True) for name in cases}
+    sensitivities = sensitivity_analysis(deal, cases["base"])
+    return lambda: convert_to_excel(deal, STUB_ASSUMPTIONS, results, sensitivities)
+
+
+def run_benchmarks(name_filter: Optional[str] = None, repeat: int = 5, min_time: float = 0.05) -> List[Dict]:
+    """
+    Times each registered benchmark; returns one record per benchmark.
+    """
+
+    records = []
+    for bench in BENCHMARKS:
+        if name_filter and name_filter not in bench["name"]:
+            continue
+
+        func = bench["setup"]()
+        func()  # warm-up
+
+        # Loop enough times per sample that timer resolution doesn't matter
+        started = time.perf_counter()
+        func()
+        single = time.perf_counter() - started
+        number = max(1, int(min_time / single)) if single > 0 else 1000
+
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number)
+
+        best = min(samples)
+        records.append({
+            "name": bench["name"],
+            "items": bench["items"],
+            "number": number,
+            "repeat": repeat,
+            "min_s": best,
+            "median_s": statistics.median(samples),
+            "mean_s": statistics.fmean(samples),
+            "items_per_s": bench["items"] / best if best > 0 else None,
+        })
+    return records
+
+
+# ------------------------
+# Cold start
+# ------------------------
+
+# Entry points and the heavy modules that must stay off their import path
+IMPORT_TARGETS = ("batch_runner", "service", "assumption_generator", "exporter", "lbo_engine", "monte_carlo", "goal_seek")
+LAZY_IMPORTS = ("google.genai", "dotenv", "pandas", "xlsxwriter", "pyarrow")
+
+
+def import_times(modules=IMPORT_TARGETS, lazy=LAZY_IMPORTS) -> Dict:
+    """
+    Imports each module in a fresh interpreter under -X importtime and
+    reports its cumulative import time and any lazy module it pulled in.
+    """
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=here,
+        )
+        if proc.returncode != 0:
+            results[module] = {"error": proc.stderr.strip().splitlines()[-1]}
+            continue
+
+        imported = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+        results[module] = {
+            "cumulative_ms": round(imported.get(module, 0) / 1000, 1),
+            "eager_heavy_imports": [
+                heavy for heavy in lazy
+                if any(name == heavy or name.startswith(heavy + ".") for name in imported)
+            ],
+        }
+
+    results["passed"] = all(
+        "error" not in r and not r["eager_heavy_imports"] for r in results.values()
+    )
+    return results
+
+
+# ------------------------
+# Reporting
+# ------------------------
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(current: List[Dict], baseline: List[Dict], threshold: float = 1.2) -> List[Dict]:
+    """
+    Benchmarks whose best time grew by more than ``threshold`` x.
+    """
+
+    previous = {b["name"]: b for b in baseline}
+    regressions = []
+    for bench in current:
+        old = previous.get(bench["name"])
+        if old and old["min_s"] > 0 and bench["min_s"] / old["min_s"] > threshold:
+            regressions.append({
+                "name": bench["name"],
+                "baseline_s": old["min_s"],
+                "current_s": bench["min_s"],
+                "ratio": round(bench["min_s"] / old["min_s"], 3),
+            })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the LBO pipeline.")
+    parser.add_argument("-k", dest="name_filter", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("--quick", action="store_true", help="Fewer repeats and smaller golden checks.")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file.")
+    parser.add_argument("--compare", help="Baseline report to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio counted as a regression.")
+    parser.add_argument("--skip-golden", action="store_true", help="Skip numerical equivalence checks.")
+    parser.add_argument("--skip-imports", action="store_true", help="Skip the -X importtime cold-start check.")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment()}
+    if not args.skip_golden:
+        report["golden"] = golden_checks(1000 if args.quick else 5000)
+    if not args.skip_imports:
+        report["imports"] = import_times()
+    report["benchmarks"] = run_benchmarks(args.name_filter, repeat=2 if args.quick else 5)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report["benchmarks"], json.load(f)["benchmarks"], args.threshold)
+
+    for bench in report["benchmarks"]:
+        rate = f"{bench['items_per_s']:,.0f} items/s" if bench["items_per_s"] else ""
+        print(f"{bench['name']:<50} {bench['min_s'] * 1e3:>10.3f} ms  {rate}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    failed = (
+        not report.get("golden", {"passed": True})["passed"]
+        or not report.get("imports", {"passed": True})["passed"]
+        or bool(report.get("regressions"))
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
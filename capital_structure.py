@@ -0,0 +1,426 @@
+"""
+
+Multi-tranche capital structures for the LBO engine.
+
+run_lbo_case models one debt balance at one rate with a 100% cash
+sweep. This module projects a full stack instead:
+
+    tranches  - senior / TLB / mezzanine / PIK, each sized off entry
+                EBITDA or EV, with a cash rate, a PIK rate, mandatory
+                amortization and a flag for whether it takes the sweep
+    revolver  - drawn when cash after debt service is negative and
+                repaid first from excess cash
+    sweep     - share of each year's excess cash used to prepay tranches
+                in priority order; the rest builds the cash balance
+
+Cash interest is charged on average balances. Because closing balances
+depend on interest (through taxes and the sweep), each year is solved
+by fixed-point iteration, which converges in a few passes; results
+report whether every year converged within ``max_passes``.
+
+Every input may be a scalar or an array, as in project_batch, so a
+whole scenario sweep over a complex structure runs in one vectorized
+pass.
+
+
+"""
+
+from dataclasses import dataclass, fields
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from instrumentation import timed
+from lbo_engine import _unpack_batch
+
+
+@dataclass(frozen=True, slots=True)
+class Tranche:
+    """
+    One debt instrument. Size is ``ebitda_multiple`` x entry EBITDA plus
+    ``ev_percentage`` x entry EV; rates and amortization are decimals
+    per year (amortization as a share of the original principal).
+    """
+
+    name: str
+    ebitda_multiple: float = 0.0
+    ev_percentage: float = 0.0
+    rate: float = 0.0
+    pik_rate: float = 0.0
+    amortization: float = 0.0
+    prepayable: bool = True
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "Tranche":
+        return cls(**{f.name: values[f.name] for f in fields(cls) if f.name in values})
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True, slots=True)
+class Revolver:
+    """
+    Revolving facility sized at ``ebitda_multiple`` x entry EBITDA,
+    undrawn at close. ``undrawn_fee`` is charged on the unused average
+    commitment.
+    """
+
+    ebitda_multiple: float = 0.0
+    rate: float = 0.0
+    undrawn_fee: float = 0.0
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "Revolver":
+        return cls(**{f.name: values[f.name] for f in fields(cls) if f.name in values})
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True, slots=True)
+class CapitalStructure:
+    """
+    Tranches in repayment priority order, an optional revolver and the
+    sweep settings.
+    """
+
+    tranches: Tuple[Tranche, ...]
+    revolver: Optional[Revolver] = None
+    sweep: float = 1.0
+    interest_on_average: bool = True
+    max_passes: int = 25
+    tolerance: float = 1e-9
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "CapitalStructure":
+        revolver = values.get("revolver")
+        return cls(
+            tranches=tuple(Tranche.from_dict(t) for t in values["tranches"]),
+            revolver=Revolver.from_dict(revolver) if revolver else None,
+            **{
+                name: values[name]
+                for name in ("sweep", "interest_on_average", "max_passes", "tolerance")
+                if name in values
+            },
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "tranches": [t.to_dict() for t in self.tranches],
+            "revolver": self.revolver.to_dict() if self.revolver else None,
+            "sweep": self.sweep,
+            "interest_on_average": self.interest_on_average,
+            "max_passes": self.max_passes,
+            "tolerance": self.tolerance,
+        }
+
+    @classmethod
+    def single_tranche(cls, debt_percentage, interest_rate) -> "CapitalStructure":
+        """
+        The structure run_lbo_case assumes: one sweepable tranche sized
+        as a share of EV, interest on the opening balance.
+        """
+
+        return cls(
+            tranches=(Tranche("debt", ev_percentage=debt_percentage, rate=interest_rate),),
+            interest_on_average=False,
+        )
+
+
+# Illustrative mid-market stack (6.0x total leverage plus a 1.0x revolver)
+STANDARD_STRUCTURE = CapitalStructure(
+    tranches=(
+        Tranche("senior", ebitda_multiple=2.5, rate=0.07, amortization=0.05),
+        Tranche("term_loan_b", ebitda_multiple=2.0, rate=0.085, amortization=0.01),
+        Tranche("mezzanine", ebitda_multiple=1.0, rate=0.11, prepayable=False),
+        Tranche("pik_notes", ebitda_multiple=0.5, pik_rate=0.13, prepayable=False),
+    ),
+    revolver=Revolver(ebitda_multiple=1.0, rate=0.065, undrawn_fee=0.005),
+    sweep=0.75,
+)
+
+SCHEDULE_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "cash_interest",
+    "pik_interest",
+    "taxes",
+    "net_income",
+    "fcf",
+    "revolver",
+    "cash",
+)
+
+
+def _waterfall(
+    opening,
+    pik,
+    amortization_due,
+    prepayable,
+    revolver,
+    commitment,
+    cash,
+    fcf,
+    sweep
+):
+    """
+    One year of debt service given FCF: mandatory amortization, revolver
+    draw or repayment, then the sweep in priority order.
+
+    Only this year's excess cash is swept (after curing any negative
+    opening cash); cash retained in earlier years is carried forward
+    and only drawn on to cover a shortfall.
+    """
+
+    amortization = [np.minimum(due, bal + acc) for due, bal, acc in zip(amortization_due, opening, pik)]
+    flow = fcf - sum(amortization)
+
+    # Shortfalls use retained cash first, then the revolver
+    draw = np.clip(-(cash + flow), 0.0, np.maximum(commitment - revolver, 0.0))
+    excess = np.maximum(flow + np.minimum(cash, 0.0), 0.0)
+    repay = np.minimum(excess, revolver)
+
+    remaining = (excess - repay) * sweep
+    prepayments = []
+    for bal, acc, amort, can_prepay in zip(opening, pik, amortization, prepayable):
+        if not can_prepay:
+            prepayments.append(np.zeros_like(remaining))
+            continue
+        paid = np.minimum(remaining, bal + acc - amort)
+        remaining = remaining - paid
+        prepayments.append(paid)
+
+    closing = [
+        bal + acc - amort - paid
+        for bal, acc, amort, paid in zip(opening, pik, amortization, prepayments)
+    ]
+    new_cash = cash + flow + draw - repay - sum(prepayments)
+    return closing, revolver + draw - repay, new_cash, amortization, prepayments
+
+
+@timed("capital_structure.project")
+def project_structure(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    structure: CapitalStructure = STANDARD_STRUCTURE,
+    include_schedule: bool = False
+) -> Dict:
+    """
+    Projects the operating case under ``structure`` and returns
+    unrounded arrays.
+
+    The deal's ``debt_percentage`` and ``interest_rate`` are ignored;
+    leverage and pricing come from the structure. Exit equity is EV less
+    net debt (tranches + revolver - cash), so retained cash and unfunded
+    shortfalls (negative cash) both reach the sponsor. With
+    ``include_schedule`` the result carries a "schedule" dict of
+    (years, ...) arrays, with per-tranche balances, amortization and
+    prepayments under "tranches".
+    """
+
+    v = _unpack_batch(user_inputs, case_assumptions)
+    revenue, ebitda, tax_rate = v["revenue"], v["ebitda"], v["tax_rate"]
+    hold_years = v["hold_period_years"]
+    revenue_growth = v["revenue_growth"] / 100
+    margin_change = v["margin_change_bps"] / 10000
+
+    shape = np.broadcast_shapes(*(np.shape(x) for x in v.values()))
+
+    # ------------------------
+    # Operating starting point
+    # ------------------------
+    positive = revenue > 0
+    safe_revenue = np.where(positive, revenue, 1.0)
+    initial_margin = np.where(positive, ebitda / safe_revenue, 0.0)
+    initial_da_pct = np.where(positive, v["depreciation_amortization"] / safe_revenue, 0.0)
+    initial_capex_pct = np.where(positive, v["capex"] / safe_revenue, 0.0)
+
+    # ------------------------
+    # Sources and uses at entry
+    # ------------------------
+    entry_ev = ebitda * v["entry_multiple"]
+    tranches = structure.tranches
+    original = [
+        np.broadcast_to(ebitda * t.ebitda_multiple + entry_ev * t.ev_percentage, shape).astype(float)
+        for t in tranches
+    ]
+    rates = [np.asarray(t.rate, dtype=float) for t in tranches]
+    pik_rates = [np.asarray(t.pik_rate, dtype=float) for t in tranches]
+    amortization_due = [o * t.amortization for o, t in zip(original, tranches)]
+    prepayable = [t.prepayable for t in tranches]
+
+    facility = structure.revolver or Revolver()
+    commitment = np.broadcast_to(ebitda * facility.ebitda_multiple, shape)
+    revolver_rate = np.asarray(facility.rate, dtype=float)
+    undrawn_fee = np.asarray(facility.undrawn_fee, dtype=float)
+
+    total_debt = sum(original) if original else np.zeros(shape)
+    entry_equity = np.broadcast_to(entry_ev - total_debt, shape)
+
+    # ------------------------
+    # Project cash flows
+    # ------------------------
+    balances = list(original)
+    revolver = np.zeros(shape)
+    cash = np.zeros(shape)
+    current_revenue = np.broadcast_to(revenue, shape)
+    current_margin = np.broadcast_to(initial_margin, shape)
+    current_ebitda = np.zeros(shape)
+    revolver_peak = np.zeros(shape)
+    min_cash = np.zeros(shape)
+
+    max_hold = int(hold_years.max())
+    max_passes = 0
+    converged = True
+    schedule = {name: [] for name in SCHEDULE_FIELDS}
+    tranche_schedule = {t.name: {"balance": [], "amortization": [], "prepayment": []} for t in tranches}
+
+    for year in range(max_hold):
+        next_revenue = current_revenue * (1 + revenue_growth)
+        next_margin = np.maximum(0, np.minimum(current_margin + margin_change, 1))
+        next_ebitda = next_revenue * next_margin
+        da = next_revenue * initial_da_pct
+        capex = next_revenue * initial_capex_pct
+
+        # PIK accrues on the opening balance and is paid at maturity
+        pik = [balance * r for balance, r in zip(balances, pik_rates)]
+        pik_interest = sum(pik) if pik else np.zeros(shape)
+
+        # Start from opening balances; iterate to interest on averages
+        closing, next_revolver = balances, revolver
+        year_converged = False
+        for passes in range(1, structure.max_passes + 1):
+            average = [(o + c) / 2 for o, c in zip(balances, closing)] if structure.interest_on_average else balances
+            average_revolver = (revolver + next_revolver) / 2 if structure.interest_on_average else revolver
+            cash_interest = (
+                sum(a * r for a, r in zip(average, rates))
+                + average_revolver * revolver_rate
+                + (commitment - average_revolver) * undrawn_fee
+            )
+
+            ebt = next_ebitda - da - cash_interest - pik_interest
+            taxes = np.maximum(ebt, 0) * tax_rate
+            fcf = next_ebitda - capex - taxes - cash_interest
+
+            new_closing, new_revolver, new_cash, amortization, prepayments = _waterfall(
+                balances, pik, amortization_due, prepayable, revolver, commitment, cash, fcf, structure.sweep
+            )
+            if not structure.interest_on_average:
+                year_converged = True
+                break
+
+            change = max(
+                [np.max(np.abs(n - c), initial=0.0) for n, c in zip(new_closing, closing)]
+                + [np.max(np.abs(new_revolver - next_revolver), initial=0.0)]
+            )
+            closing, next_revolver = new_closing, new_revolver
+            if change <= structure.tolerance * max(1.0, float(np.max(total_debt, initial=0.0))):
+                year_converged = True
+                break
+        max_passes = max(max_passes, passes)
+        converged = converged and year_converged
+
+        # Cases with a shorter hold period keep their exit-year state
+        active = year < hold_years
+        balances = [np.where(active, n, b) for n, b in zip(new_closing, balances)]
+        revolver = np.where(active, new_revolver, revolver)
+        cash = np.where(active, new_cash, cash)
+        current_revenue = np.where(active, next_revenue, current_revenue)
+        current_margin = np.where(active, next_margin, current_margin)
+        current_ebitda = np.where(active, next_ebitda, current_ebitda)
+        revolver_peak = np.maximum(revolver_peak, revolver)
+        min_cash = np.minimum(min_cash, cash)
+
+        if include_schedule:
+            for name, value in zip(
+                SCHEDULE_FIELDS,
+                (next_revenue, next_ebitda, da, capex, cash_interest, pik_interest, taxes, ebt - taxes, fcf, revolver, cash),
+            ):
+                schedule[name].append(np.broadcast_to(value, shape))
+            for t, bal, amort, paid in zip(tranches, balances, amortization, prepayments):
+                tranche_schedule[t.name]["balance"].append(bal)
+                tranche_schedule[t.name]["amortization"].append(np.broadcast_to(amort, shape))
+                tranche_schedule[t.name]["prepayment"].append(paid)
+
+    # ------------------------
+    # Exit valuation and returns
+    # ------------------------
+    net_debt = (sum(balances) if balances else 0.0) + revolver - cash
+    exit_equity = current_ebitda * v["exit_multiple"] - net_debt
+
+    entry_positive = entry_equity > 0
+    money_multiple = np.where(
+        entry_positive, exit_equity / np.where(entry_positive, entry_equity, 1.0), 0.0
+    )
+    mm_positive = money_multiple > 0
+    irr = np.where(
+        mm_positive,
+        np.power(np.where(mm_positive, money_multiple, 1.0), 1 / hold_years) - 1,
+        0.0,
+    )
+
+    results = {
+        "entry_equity": entry_equity,
+        "exit_equity": np.broadcast_to(exit_equity, shape),
+        "money_multiple": np.broadcast_to(money_multiple, shape),
+        "irr": np.broadcast_to(irr, shape),
+        "entry_debt": np.broadcast_to(total_debt, shape),
+        "exit_net_debt": np.broadcast_to(net_debt, shape),
+        "revolver_peak": revolver_peak,
+        "min_cash": min_cash,
+        "passes": max_passes,
+        "converged": converged,
+    }
+    if include_schedule:
+        results["schedule"] = {name: np.stack(values) for name, values in schedule.items()}
+        results["schedule"]["tranches"] = {
+            name: {key: np.stack(values) for key, values in parts.items()}
+            for name, parts in tranche_schedule.items()
+        }
+    return results
+
+
+def run_structured_case(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    structure: CapitalStructure = STANDARD_STRUCTURE,
+    include_schedule: bool = False
+) -> Dict:
+    """
+    One scenario under ``structure``, shaped like run_lbo_case output
+    (money multiple and IRR rounded the same way), plus leverage and
+    liquidity figures.
+    """
+
+    projected = project_structure(user_inputs, case_assumptions, structure, include_schedule)
+    results = {
+        "entry_equity": float(projected["entry_equity"]),
+        "exit_equity": float(projected["exit_equity"]),
+        "money_multiple": round(float(projected["money_multiple"]), 2),
+        "irr": round(float(projected["irr"]) * 100, 2),
+        "entry_debt": float(projected["entry_debt"]),
+        "exit_net_debt": float(projected["exit_net_debt"]),
+        "revolver_peak": float(projected["revolver_peak"]),
+        "min_cash": float(projected["min_cash"]),
+        "converged": projected["converged"],
+    }
+
+    if include_schedule:
+        sched = projected["schedule"]
+        results["schedule"] = [
+            {
+                "year": year + 1,
+                **{name: float(sched[name][year]) for name in SCHEDULE_FIELDS},
+                "interest": float(sched["cash_interest"][year] + sched["pik_interest"][year]),
+                "debt": float(sum(t["balance"][year] for t in sched["tranches"].values())),
+                **{
+                    f"{name}_balance": float(parts["balance"][year])
+                    for name, parts in sched["tranches"].items()
+                },
+            }
+            for year in range(len(sched["revenue"]))
+        ]
+    return results
@@ -8,6 +8,12 @@ single-point assumptions for Downside, Base, and Upside cases.
 
 from typing import Dict
 
+from instrumentation import timed
+from lbo_types import CaseBatch
+
+
+CASE_ORDER = ("downside", "base", "upside")
+
 
 def midpoint(range_values):
     """
@@ -18,6 +24,7 @@ def midpoint(range_values):
     return (low + high) / 2
 
 
+@timed("cases.build_cases")
 def build_cases(ai_assumptions: Dict) -> Dict:
     """
     Builds downside, base, and upside cases from AI assumption ranges.
@@ -68,3 +75,18 @@ def build_cases(ai_assumptions: Dict) -> Dict:
     cases["upside"]["margin_change_bps"] = ai_assumptions["margin_change_bps"]["upside"]
 
     return cases
+
+
+def build_case_batch(ai_assumptions: Dict) -> CaseBatch:
+    """
+    Same cases as build_cases, as one CaseBatch in CASE_ORDER.
+    """
+
+    ranged = {
+        field: [midpoint(ai_assumptions[field][case]) for case in CASE_ORDER]
+        for field in ("entry_multiple", "revenue_growth", "exit_multiple")
+    }
+    return CaseBatch(
+        margin_change_bps=[ai_assumptions["margin_change_bps"][case] for case in CASE_ORDER],
+        **ranged
+    )
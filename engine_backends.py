@@ -0,0 +1,373 @@
+"""
+
+Interchangeable implementations of the batch projection.
+
+    python  - the scalar case kernel below, looped in the interpreter;
+              the reference the others are checked against
+    numpy   - lbo_engine.project_batch (vectorized, one temporary per
+              line item and year)
+    numba   - the same scalar kernel compiled with Numba and run over
+              cases in parallel (prange), with no per-year temporaries;
+              only when numba is installed
+
+``project`` takes the same inputs as project_batch and returns the same
+four unrounded result arrays; with a capital ``structure`` the cases are
+projected by capital_structure.project_structure (vectorized NumPy)
+instead. The backend is chosen once per process:
+LBO_ENGINE_BACKEND ("python", "numpy", "numba" or "auto") when set,
+else the fastest one available. ``check_backends`` runs every available
+backend on the same cases and reports disagreements.
+
+
+"""
+
+import importlib.util
+import math
+import threading
+import warnings
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import settings
+from capital_structure import project_structure
+from instrumentation import count, timed
+from lbo_engine import CASE_FIELDS, RESULT_DTYPE, USER_INPUT_FIELDS, _round2, _unpack_batch, project_batch
+from lbo_types import as_mapping
+
+
+# Fastest first; "auto" picks the first available
+PREFERENCE = ("numba", "numpy", "python")
+
+RESULT_FIELDS = RESULT_DTYPE.names
+KERNEL_FIELDS = USER_INPUT_FIELDS + CASE_FIELDS
+
+# Smaller batches run in-process: pool dispatch would cost more than the
+# batch, and in-process runs keep broadcast axes (e.g. a grid's rows and
+# columns) instead of flattening them
+PARALLEL_MIN_CASES = 100_000
+
+
+# ------------------------
+# Scalar kernel
+# ------------------------
+
+def _project_case(
+    revenue, ebitda, da, capex, tax_rate, debt_pct, interest_rate, hold_years,
+    entry_multiple, revenue_growth, exit_multiple, margin_change_bps
+):
+    """
+    One case, operation for operation as run_lbo_case (unrounded).
+    Plain arithmetic only, so Numba can compile it unchanged.
+    """
+
+    revenue_growth = revenue_growth / 100
+    margin_change = margin_change_bps / 10000
+
+    initial_margin = ebitda / revenue if revenue > 0 else 0.0
+    initial_da_pct = da / revenue if revenue > 0 else 0.0
+    initial_capex_pct = capex / revenue if revenue > 0 else 0.0
+
+    entry_ev = ebitda * entry_multiple
+    entry_debt = entry_ev * debt_pct
+    entry_equity = entry_ev - entry_debt
+
+    debt = entry_debt
+    current_revenue = revenue
+    current_margin = initial_margin
+    current_ebitda = 0.0
+    for _ in range(hold_years):
+        current_revenue *= (1 + revenue_growth)
+        current_margin = max(0.0, min(current_margin + margin_change, 1.0))
+        current_ebitda = current_revenue * current_margin
+
+        current_da = current_revenue * initial_da_pct
+        current_capex = current_revenue * initial_capex_pct
+        interest = debt * interest_rate
+
+        ebt = (current_ebitda - current_da) - interest
+        taxes = max(ebt, 0.0) * tax_rate
+        fcf = (ebt - taxes) + current_da - current_capex
+        debt = max(debt - fcf, 0.0)
+
+    exit_equity = current_ebitda * exit_multiple - debt
+    money_multiple = exit_equity / entry_equity if entry_equity > 0 else 0.0
+    irr = money_multiple ** (1 / hold_years) - 1 if money_multiple > 0 else 0.0
+    return entry_equity, exit_equity, money_multiple, irr
+
+
+def _python_kernel(columns: List[np.ndarray], out: np.ndarray) -> None:
+    for i, row in enumerate(zip(*(column.tolist() for column in columns))):
+        out[i] = _project_case(*row)
+
+
+def _flatten(user_inputs: Dict, case_assumptions: Dict):
+    """
+    Broadcast inputs as contiguous 1-D columns in KERNEL_FIELDS order,
+    plus the broadcast shape.
+    """
+
+    values = _unpack_batch(user_inputs, case_assumptions)
+    arrays = np.broadcast_arrays(*(values[field] for field in KERNEL_FIELDS))
+    shape = arrays[0].shape
+    columns = [
+        np.ascontiguousarray(array, dtype=np.int64 if field == "hold_period_years" else float).reshape(-1)
+        for field, array in zip(KERNEL_FIELDS, arrays)
+    ]
+    return columns, shape
+
+
+def _unflatten(out: np.ndarray, shape) -> Dict[str, np.ndarray]:
+    return {field: out[:, j].reshape(shape) for j, field in enumerate(RESULT_FIELDS)}
+
+
+def _project_python(user_inputs: Dict, case_assumptions: Dict) -> Dict[str, np.ndarray]:
+    columns, shape = _flatten(user_inputs, case_assumptions)
+    out = np.empty((len(columns[0]), len(RESULT_FIELDS)))
+    _python_kernel(columns, out)
+    return _unflatten(out, shape)
+
+
+def _project_numpy(user_inputs: Dict, case_assumptions: Dict) -> Dict[str, np.ndarray]:
+    return project_batch(user_inputs, case_assumptions)
+
+
+# ------------------------
+# Numba
+# ------------------------
+
+# Bound to numba.prange and the compiled case kernel by _compile_numba;
+# Numba reads module globals at compile time
+_prange = range
+_jit_case = None
+_numba_kernel = None
+_numba_lock = threading.Lock()
+
+
+def _numba_loop(
+    revenue, ebitda, da, capex, tax_rate, debt_pct, interest_rate, hold_years,
+    entry_multiple, revenue_growth, exit_multiple, margin_change_bps, out
+):
+    for i in _prange(len(revenue)):
+        result = _jit_case(
+            revenue[i], ebitda[i], da[i], capex[i], tax_rate[i], debt_pct[i], interest_rate[i],
+            hold_years[i], entry_multiple[i], revenue_growth[i], exit_multiple[i], margin_change_bps[i],
+        )
+        out[i, 0] = result[0]
+        out[i, 1] = result[1]
+        out[i, 2] = result[2]
+        out[i, 3] = result[3]
+
+
+def _compile_numba() -> Callable:
+    """
+    Compiles the kernel on first use (cached on disk by Numba, so later
+    processes skip most of the compile).
+    """
+
+    global _prange, _jit_case, _numba_kernel
+
+    with _numba_lock:
+        if _numba_kernel is None:
+            import numba
+
+            _prange = numba.prange
+            _jit_case = numba.njit(cache=True, nogil=True)(_project_case)
+            count("engine_backends.numba_compile")
+            _numba_kernel = numba.njit(parallel=True, cache=True, nogil=True)(_numba_loop)
+    return _numba_kernel
+
+
+def _project_numba(user_inputs: Dict, case_assumptions: Dict) -> Dict[str, np.ndarray]:
+    kernel = _numba_kernel or _compile_numba()
+    columns, shape = _flatten(user_inputs, case_assumptions)
+    out = np.empty((len(columns[0]), len(RESULT_FIELDS)))
+    kernel(*columns, out)
+    return _unflatten(out, shape)
+
+
+# ------------------------
+# Registry
+# ------------------------
+
+BACKENDS = {
+    "python": (_project_python, lambda: True),
+    "numpy": (_project_numpy, lambda: True),
+    "numba": (_project_numba, lambda: importlib.util.find_spec("numba") is not None),
+}
+
+_active = None
+
+
+def available_backends() -> List[str]:
+    return [name for name in PREFERENCE if BACKENDS[name][1]()]
+
+
+def select_backend(requested: Optional[str] = None) -> str:
+    """
+    Resolves a backend name; None or "auto" means the fastest available.
+    A configured backend that is not installed falls back with a warning.
+    """
+
+    requested = (requested or "auto").strip().lower()
+    if requested != "auto" and requested not in BACKENDS:
+        raise ValueError(f"Unknown engine backend: {requested} (choose from {', '.join(BACKENDS)} or auto)")
+    available = available_backends()
+    if requested == "auto":
+        return available[0]
+    if requested not in available:
+        warnings.warn(f"Engine backend {requested} is not installed; using {available[0]}")
+        return available[0]
+    return requested
+
+
+def active_backend() -> str:
+    """
+    Backend used when ``project`` is called without one, resolved from
+    LBO_ENGINE_BACKEND on first use.
+    """
+
+    global _active
+
+    if _active is None:
+        _active = select_backend(settings.get("LBO_ENGINE_BACKEND") or None)
+    return _active
+
+
+def set_backend(name: Optional[str]) -> str:
+    """
+    Overrides the process-wide backend (None re-reads the setting).
+    """
+
+    global _active
+
+    _active = None if name is None else select_backend(name)
+    return active_backend()
+
+
+@timed("engine_backends.project")
+def project(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    backend: Optional[str] = None,
+    structure=None
+) -> Dict[str, np.ndarray]:
+    """
+    project_batch's results (entry_equity, exit_equity, money_multiple,
+    irr; unrounded, shaped like the broadcast inputs) from the chosen
+    or active backend, or under a capital_structure.CapitalStructure.
+    """
+
+    if structure is not None:
+        count("engine_backends.structured")
+        projected = project_structure(user_inputs, case_assumptions, structure)
+        return {field: projected[field] for field in RESULT_FIELDS}
+
+    name = active_backend() if backend is None else select_backend(backend)
+    count(f"engine_backends.{name}")
+    return BACKENDS[name][0](user_inputs, case_assumptions)
+
+
+def run_batch(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    backend: Optional[str] = None,
+    structure=None
+) -> np.ndarray:
+    """
+    run_lbo_batch on the chosen or active backend (or under a capital
+    ``structure``): a RESULT_DTYPE array with money multiple and IRR
+    rounded as run_lbo_case rounds them.
+    """
+
+    projected = project(user_inputs, case_assumptions, backend, structure)
+    results = np.empty(projected["irr"].shape, dtype=RESULT_DTYPE)
+    results["entry_equity"] = projected["entry_equity"]
+    results["exit_equity"] = projected["exit_equity"]
+    results["money_multiple"] = _round2(projected["money_multiple"])
+    results["irr"] = _round2(projected["irr"] * 100)
+    return results
+
+
+def _parallel_kernel(arrays: Dict, constants) -> np.ndarray:
+    user_inputs, case_assumptions, backend, structure = constants
+    return run_batch(user_inputs, {**case_assumptions, **arrays}, backend, structure)
+
+
+def run_batch_parallel(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
+    structure=None
+) -> np.ndarray:
+    """
+    run_batch spread over the scheduler's process pool, on the same
+    backend in every worker. Batches under PARALLEL_MIN_CASES (or with
+    ``workers`` <= 1) run in-process with their broadcast shapes.
+    """
+
+    user_inputs = dict(as_mapping(user_inputs))
+    case_assumptions = dict(as_mapping(case_assumptions))
+    varying = {
+        name: np.asarray(value)
+        for source in (user_inputs, case_assumptions)
+        for name, value in source.items()
+        if name in KERNEL_FIELDS and np.ndim(value) > 0
+    }
+    shape = np.broadcast_shapes(*(value.shape for value in varying.values()))
+    if (workers is not None and workers <= 1) or math.prod(shape) < PARALLEL_MIN_CASES:
+        return run_batch(user_inputs, case_assumptions, backend, structure)
+
+    from scheduler import map_arrays
+
+    name = active_backend() if backend is None else select_backend(backend)
+    arrays = {field: np.broadcast_to(value, shape).ravel() for field, value in varying.items()}
+    constants = (
+        {k: v for k, v in user_inputs.items() if k not in varying},
+        {k: v for k, v in case_assumptions.items() if k not in varying},
+        name,
+        structure,
+    )
+    return map_arrays(_parallel_kernel, arrays, RESULT_DTYPE, constants, workers=workers).reshape(shape)
+
+
+# ------------------------
+# Equivalence
+# ------------------------
+
+def check_backends(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    reference: str = "python",
+    rtol: float = 1e-12
+) -> Dict[str, Dict]:
+    """
+    Runs every available backend on the same cases and compares them
+    with ``reference``: "max_rel_error" on the unrounded results and
+    "mismatches", the number of cases whose rounded results (as
+    run_lbo_case reports them) differ.
+    """
+
+    expected = project(user_inputs, case_assumptions, reference)
+    expected_rounded = run_batch(user_inputs, case_assumptions, reference)
+    report = {}
+    for name in available_backends():
+        if name == reference:
+            continue
+        got = project(user_inputs, case_assumptions, name)
+        error = 0.0
+        for field in RESULT_FIELDS:
+            a, b = np.asarray(expected[field]), np.asarray(got[field])
+            scale = np.maximum(np.abs(a), 1.0)
+            error = max(error, float(np.max(np.abs(a - b) / scale)) if a.size else 0.0)
+        rounded = run_batch(user_inputs, case_assumptions, name)
+        mismatches = sum(
+            int(np.count_nonzero(rounded[field] != expected_rounded[field])) for field in ("money_multiple", "irr")
+        )
+        report[name] = {
+            "max_rel_error": error,
+            "mismatches": mismatches,
+            "passed": error <= rtol,
+        }
+    return report
@@ -1,32 +1,273 @@
-import pandas as pd
+"""
+
+Writes LBO models to Excel.
+
+Workbooks are written row by row through xlsxwriter's constant_memory
+mode, so only the current row of each sheet is held in memory. Output
+goes to an in-memory buffer (the app's download) or straight to a file
+path (large multi-deal books).
+
+
+"""
+
+import re
+from collections.abc import Mapping
 from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+from instrumentation import timed
+from lbo_types import as_mapping
+
+
+# Excel's hard row limit; long sheets roll over to "<name> (2)", ...
+MAX_SHEET_ROWS = 1_048_576
+
+# Excel's limits on sheet names
+MAX_SHEET_NAME = 31
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+SCHEDULE_COLUMNS = [
+    ("year", "Year"),
+    ("revenue", "Revenue"),
+    ("ebitda", "EBITDA"),
+    ("depreciation_amortization", "D&A"),
+    ("capex", "CapEx"),
+    ("interest", "Interest"),
+    ("taxes", "Taxes"),
+    ("net_income", "Net Income"),
+    ("fcf", "Free Cash Flow"),
+    ("debt", "Ending Debt"),
+]
+
+SUMMARY_COLUMNS = [
+    ("irr", "IRR (%)"),
+    ("money_multiple", "Money Multiple (x)"),
+    ("entry_equity", "Entry Equity"),
+    ("exit_equity", "Exit Equity"),
+]
+
+
+class _SheetWriter:
+    """
+    Appends rows to a worksheet, rolling over to a new sheet at the
+    Excel row limit.
+    """
+
+    def __init__(self, workbook, name: str, header, header_format, max_rows: int = MAX_SHEET_ROWS):
+        self.workbook = workbook
+        self.name = name
+        self.header = list(header)
+        self.header_format = header_format
+        self.max_rows = max_rows
+        self.parts = 0
+        self._new_sheet()
+
+    def _new_sheet(self) -> None:
+        self.parts += 1
+        name = self.name if self.parts == 1 else f"{self.name[:25]} ({self.parts})"
+        self.sheet = self.workbook.add_worksheet(name)
+        self.row = 0
+        if self.header:
+            self.write(self.header, self.header_format)
+
+    def write(self, values, cell_format=None) -> None:
+        if self.row >= self.max_rows:
+            self._new_sheet()
+        self.sheet.write_row(self.row, 0, values, cell_format)
+        self.row += 1
+
+    def skip(self, rows: int = 1) -> None:
+        self.row += rows
+
+
+def _sheet_name(workbook, name) -> str:
+    """
+    ``name`` as a valid sheet name not yet in ``workbook``: forbidden
+    characters dropped, truncated, and numbered if already taken.
+    """
+
+    base = INVALID_SHEET_CHARS.sub("", str(name)).strip().strip("'") or "Sheet"
+    taken = {sheet.get_name().lower() for sheet in workbook.worksheets()}
+    candidate, n = base[:MAX_SHEET_NAME], 1
+    while candidate.lower() in taken:
+        n += 1
+        suffix = f" ({n})"
+        candidate = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+    return candidate
+
+
+def _workbook(path: Optional[str]):
+    """
+    Opens a constant-memory workbook on ``path`` or on a fresh buffer.
+    """
+
+    import xlsxwriter
+
+    target = path if path is not None else BytesIO()
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "nan_inf_to_errors": True})
+    header = workbook.add_format({"bold": True, "bottom": 1})
+    return workbook, target, header
+
+
+def _cell(value):
+    # Lists and other containers are written as text, as before
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+def _write_summary(workbook, header, all_results: Dict) -> None:
+    sheet = _SheetWriter(workbook, "Executive Summary", ["Scenario"] + [t for _, t in SUMMARY_COLUMNS], header)
+    for case, metrics in all_results.items():
+        sheet.write([case.capitalize()] + [metrics[k] for k, _ in SUMMARY_COLUMNS])
+
+
+def _write_inputs(workbook, header, user_inputs: Dict) -> None:
+    sheet = _SheetWriter(workbook, "Deal Inputs", ["Input", "Value"], header)
+    for key, value in user_inputs.items():
+        sheet.write([key, _cell(value)])
+
+
+def _write_assumptions(workbook, header, ai_assumptions: Dict) -> None:
+    sheet = _SheetWriter(workbook, "AI Assumptions", ["Metric", "Case", "Value"], header)
+    for key, value in ai_assumptions.items():
+        if isinstance(value, dict):
+            for case, val in value.items():
+                sheet.write([key, case, str(val)])
+        else:
+            sheet.write([key, "N/A", _cell(value)])
+
+
+def _schedule_rows(schedule):
+    """
+    Yearly rows from a list of dicts (run_lbo_case) or a mapping of
+    column arrays (ScheduleTable.case).
+    """
+
+    if isinstance(schedule, Mapping):
+        return zip(*(schedule[k].tolist() for k, _ in SCHEDULE_COLUMNS))
+    return ([year[k] for k, _ in SCHEDULE_COLUMNS] for year in schedule)
+
+
+def _write_schedules(sheet: _SheetWriter, prefix, all_results: Dict) -> None:
+    for case, metrics in all_results.items():
+        for row in _schedule_rows(metrics.get("schedule", ())):
+            sheet.write(list(prefix) + [case.capitalize()] + list(row))
+
+
+def _write_sensitivities(workbook, header, sensitivities: Dict) -> None:
+    one_way = {k: v for k, v in sensitivities.items() if isinstance(v, dict)}
+    grids = {k: v for k, v in sensitivities.items() if not isinstance(v, dict)}
+
+    if one_way:
+        sheet = _SheetWriter(workbook, "Sensitivities", ["Variable", "Value", "IRR (%)"], header)
+        for variable, table in one_way.items():
+            for value, irr in sorted(table.items()):
+                sheet.write([variable, value, irr])
+
+    # Two-way grids: DataFrames indexed by row values, one column per column value
+    for name, grid in grids.items():
+        corner = f"{grid.index.name} \\ {grid.columns.name}"
+        sheet = _SheetWriter(
+            workbook, _sheet_name(workbook, name), [corner] + [float(c) for c in grid.columns], header
+        )
+        for label, row in zip(grid.index, grid.to_numpy()):
+            sheet.write([float(label)] + [float(v) for v in row])
+
+
+def _write_monte_carlo(workbook, header, monte_carlo: Dict) -> None:
+    sheet = _SheetWriter(workbook, "Monte Carlo", ["Statistic", "IRR (%)", "Money Multiple (x)"], header)
+    irr, moic = monte_carlo["irr"], monte_carlo["money_multiple"]
+    sheet.write(["Mean", irr["mean"], moic["mean"]])
+    sheet.write(["Std Dev", irr["std"], moic["std"]])
+    for p in irr["percentiles"]:
+        sheet.write([f"P{p}", irr["percentiles"][p], moic["percentiles"][p]])
+    sheet.skip()
+    sheet.write(["Paths", monte_carlo["n_paths"]])
+    sheet.write(["Hurdle IRR (%)", monte_carlo["hurdle_irr"]])
+    sheet.write(["P(IRR ≥ hurdle)", monte_carlo["prob_irr_above_hurdle"]])
+    sheet.write(["P(capital loss)", monte_carlo["prob_capital_loss"]])
+
+
+@timed("export.convert_to_excel")
+def convert_to_excel(
+    user_inputs: Dict,
+    ai_assumptions: Dict,
+    all_results: Dict,
+    sensitivities: Optional[Dict] = None,
+    monte_carlo: Optional[Dict] = None,
+    path: Optional[str] = None
+):
+    """
+    Builds the single-deal workbook.
+
+    Inputs and results may be dicts or the typed records from
+    lbo_types. Case results that carry a "schedule" (run_lbo_case with
+    include_schedule=True, or one case of a ScheduleTable) are written
+    to a Projections sheet.
+    ``sensitivities`` may mix one-way tables (dicts) and two-way grids
+    (DataFrames). Returns the workbook bytes, or ``path`` when writing
+    to a file.
+    """
+
+    workbook, target, header = _workbook(path)
+    all_results = {case: as_mapping(metrics) for case, metrics in all_results.items()}
+    user_inputs = as_mapping(user_inputs)
+
+    _write_summary(workbook, header, all_results)
+    _write_inputs(workbook, header, user_inputs)
+    _write_assumptions(workbook, header, ai_assumptions)
+
+    if any("schedule" in metrics for metrics in all_results.values()):
+        sheet = _SheetWriter(workbook, "Projections", ["Scenario"] + [t for _, t in SCHEDULE_COLUMNS], header)
+        _write_schedules(sheet, (), all_results)
+
+    if sensitivities:
+        _write_sensitivities(workbook, header, sensitivities)
+
+    if monte_carlo:
+        _write_monte_carlo(workbook, header, monte_carlo)
+
+    workbook.close()
+    return path if path is not None else target.getvalue()
+
+
+@timed("export.write_deal_book")
+def write_deal_book(deals: Iterable[Dict], path: Optional[str] = None, include_schedules: bool = True):
+    """
+    Streams many deals into one workbook.
+
+    ``deals`` is an iterable (a generator is fine) of dicts with
+    "deal_id", "user_inputs" and "results" (case -> run_lbo_case
+    output). Each deal adds one row per case to the Deals sheet and its
+    yearly schedule to the long-format Schedules sheet. Deals are
+    consumed one at a time, so the book never has to fit in memory.
+    """
+
+    workbook, target, header = _workbook(path)
+
+    deals_sheet = _SheetWriter(
+        workbook,
+        "Deals",
+        ["Deal", "Industry", "Geography", "Scenario"] + [t for _, t in SUMMARY_COLUMNS],
+        header,
+    )
+    schedule_sheet = None
+    if include_schedules:
+        schedule_sheet = _SheetWriter(
+            workbook, "Schedules", ["Deal", "Scenario"] + [t for _, t in SCHEDULE_COLUMNS], header
+        )
+
+    for deal in deals:
+        inputs = as_mapping(deal.get("user_inputs", {}))
+        results = {case: as_mapping(metrics) for case, metrics in deal["results"].items()}
+        for case, metrics in results.items():
+            deals_sheet.write(
+                [deal["deal_id"], inputs.get("industry"), inputs.get("geography"), case.capitalize()]
+                + [metrics[k] for k, _ in SUMMARY_COLUMNS]
+            )
+        if schedule_sheet is not None:
+            _write_schedules(schedule_sheet, (deal["deal_id"],), results)
 
-def convert_to_excel(user_inputs, ai_assumptions, all_results):
-    output = BytesIO()
-     
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        
-        summary_data = []
-        for case, metrics in all_results.items():
-            summary_data.append({
-                "Scenario": case.capitalize(),
-                "IRR (%)": metrics["irr"],
-                "Money Multiple (x)": metrics["money_multiple"],
-                "Entry Equity": metrics["entry_equity"],
-                "Exit Equity": metrics["exit_equity"]
-            })
-        pd.DataFrame(summary_data).to_excel(writer, sheet_name="Executive Summary", index=False)
-
-        pd.DataFrame(user_inputs.items(), columns=["Input", "Value"]).to_excel(writer, sheet_name="Deal Inputs", index=False)
-
-     
-        flat_assumptions = []
-        for key, value in ai_assumptions.items():
-            if isinstance(value, dict):
-                for case, val in value.items():
-                    flat_assumptions.append({"Metric": key, "Case": case, "Value": str(val)})
-            else:
-                flat_assumptions.append({"Metric": key, "Case": "N/A", "Value": value})
-        pd.DataFrame(flat_assumptions).to_excel(writer, sheet_name="AI Assumptions", index=False)
-
-    return output.getvalue()
\ No newline at end of file
+    workbook.close()
+    return path if path is not None else target.getvalue()
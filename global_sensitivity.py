@@ -0,0 +1,432 @@
+"""
+
+Global (variance-based) sensitivity analysis over every deal driver.
+
+One-way tables move one variable with the rest pinned at the base case;
+here all drivers move together across their ranges and each is ranked
+by its Sobol indices:
+
+    first order  - share of the metric's variance explained by the
+                   driver alone
+    total order  - share it explains including every interaction with
+                   the other drivers
+
+Points come from a low-discrepancy sequence (scrambled Sobol through
+scipy when installed, else a randomly shifted Halton sequence, or Latin
+hypercube) and the Saltelli A / B / AB_i design is run through the batch
+engine in one call per round: N * (d + 2) evaluations for d drivers.
+N doubles each round until the indices stop moving, and bootstrap
+intervals are reported with every estimate.
+
+``tornado`` is the cheap companion: each driver swung to the low and
+high end of its range alone (2 * d evaluations).
+
+
+"""
+
+import warnings
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from instrumentation import count, stage, timed
+from engine_backends import project
+from lbo_types import as_mapping
+from monte_carlo import assumption_ranges
+from sensitivity_analysis import VARIABLE_BOUNDS, base_value
+
+
+DRIVERS = (
+    "entry_multiple",
+    "exit_multiple",
+    "revenue_growth",
+    "margin_change_bps",
+    "debt_percentage",
+    "interest_rate",
+    "tax_rate",
+    "capex_intensity",
+)
+
+# Half-width of each driver's range around the base case when no AI
+# range is given, in the driver's own units
+DEFAULT_SPANS = {
+    "entry_multiple": 1.0,
+    "exit_multiple": 1.0,
+    "revenue_growth": 2.0,
+    "margin_change_bps": 100.0,
+    "debt_percentage": 0.1,
+    "interest_rate": 0.02,
+    "tax_rate": 0.05,
+    "capex_intensity": 0.02,
+}
+
+DRIVER_BOUNDS = {**VARIABLE_BOUNDS, "capex_intensity": (0, None)}
+
+SAMPLERS = ("sobol", "halton", "lhs", "random")
+
+METRICS = ("irr", "money_multiple")
+
+
+def driver_value(user_inputs: Dict, base_case: Dict, driver: str) -> float:
+    """
+    Base-case value of a driver; capex intensity is capex / revenue.
+    """
+
+    if driver == "capex_intensity":
+        deal = as_mapping(user_inputs)
+        return deal["capex"] / deal["revenue"] if deal["revenue"] > 0 else 0.0
+    return float(base_value(user_inputs, base_case, driver))
+
+
+def driver_ranges(
+    user_inputs: Dict,
+    base_case: Dict,
+    ai_assumptions: Optional[Dict] = None,
+    case: str = "full",
+    spans: Optional[Dict[str, float]] = None
+) -> Dict[str, Tuple[float, float]]:
+    """
+    (low, high) per driver: DEFAULT_SPANS either side of the base case,
+    clipped to DRIVER_BOUNDS, with the four case assumptions taken from
+    the AI ranges (see monte_carlo.assumption_ranges) when given.
+    """
+
+    spans = {**DEFAULT_SPANS, **(spans or {})}
+    ranges = {}
+    for driver in DRIVERS:
+        center = driver_value(user_inputs, base_case, driver)
+        low, high = center - spans[driver], center + spans[driver]
+        floor, cap = DRIVER_BOUNDS.get(driver, (None, None))
+        ranges[driver] = (
+            low if floor is None else max(low, floor),
+            high if cap is None else min(high, cap),
+        )
+    if ai_assumptions is not None:
+        ranges.update(assumption_ranges(ai_assumptions, case))
+    return ranges
+
+
+# ------------------------
+# Sampling
+# ------------------------
+
+def _primes(n: int) -> List[int]:
+    primes, candidate = [], 2
+    while len(primes) < n:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def _radical_inverse(index: np.ndarray, base: int) -> np.ndarray:
+    index = index.copy()
+    result = np.zeros(len(index))
+    scale = 1.0 / base
+    while np.any(index):
+        result += scale * (index % base)
+        index //= base
+        scale /= base
+    return result
+
+
+class UnitSampler:
+    """
+    Points in the unit hypercube. Successive ``draw`` calls continue the
+    sequence (Sobol, Halton), so doubling N keeps the earlier points and
+    their balance; Latin hypercube draws a fresh stratified block each
+    time. "sobol" falls back to Halton when scipy is not installed.
+    """
+
+    def __init__(self, dims: int, method: str = "sobol", seed: Optional[int] = None):
+        if method not in SAMPLERS:
+            raise ValueError(f"Unknown sampler: {method}")
+        self.dims = dims
+        self.rng = np.random.default_rng(seed)
+        self._sobol = None
+        if method == "sobol":
+            try:
+                from scipy.stats import qmc
+            except ImportError:
+                count("global_sensitivity.sobol_fallback")
+                method = "halton"
+            else:
+                seed = int(self.rng.integers(2**32))
+                try:
+                    self._sobol = qmc.Sobol(d=dims, scramble=True, rng=seed)
+                except TypeError:
+                    # scipy < 1.15
+                    self._sobol = qmc.Sobol(d=dims, scramble=True, seed=seed)
+        self.method = method
+        self._bases = _primes(dims)
+        # Cranley-Patterson rotation: one random shift per dimension
+        self._shift = self.rng.random(dims)
+        self._drawn = 0
+
+    def draw(self, n: int) -> np.ndarray:
+        if self.method == "sobol":
+            with warnings.catch_warnings():
+                # Balance is only exact at powers of two; callers double N
+                warnings.simplefilter("ignore", UserWarning)
+                points = self._sobol.random(n)
+        elif self.method == "halton":
+            index = np.arange(self._drawn + 1, self._drawn + n + 1, dtype=np.int64)
+            points = np.column_stack([_radical_inverse(index, base) for base in self._bases])
+            points = np.mod(points + self._shift, 1.0)
+        elif self.method == "lhs":
+            strata = np.argsort(self.rng.random((self.dims, n)), axis=1).T
+            points = (strata + self.rng.random((n, self.dims))) / n
+        else:
+            points = self.rng.random((n, self.dims))
+        self._drawn += n
+        return points
+
+
+# ------------------------
+# Evaluation
+# ------------------------
+
+def _evaluate(user_inputs: Dict, base_case: Dict, values: Dict[str, np.ndarray], metric: str) -> np.ndarray:
+    """
+    Metric for every row of ``values`` (driver -> 1-D array) with the
+    other drivers at the base case, in one call to the active engine
+    backend. IRR is in percent, as in the case results.
+    """
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    case = dict(as_mapping(base_case))
+    for driver, column in values.items():
+        if driver == "capex_intensity":
+            case["capex"] = column * as_mapping(user_inputs)["revenue"]
+        else:
+            case[driver] = column
+
+    n = len(next(iter(values.values())))
+    count("global_sensitivity.evaluations", n)
+    outcome = np.broadcast_to(project(user_inputs, case)[metric], (n,))
+    return outcome * 100 if metric == "irr" else np.asarray(outcome, dtype=float)
+
+
+def _scale(points: np.ndarray, ranges: Dict[str, Tuple[float, float]], drivers) -> Dict[str, np.ndarray]:
+    low = np.array([ranges[d][0] for d in drivers])
+    high = np.array([ranges[d][1] for d in drivers])
+    scaled = low + points * (high - low)
+    return {driver: scaled[:, j] for j, driver in enumerate(drivers)}
+
+
+def _indices(f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Saltelli (2010) first-order and Jansen total-order estimators.
+    ``f_ab`` is (d, N): row i is A with column i taken from B.
+    """
+
+    variance = float(np.var(np.concatenate([f_a, f_b])))
+    if variance <= 0:
+        return np.zeros(len(f_ab)), np.zeros(len(f_ab)), 0.0
+    first = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+    total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return first, total, variance
+
+
+def _bootstrap(f_a, f_b, f_ab, n_bootstrap: int, rng: np.random.Generator, level: float = 0.95):
+    """
+    Percentile intervals for both indices from resampled rows (NaN
+    with no resamples).
+    """
+
+    if n_bootstrap <= 0:
+        missing = np.full((2, len(f_ab)), np.nan)
+        return missing, missing
+    n = len(f_a)
+    first, total = [], []
+    for _ in range(n_bootstrap):
+        rows = rng.integers(0, n, n)
+        s1, st, _ = _indices(f_a[rows], f_b[rows], f_ab[:, rows])
+        first.append(s1)
+        total.append(st)
+    tail = (1 - level) / 2 * 100
+    bounds = (tail, 100 - tail)
+    return np.percentile(first, bounds, axis=0), np.percentile(total, bounds, axis=0)
+
+
+class SobolResult(NamedTuple):
+    """
+    Sobol indices per driver with 95% bootstrap intervals, plus the
+    convergence history (one entry per round of doubling N).
+    """
+
+    metric: str
+    drivers: Tuple[str, ...]
+    ranges: Dict[str, Tuple[float, float]]
+    first_order: Dict[str, float]
+    total_order: Dict[str, float]
+    first_order_ci: Dict[str, Tuple[float, float]]
+    total_order_ci: Dict[str, Tuple[float, float]]
+    variance: float
+    n_base: int
+    evaluations: int
+    method: str
+    converged: bool
+    history: List[Dict]
+
+    @property
+    def interactions(self) -> float:
+        """
+        Variance share not explained by drivers acting alone.
+        """
+
+        return max(0.0, 1.0 - sum(self.first_order.values()))
+
+    def ranking(self) -> List[Dict]:
+        """
+        One row per driver, most influential (total order) first.
+        """
+
+        rows = [
+            {
+                "driver": driver,
+                "first_order": self.first_order[driver],
+                "total_order": self.total_order[driver],
+                "first_order_ci": self.first_order_ci[driver],
+                "total_order_ci": self.total_order_ci[driver],
+                "low": self.ranges[driver][0],
+                "high": self.ranges[driver][1],
+            }
+            for driver in self.drivers
+        ]
+        return sorted(rows, key=lambda row: row["total_order"], reverse=True)
+
+
+@timed("global_sensitivity.sobol_indices")
+def sobol_indices(
+    user_inputs: Dict,
+    base_case: Dict,
+    ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+    metric: str = "irr",
+    method: str = "sobol",
+    n_base: int = 512,
+    max_n: int = 8192,
+    tol: float = 0.01,
+    n_bootstrap: int = 200,
+    seed: Optional[int] = 0
+) -> SobolResult:
+    """
+    First- and total-order Sobol indices of ``metric`` for every driver
+    in ``ranges`` (default: driver_ranges around the base case), sampled
+    uniformly over each range.
+
+    N starts at ``n_base`` and doubles (up to ``max_n``) until no index
+    moves by more than ``tol`` between rounds; keep both powers of two
+    for Sobol points. Earlier rounds' evaluations are reused, so the
+    total cost is max N * (d + 2).
+    """
+
+    ranges = ranges or driver_ranges(user_inputs, base_case)
+    drivers = tuple(d for d in DRIVERS if d in ranges) + tuple(d for d in ranges if d not in DRIVERS)
+    unknown = [d for d in drivers if d not in DRIVERS]
+    if unknown:
+        raise ValueError(f"Unknown drivers: {', '.join(unknown)}")
+    d = len(drivers)
+
+    sampler = UnitSampler(2 * d, method, seed)
+    rng = np.random.default_rng(seed)
+    blocks = []
+    history = []
+    previous = None
+    converged = False
+    n, target = 0, n_base
+
+    while True:
+        with stage("global_sensitivity.sample"):
+            points = sampler.draw(target - n)
+            a, b = points[:, :d], points[:, d:]
+            stacked = [a, b]
+            for i in range(d):
+                ab = a.copy()
+                ab[:, i] = b[:, i]
+                stacked.append(ab)
+            design = np.concatenate(stacked)
+
+        with stage("global_sensitivity.evaluate"):
+            outcome = _evaluate(user_inputs, base_case, _scale(design, ranges, drivers), metric)
+        blocks.append(outcome.reshape(d + 2, target - n))
+        n = target
+
+        f = np.concatenate(blocks, axis=1)
+        first, total, variance = _indices(f[0], f[1], f[2:])
+        change = None if previous is None else float(np.max(np.abs(np.r_[first, total] - previous)))
+        history.append({
+            "n": n,
+            "evaluations": n * (d + 2),
+            "first_order": dict(zip(drivers, first.tolist())),
+            "total_order": dict(zip(drivers, total.tolist())),
+            "max_change": change,
+        })
+        previous = np.r_[first, total]
+
+        if change is not None and change < tol:
+            converged = True
+            break
+        if target * 2 > max_n:
+            break
+        target *= 2
+
+    with stage("global_sensitivity.bootstrap"):
+        first_ci, total_ci = _bootstrap(f[0], f[1], f[2:], n_bootstrap, rng)
+
+    return SobolResult(
+        metric=metric,
+        drivers=drivers,
+        ranges={driver: ranges[driver] for driver in drivers},
+        first_order=dict(zip(drivers, first.tolist())),
+        total_order=dict(zip(drivers, total.tolist())),
+        first_order_ci={driver: (float(first_ci[0][j]), float(first_ci[1][j])) for j, driver in enumerate(drivers)},
+        total_order_ci={driver: (float(total_ci[0][j]), float(total_ci[1][j])) for j, driver in enumerate(drivers)},
+        variance=variance,
+        n_base=n,
+        evaluations=n * (d + 2),
+        method=sampler.method,
+        converged=converged,
+        history=history,
+    )
+
+
+@timed("global_sensitivity.tornado")
+def tornado(
+    user_inputs: Dict,
+    base_case: Dict,
+    ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+    metric: str = "irr"
+) -> Dict:
+    """
+    One-at-a-time swings: the metric with each driver at the low and the
+    high end of its range, everything else at the base case. Bars are
+    sorted by swing (|high - low|), widest first.
+    """
+
+    ranges = ranges or driver_ranges(user_inputs, base_case)
+    drivers = [d for d in DRIVERS if d in ranges]
+
+    # Row 0 is the base case, then a low and a high row per driver
+    columns = {d: np.full(2 * len(drivers) + 1, driver_value(user_inputs, base_case, d)) for d in drivers}
+    for i, driver in enumerate(drivers):
+        columns[driver][2 * i + 1], columns[driver][2 * i + 2] = ranges[driver]
+    outcome = _evaluate(user_inputs, base_case, columns, metric)
+
+    bars = [
+        {
+            "driver": driver,
+            "low": ranges[driver][0],
+            "high": ranges[driver][1],
+            "metric_low": float(outcome[2 * i + 1]),
+            "metric_high": float(outcome[2 * i + 2]),
+            "swing": float(abs(outcome[2 * i + 2] - outcome[2 * i + 1])),
+        }
+        for i, driver in enumerate(drivers)
+    ]
+    return {
+        "metric": metric,
+        "base": float(outcome[0]),
+        "bars": sorted(bars, key=lambda bar: bar["swing"], reverse=True),
+    }
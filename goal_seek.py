@@ -0,0 +1,351 @@
+"""
+
+Goal seek on the LBO engine: which value of one input or assumption
+hits a target IRR or money multiple?
+
+Each solve is a bracketing root search on the unrounded batch engine:
+
+    1. bracket   - one vectorized engine call over a coarse grid of the
+                   search range (or, with a warm start, a narrow bracket
+                   around the previous answer)
+    2. refine    - Illinois-modified regula falsi inside the bracket,
+                   typically 5-10 further engine calls
+
+Where the target is hit more than once, ``solution`` picks the largest
+("max", e.g. the highest price that still clears the hurdle) or the
+smallest root. A frontier solves one problem per value of a second
+variable in the same vectorized calls, e.g. the leverage needed at each
+entry multiple.
+
+
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import count, timed
+from lbo_engine import CASE_FIELDS, USER_INPUT_FIELDS, project_batch
+from lbo_types import as_mapping
+
+
+METRICS = ("irr", "money_multiple")
+
+# Search range per variable, in the variable's own units
+SEARCH_BOUNDS = {
+    "entry_multiple": (0.5, 40.0),
+    "exit_multiple": (0.5, 40.0),
+    "debt_percentage": (0.0, 0.95),
+    "interest_rate": (0.0, 0.30),
+    "tax_rate": (0.0, 0.60),
+    "revenue_growth": (-30.0, 50.0),
+    "margin_change_bps": (-1000.0, 1000.0),
+}
+
+SCAN_POINTS = 33
+# Warm-start bracket half-width, as a share of the search range
+WARM_WIDTH = 0.02
+
+
+class SeekResult(NamedTuple):
+    """
+    Outcome of one goal seek. ``value`` is NaN when the target cannot be
+    reached inside the search range; ``achieved`` is then the metric at
+    the closest end of the range.
+    """
+
+    variable: str
+    metric: str
+    target: float
+    value: float
+    achieved: float
+    status: str
+    evaluations: int
+
+
+def _metric(user_inputs: Dict, case: Dict, metric: str) -> np.ndarray:
+    projected = project_batch(user_inputs, case)
+    return projected["irr"] * 100 if metric == "irr" else np.asarray(projected["money_multiple"])
+
+
+def _check(variable: str, metric: str, bounds: Optional[Tuple[float, float]]) -> Tuple[float, float]:
+    if variable not in SEARCH_BOUNDS and bounds is None:
+        raise ValueError(f"Cannot goal-seek {variable}; choose one of {', '.join(SEARCH_BOUNDS)}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    low, high = bounds or SEARCH_BOUNDS[variable]
+    if not low < high:
+        raise ValueError("Search bounds must satisfy low < high")
+    return float(low), float(high)
+
+
+class _Problem:
+    """
+    m goal seeks sharing a deal and base case; ``overrides`` holds
+    per-problem (m,) arrays for other variables (the frontier axis).
+    """
+
+    def __init__(self, user_inputs, base_case, variable, target, metric, overrides):
+        self.user_inputs = dict(as_mapping(user_inputs))
+        self.base_case = dict(as_mapping(base_case))
+        self.variable = variable
+        self.target = target
+        self.metric = metric
+        self.overrides = {k: np.asarray(v, dtype=float) for k, v in overrides.items()}
+        self.size = len(next(iter(self.overrides.values()))) if self.overrides else 1
+        self.evaluations = 0
+
+    def subset(self, mask: np.ndarray) -> "_Problem":
+        return _Problem(
+            self.user_inputs, self.base_case, self.variable, self.target, self.metric,
+            {k: v[mask] for k, v in self.overrides.items()},
+        )
+
+    def __call__(self, values: np.ndarray) -> np.ndarray:
+        """
+        Metric minus target for ``values`` of shape (m,) or (m, k).
+        """
+
+        values = np.asarray(values, dtype=float)
+        case = dict(self.base_case)
+        for name, column in self.overrides.items():
+            case[name] = column[:, None] if values.ndim == 2 else column
+        case[self.variable] = values
+        self.evaluations += 1
+        return _metric(self.user_inputs, case, self.metric) - self.target
+
+
+def _pick_brackets(grid: np.ndarray, f: np.ndarray, solution: str):
+    """
+    Index of the chosen sign-change interval per row (-1 if none).
+    """
+
+    change = (np.sign(f[:, :-1]) * np.sign(f[:, 1:]) <= 0) & np.isfinite(f[:, :-1]) & np.isfinite(f[:, 1:])
+    has = change.any(axis=1)
+    if solution == "max":
+        index = change.shape[1] - 1 - np.argmax(change[:, ::-1], axis=1)
+    else:
+        index = np.argmax(change, axis=1)
+    return np.where(has, index, -1)
+
+
+def _refine(problem: _Problem, lo, hi, f_lo, f_hi, xtol: float, max_iter: int = 60) -> np.ndarray:
+    """
+    Illinois regula falsi on every bracket at once.
+    """
+
+    lo, hi, f_lo, f_hi = (np.array(a, dtype=float) for a in (lo, hi, f_lo, f_hi))
+    x = np.where(f_lo == 0, lo, hi)
+    side = np.zeros(len(lo), dtype=int)
+    for _ in range(max_iter):
+        open_ = (np.abs(hi - lo) > xtol) & (f_lo != 0) & (f_hi != 0)
+        if not open_.any():
+            break
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.where(open_, (lo * f_hi - hi * f_lo) / (f_hi - f_lo), x)
+        x = np.where(np.isfinite(x), x, (lo + hi) / 2)
+        f_x = problem(x)
+
+        same_lo = np.sign(f_x) == np.sign(f_lo)
+        # Replace the endpoint on f_x's side; halve the stale one when the
+        # same side is kept twice (Illinois step)
+        hi_new = np.where(open_ & ~same_lo, x, hi)
+        lo_new = np.where(open_ & same_lo, x, lo)
+        f_hi = np.where(open_ & ~same_lo, f_x, np.where(open_ & same_lo & (side == 1), f_hi / 2, f_hi))
+        f_lo = np.where(open_ & same_lo, f_x, np.where(open_ & ~same_lo & (side == -1), f_lo / 2, f_lo))
+        side = np.where(open_, np.where(same_lo, 1, -1), side)
+        lo, hi = lo_new, hi_new
+
+    done_lo = f_lo == 0
+    done_hi = f_hi == 0
+    return np.where(done_lo, lo, np.where(done_hi, hi, x))
+
+
+def _solve(problem: _Problem, low: float, high: float, solution: str, warm: Optional[float], xtol: float):
+    m = problem.size
+
+    # ------------------------
+    # Bracket
+    # ------------------------
+    lo = hi = f_lo = f_hi = None
+    if warm is not None and m == 1:
+        width = WARM_WIDTH * (high - low)
+        pair = np.clip([warm - width, warm + width], low, high)
+        f_pair = problem(pair[None, :])[0]
+        if np.sign(f_pair[0]) * np.sign(f_pair[1]) <= 0:
+            lo, hi, f_lo, f_hi = pair[:1], pair[1:], f_pair[:1], f_pair[1:]
+            count("goal_seek.warm_start_hit")
+        else:
+            count("goal_seek.warm_start_miss")
+
+    if lo is None:
+        grid = np.linspace(low, high, SCAN_POINTS)
+        f = problem(np.broadcast_to(grid, (m, SCAN_POINTS)))
+        index = _pick_brackets(grid, f, solution)
+        found = index >= 0
+        safe = np.where(found, index, 0)
+        rows = np.arange(m)
+        lo, hi = grid[safe], grid[safe + 1]
+        f_lo, f_hi = f[rows, safe], f[rows, safe + 1]
+
+        # Unreachable targets: report the closest end of the range
+        closer_low = np.abs(f[:, 0]) <= np.abs(f[:, -1])
+        edge_value = np.where(closer_low, f[:, 0], f[:, -1]) + problem.target
+    else:
+        found = np.ones(1, dtype=bool)
+        edge_value = np.full(1, np.nan)
+
+    # ------------------------
+    # Refine
+    # ------------------------
+    values = np.full(m, np.nan)
+    achieved = np.array(edge_value, dtype=float)
+    if found.any():
+        solvable = problem.subset(found)
+        values[found] = _refine(solvable, lo[found], hi[found], f_lo[found], f_hi[found], xtol)
+        achieved[found] = solvable(values[found]) + problem.target
+        problem.evaluations += solvable.evaluations
+    return values, achieved, found
+
+
+class GoalSeeker:
+    """
+    Goal seek with a result cache and warm starts.
+
+    Solved problems are cached (bounded LRU), so repeating one costs
+    nothing. The last answer per (variable, metric, solution) seeds the
+    next solve with a narrow bracket, which is what an analyst nudging a
+    target or an input produces; if the target moved too far, the solver
+    falls back to the full scan. Safe to share between threads (the app
+    shares one across sessions); solves themselves run outside the lock.
+    """
+
+    def __init__(self, max_entries: int = 1024, xtol: float = 1e-7):
+        self.max_entries = max_entries
+        self.xtol = xtol
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._warm = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, user_inputs, base_case, variable, target, metric, solution, bounds):
+        inputs = as_mapping(user_inputs)
+        case = as_mapping(base_case)
+        return (
+            tuple(inputs[f] for f in USER_INPUT_FIELDS),
+            tuple(case[f] for f in CASE_FIELDS),
+            variable, float(target), metric, solution, bounds,
+        )
+
+    @timed("goal_seek.seek")
+    def seek(
+        self,
+        user_inputs: Dict,
+        base_case: Dict,
+        variable: str,
+        target: float,
+        metric: str = "irr",
+        solution: str = "max",
+        bounds: Optional[Tuple[float, float]] = None
+    ) -> SeekResult:
+        """
+        Value of ``variable`` at which ``metric`` equals ``target`` (IRR
+        in percent, as in run_lbo_case), other inputs held at the base
+        case.
+        """
+
+        low, high = _check(variable, metric, bounds)
+        key = self._key(user_inputs, base_case, variable, target, metric, solution, (low, high))
+        warm_key = (variable, metric, solution)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                warm = self._warm.get(warm_key)
+        if cached is not None:
+            count("goal_seek.cache_hit")
+            return cached
+
+        problem = _Problem(user_inputs, base_case, variable, float(target), metric, {})
+        values, achieved, found = _solve(problem, low, high, solution, warm, self.xtol * (high - low))
+
+        value = float(values[0])
+        result = SeekResult(
+            variable, metric, float(target), value, float(achieved[0]),
+            "solved" if found[0] else "unreachable", problem.evaluations,
+        )
+        with self._lock:
+            if found[0]:
+                self._warm[warm_key] = value
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    @timed("goal_seek.frontier")
+    def frontier(
+        self,
+        user_inputs: Dict,
+        base_case: Dict,
+        x_variable: str,
+        x_values: Sequence[float],
+        y_variable: str,
+        target: float,
+        metric: str = "irr",
+        solution: str = "max",
+        y_bounds: Optional[Tuple[float, float]] = None
+    ) -> Dict:
+        """
+        Solves ``y_variable`` for the target at every value of
+        ``x_variable`` (e.g. max debt % per entry multiple). ``y_bounds``
+        constrains the answer (e.g. leverage capped at 0.7). Returns
+        {x_variable: xs, y_variable: ys, "achieved": ..., "solved": ...}
+        with NaN where the target is out of reach.
+        """
+
+        if x_variable == y_variable:
+            raise ValueError("A frontier needs two different variables")
+        low, high = _check(y_variable, metric, y_bounds)
+        xs = np.asarray(x_values, dtype=float)
+        problem = _Problem(user_inputs, base_case, y_variable, float(target), metric, {x_variable: xs})
+        values, achieved, found = _solve(problem, low, high, solution, None, self.xtol * (high - low))
+        count("goal_seek.frontier_points", len(xs))
+        return {
+            x_variable: xs,
+            y_variable: values,
+            "achieved": achieved,
+            "solved": found,
+            "evaluations": problem.evaluations,
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._results)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._warm.clear()
+
+
+def goal_seek(
+    user_inputs: Dict,
+    base_case: Dict,
+    variable: str,
+    target: float,
+    metric: str = "irr",
+    solution: str = "max",
+    bounds: Optional[Tuple[float, float]] = None
+) -> SeekResult:
+    """
+    One-off goal seek without caching; see GoalSeeker.seek.
+    """
+
+    return GoalSeeker(max_entries=1).seek(user_inputs, base_case, variable, target, metric, solution, bounds)
@@ -0,0 +1,274 @@
+"""
+
+Incremental LBO projection for interactive what-if work.
+
+run_lbo_case is split into three layers, each cached under the inputs
+it actually depends on:
+
+    operating  - revenue, margin, EBITDA, D&A and capex path
+                 (deal P&L inputs, growth, margin change, hold period)
+    financing  - entry equity, interest, taxes, FCF and debt paydown
+                 (operating key + entry multiple, leverage, rate, tax)
+    valuation  - exit equity, MOIC and IRR
+                 (financing key + exit multiple)
+
+Nudging the interest rate therefore reuses the operating path, and
+moving the exit multiple only re-prices the terminal year. Results are
+identical to run_lbo_case.
+
+
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Tuple
+
+from instrumentation import count
+from lbo_types import as_mapping
+
+
+OPERATING_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "hold_period_years",
+    "revenue_growth",
+    "margin_change_bps",
+)
+
+FINANCING_FIELDS = (
+    "entry_multiple",
+    "debt_percentage",
+    "interest_rate",
+    "tax_rate",
+)
+
+VALUATION_FIELDS = (
+    "exit_multiple",
+)
+
+LAYERS = ("operating", "financing", "valuation")
+
+
+class OperatingPath(NamedTuple):
+    revenue: Tuple[float, ...]
+    ebitda: Tuple[float, ...]
+    depreciation_amortization: Tuple[float, ...]
+    capex: Tuple[float, ...]
+
+
+class FinancingPath(NamedTuple):
+    entry_equity: float
+    interest: Tuple[float, ...]
+    taxes: Tuple[float, ...]
+    net_income: Tuple[float, ...]
+    fcf: Tuple[float, ...]
+    debt: Tuple[float, ...]
+
+
+def project_operations(
+    revenue: float,
+    ebitda: float,
+    da: float,
+    capex: float,
+    hold_years: int,
+    revenue_growth: float,
+    margin_change_bps: float
+) -> OperatingPath:
+    """
+    Financing-independent part of the projection.
+    """
+
+    revenue_growth = revenue_growth / 100
+    margin_change = margin_change_bps / 10000
+
+    initial_margin = ebitda / revenue if revenue > 0 else 0
+    initial_da_pct = da / revenue if revenue > 0 else 0
+    initial_capex_pct = capex / revenue if revenue > 0 else 0
+
+    revenues, ebitdas, das, capexes = [], [], [], []
+    current_revenue = revenue
+    current_margin = initial_margin
+
+    for _ in range(hold_years):
+        current_revenue *= (1 + revenue_growth)
+        current_margin += margin_change
+        current_margin = max(0, min(current_margin, 1))
+
+        revenues.append(current_revenue)
+        ebitdas.append(current_revenue * current_margin)
+        das.append(current_revenue * initial_da_pct)
+        capexes.append(current_revenue * initial_capex_pct)
+
+    return OperatingPath(tuple(revenues), tuple(ebitdas), tuple(das), tuple(capexes))
+
+
+def project_financing(
+    operating: OperatingPath,
+    ebitda: float,
+    entry_multiple: float,
+    debt_pct: float,
+    interest_rate: float,
+    tax_rate: float
+) -> FinancingPath:
+    """
+    Debt paydown on top of an operating path.
+    """
+
+    entry_ev = ebitda * entry_multiple
+    entry_debt = entry_ev * debt_pct
+    entry_equity = entry_ev - entry_debt
+
+    interests, taxes_paid, net_incomes, fcfs, debts = [], [], [], [], []
+    debt = entry_debt
+
+    for current_ebitda, current_da, current_capex in zip(
+        operating.ebitda, operating.depreciation_amortization, operating.capex
+    ):
+        interest = debt * interest_rate
+
+        ebit = current_ebitda - current_da
+        ebt = ebit - interest
+        taxes = max(ebt, 0) * tax_rate
+
+        net_income = ebt - taxes
+        fcf = net_income + current_da - current_capex
+
+        debt = max(debt - fcf, 0)
+
+        interests.append(interest)
+        taxes_paid.append(taxes)
+        net_incomes.append(net_income)
+        fcfs.append(fcf)
+        debts.append(debt)
+
+    return FinancingPath(
+        entry_equity, tuple(interests), tuple(taxes_paid), tuple(net_incomes), tuple(fcfs), tuple(debts)
+    )
+
+
+def value_exit(
+    operating: OperatingPath,
+    financing: FinancingPath,
+    exit_multiple: float,
+    hold_years: int
+) -> Dict:
+    """
+    Terminal valuation and returns, shaped like run_lbo_case output.
+    """
+
+    exit_ev = operating.ebitda[-1] * exit_multiple
+    exit_equity = exit_ev - financing.debt[-1]
+
+    entry_equity = financing.entry_equity
+    money_multiple = exit_equity / entry_equity if entry_equity > 0 else 0
+    irr = (money_multiple ** (1 / hold_years)) - 1 if money_multiple > 0 else 0
+
+    return {
+        "entry_equity": entry_equity,
+        "exit_equity": exit_equity,
+        "money_multiple": round(money_multiple, 2),
+        "irr": round(irr * 100, 2)
+    }
+
+
+class IncrementalEngine:
+    """
+    run_lbo_case with a bounded LRU cache per layer.
+
+    Each layer is keyed on the values it depends on (including the key
+    of the layer below), so a change only recomputes the layers it
+    invalidates. ``stats()`` reports hits and misses per layer. Safe to
+    share between threads (the app shares one across sessions).
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._caches = {layer: OrderedDict() for layer in LAYERS}
+        self._stats = {layer: {"hits": 0, "misses": 0} for layer in LAYERS}
+
+    def _cached(self, layer: str, key, compute):
+        cache = self._caches[layer]
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+                self._stats[layer]["hits"] += 1
+        if value is not None:
+            count(f"incremental.{layer}.hit")
+            return value
+
+        # Computed outside the lock; a concurrent miss on the same key
+        # just computes the same value twice
+        value = compute()
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.max_entries:
+                cache.popitem(last=False)
+            self._stats[layer]["misses"] += 1
+        count(f"incremental.{layer}.miss")
+        return value
+
+    def run(self, user_inputs, case_assumptions, include_schedule: bool = False) -> Dict:
+        """
+        Drop-in replacement for run_lbo_case.
+        """
+
+        values = {**as_mapping(user_inputs), **as_mapping(case_assumptions)}
+
+        operating_key = tuple(values[f] for f in OPERATING_FIELDS)
+        financing_key = operating_key + tuple(values[f] for f in FINANCING_FIELDS)
+        valuation_key = financing_key + tuple(values[f] for f in VALUATION_FIELDS)
+
+        operating = self._cached(
+            "operating", operating_key, lambda: project_operations(*operating_key)
+        )
+        financing = self._cached(
+            "financing",
+            financing_key,
+            lambda: project_financing(
+                operating,
+                values["ebitda"],
+                values["entry_multiple"],
+                values["debt_percentage"],
+                values["interest_rate"],
+                values["tax_rate"],
+            ),
+        )
+        results = dict(self._cached(
+            "valuation",
+            valuation_key,
+            lambda: value_exit(operating, financing, values["exit_multiple"], values["hold_period_years"]),
+        ))
+
+        if include_schedule:
+            results["schedule"] = [
+                {
+                    "year": year,
+                    "revenue": operating.revenue[i],
+                    "ebitda": operating.ebitda[i],
+                    "depreciation_amortization": operating.depreciation_amortization[i],
+                    "capex": operating.capex[i],
+                    "interest": financing.interest[i],
+                    "taxes": financing.taxes[i],
+                    "net_income": financing.net_income[i],
+                    "fcf": financing.fcf[i],
+                    "debt": financing.debt[i],
+                }
+                for i, year in enumerate(range(1, values["hold_period_years"] + 1))
+            ]
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                layer: {**self._stats[layer], "entries": len(self._caches[layer])}
+                for layer in LAYERS
+            }
+
+    def clear(self) -> None:
+        for layer in LAYERS:
+            self._caches[layer].clear()
@@ -4,49 +4,74 @@ Validates user-provided deal inputs coming from the frontend.
 
 """
 
-from typing import Dict
+from typing import Dict, List
 
+from instrumentation import timed
+from validation import (
+    BatchValidation,
+    batch_errors,
+    between,
+    compile_rules,
+    non_negative_number,
+    record_errors,
+    required_text,
+    whole_number,
+)
 
+
+REQUIRED_NUMERIC_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "tax_rate",
+    "debt_percentage",
+    "interest_rate",
+    "hold_period_years",
+)
+
+# Compiled once; order decides which message a record check raises
+INPUT_RULES = compile_rules(
+    *(non_negative_number(field) for field in REQUIRED_NUMERIC_FIELDS),
+
+    # Logical bounds
+    between("tax_rate", 0, 1, "Tax rate must be between 0 and 1"),
+    between("debt_percentage", 0, 1, "Debt percentage must be between 0 and 1", inclusive=True),
+    between("hold_period_years", 0, None, "Hold period must be greater than 0"),
+    whole_number("hold_period_years", "Hold period must be a whole number of years"),
+
+    # Context fields
+    required_text("industry", "Industry is required"),
+    required_text("geography", "Geography is required"),
+)
+
+
+@timed("inputs.validate_user_inputs")
 def validate_user_inputs(inputs: Dict) -> None:
     """
     Performs validation on user inputs.
     Raises ValueError with clear messages if something is wrong.
     """
 
-    required_numeric_fields = [
-        "revenue",
-        "ebitda",
-        "depreciation_amortization",
-        "capex",
-        "tax_rate",
-        "debt_percentage",
-        "interest_rate",
-        "hold_period_years",
-    ]
+    for check in INPUT_RULES:
+        if check.record(inputs):
+            raise ValueError(check.message)
 
-    for field in required_numeric_fields:
-        if field not in inputs:
-            raise ValueError(f"Missing input: {field}")
 
-        if not isinstance(inputs[field], (int, float)):
-            raise ValueError(f"{field} must be a number")
-
-        if inputs[field] < 0:
-            raise ValueError(f"{field} cannot be negative")
-
-    # Logical bounds
-    if not (0 < inputs["tax_rate"] < 1):
-        raise ValueError("Tax rate must be between 0 and 1")
+def user_input_errors(inputs: Dict) -> List[str]:
+    """
+    Every rule the inputs break, in rule order.
+    """
 
-    if not (0 <= inputs["debt_percentage"] <= 1):
-        raise ValueError("Debt percentage must be between 0 and 1")
+    return record_errors(INPUT_RULES, inputs)
 
-    if inputs["hold_period_years"] <= 0:
-        raise ValueError("Hold period must be greater than 0")
 
-    # Context fields
-    if "industry" not in inputs or not inputs["industry"].strip():
-        raise ValueError("Industry is required")
+@timed("inputs.validate_user_inputs_batch")
+def validate_user_inputs_batch(deals) -> BatchValidation:
+    """
+    Validates many deals at once (list of dicts, dict of columns or a
+    DataFrame) without raising; see BatchValidation for the per-row
+    masks and messages.
+    """
 
-    if "geography" not in inputs or not inputs["geography"].strip():
-        raise ValueError("Geography is required")
+    return batch_errors(INPUT_RULES, deals)
@@ -0,0 +1,304 @@
+"""
+
+Lightweight per-stage instrumentation for the LBO pipeline.
+
+Stages are marked with the ``stage`` context manager or the ``timed``
+decorator and record wall time, call counts and (optionally) peak
+traced memory. Named counters (e.g. cache hits) go through ``count``.
+Everything is off by default and reduces to one attribute check per
+call, so instrumented hot paths cost next to nothing in normal runs.
+
+Set LBO_PROFILE=1 (or call ``enable``) to switch it on. ``activate``
+routes one thread's records to its own Profiler instead (e.g. one per
+Streamlit session), leaving the process-wide PROFILER untouched.
+
+
+"""
+
+import functools
+import io
+import json
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+import settings
+
+
+class Profiler:
+    """
+    Collects per-stage timings and counters for one process.
+    """
+
+    def __init__(self, enabled: Optional[bool] = False, track_memory: bool = False):
+        # None: read LBO_PROFILE on first use, so importing never loads .env
+        self._enabled = enabled
+        self.track_memory = track_memory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = settings.get("LBO_PROFILE") not in ("", "0")
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        self._enabled = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+
+    # ------------------------
+    # Recording
+    # ------------------------
+    @contextmanager
+    def _measure(self, name: str):
+        memory = self.track_memory and tracemalloc.is_tracing()
+        peaks = getattr(self._local, "peaks", None)
+        if peaks is None:
+            peaks = self._local.peaks = []
+
+        if memory:
+            # Fold the peak so far into the enclosing stage before resetting it
+            if peaks:
+                peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            peaks.append(0)
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            peak = None
+            if memory:
+                peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak)
+            self._record(name, elapsed, peak)
+
+    def _record(self, name: str, elapsed: float, peak: Optional[int]) -> None:
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {"calls": 0, "total_s": 0.0, "max_s": 0.0, "peak_memory_bytes": None}
+            entry["calls"] += 1
+            entry["total_s"] += elapsed
+            entry["max_s"] = max(entry["max_s"], elapsed)
+            if peak is not None:
+                entry["peak_memory_bytes"] = max(entry["peak_memory_bytes"] or 0, peak)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # ------------------------
+    # Reporting
+    # ------------------------
+    def report(self) -> Dict:
+        """
+        Snapshot of stages (sorted by total time) and counters.
+        """
+
+        with self._lock:
+            stages = {
+                name: {**entry, "mean_s": entry["total_s"] / entry["calls"]}
+                for name, entry in sorted(self.stages.items(), key=lambda kv: -kv[1]["total_s"])
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def merge(self, report: Dict) -> None:
+        """
+        Adds a report from another process (e.g. a batch worker).
+        """
+
+        with self._lock:
+            for name, other in report.get("stages", {}).items():
+                entry = self.stages.setdefault(
+                    name, {"calls": 0, "total_s": 0.0, "max_s": 0.0, "peak_memory_bytes": None}
+                )
+                entry["calls"] += other["calls"]
+                entry["total_s"] += other["total_s"]
+                entry["max_s"] = max(entry["max_s"], other["max_s"])
+                if other.get("peak_memory_bytes") is not None:
+                    entry["peak_memory_bytes"] = max(entry["peak_memory_bytes"] or 0, other["peak_memory_bytes"])
+            for name, n in report.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_json(self) -> str:
+        return json.dumps(self.report())
+
+
+PROFILER = Profiler(enabled=None)
+
+# Per-thread override of PROFILER (see ``activate``)
+_active = threading.local()
+# Activated profilers that track memory; tracemalloc is process-wide
+_memory_users = weakref.WeakSet()
+_memory_lock = threading.Lock()
+
+
+def enable(track_memory: bool = False) -> None:
+    """
+    Turns instrumentation on; ``track_memory`` also starts tracemalloc,
+    which slows allocation-heavy code noticeably.
+    """
+
+    PROFILER.enabled = True
+    PROFILER.track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    PROFILER.enabled = False
+    if PROFILER.track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    PROFILER.track_memory = False
+
+
+def current() -> Profiler:
+    """
+    The profiler recording on this thread.
+    """
+    return getattr(_active, "profiler", PROFILER)
+
+
+def activate(profiler: Optional[Profiler]) -> None:
+    """
+    Routes this thread's stages and counters to ``profiler`` (``None``
+    goes back to PROFILER), without touching other threads.
+
+    tracemalloc is process-wide: it runs while any activated profiler
+    tracks memory, so concurrent profilers see each other's peaks.
+    """
+
+    if profiler is None:
+        _active.__dict__.pop("profiler", None)
+        return
+    _active.profiler = profiler
+
+    with _memory_lock:
+        if profiler.enabled and profiler.track_memory:
+            _memory_users.add(profiler)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        else:
+            _memory_users.discard(profiler)
+            if not _memory_users and not PROFILER.track_memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+def stage(name: str):
+    """
+    Context manager timing a block as stage ``name``.
+    """
+    return current().stage(name)
+
+
+def count(name: str, n: int = 1) -> None:
+    """
+    Increments counter ``name`` (e.g. "assumption_cache.hit").
+    """
+    current().count(name, n)
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a function as stage ``name``.
+    """
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = getattr(_active, "profiler", PROFILER)
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler._measure(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# ------------------------
+# Opt-in deterministic / sampling profiles
+# ------------------------
+
+class ProfileDump:
+    """
+    Wraps cProfile (default) or pyinstrument for a whole run.
+
+    Call ``start()`` and ``stop()`` around the work, then ``save(path)``
+    (.prof for cProfile, .html for pyinstrument) or ``text()`` for a
+    readable summary.
+    """
+
+    def __init__(self, engine: str = "cprofile"):
+        if engine not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler: {engine}")
+        self.engine = engine
+        self._profiler = None
+
+    def start(self) -> "ProfileDump":
+        if self.engine == "pyinstrument":
+            from pyinstrument import Profiler as SamplingProfiler
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        else:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self) -> "ProfileDump":
+        if self.engine == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+        return self
+
+    def save(self, path: str) -> str:
+        if self.engine == "pyinstrument":
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.dump_stats(path)
+        return path
+
+    def text(self, limit: int = 25) -> str:
+        if self.engine == "pyinstrument":
+            return self._profiler.output_text()
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+@contextmanager
+def profile_to(path: str, engine: str = "cprofile"):
+    """
+    Profiles the enclosed block and writes the result to ``path``.
+    """
+
+    dump = ProfileDump(engine).start()
+    try:
+        yield dump
+    finally:
+        dump.stop().save(path)
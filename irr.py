@@ -0,0 +1,286 @@
+"""
+
+Vectorized IRR / XIRR for arbitrary equity cash-flow streams.
+
+run_lbo_case prices a single entry and exit flow in closed form. This
+module solves the general case (dividend recaps, fees, partial exits)
+for one stream or millions of streams at once:
+
+    1. Newton's method on every stream from a common guess
+    2. for streams where Newton fails, a bracketing scan of NPV over a
+       log-spaced rate grid followed by bisection
+    3. streams whose flows change sign more than once, and for which
+       Descartes' rule cannot rule out a second root, are scanned and
+       flagged
+
+Nothing is silently coerced to 0: unsolved streams come back as NaN
+with ``converged`` False.
+
+
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from instrumentation import count, timed
+
+
+# Rates are searched on 1 + r in [1e-4, 1e4], i.e. -99.99% to +999,900%
+GRID_GROWTH = np.geomspace(1e-4, 1e4, 161)
+DAYS_PER_YEAR = 365.0
+
+
+class IRRResult(NamedTuple):
+    """
+    Per-stream solver output; rates are decimals (0.2 = 20%).
+    """
+
+    rate: np.ndarray
+    converged: np.ndarray
+    multiple_roots: np.ndarray
+    iterations: int
+
+
+def _as_flows(cash_flows) -> np.ndarray:
+    flows = np.asarray(cash_flows, dtype=float)
+    if flows.ndim == 1:
+        flows = flows[None, :]
+    if flows.ndim != 2:
+        raise ValueError("cash_flows must be 1-D (one stream) or 2-D (streams x periods)")
+    return flows
+
+
+def _npv_and_slope(flows: np.ndarray, growth: np.ndarray, times: Optional[np.ndarray]):
+    """
+    NPV and d(NPV)/dr at 1 + r = ``growth`` for each stream.
+    """
+
+    if times is None:
+        # Periodic flows: Horner's rule in the discount factor v = 1 / (1 + r)
+        v = 1.0 / growth
+        value = np.zeros_like(v)
+        slope = np.zeros_like(v)
+        for t in range(flows.shape[1] - 1, -1, -1):
+            slope = slope * v + value
+            value = value * v + flows[:, t]
+        return value, -slope * v * v
+
+    discount = np.exp(-times * np.log(growth)[:, None])
+    value = (flows * discount).sum(axis=1)
+    slope = -(times * flows * discount).sum(axis=1) / growth
+    return value, slope
+
+
+def npv(rate, cash_flows, times: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Net present value of each stream at ``rate`` (scalar or per stream).
+
+    ``times`` are period offsets in years; by default flow t falls at t.
+    """
+
+    flows = _as_flows(cash_flows)
+    growth = np.broadcast_to(1.0 + np.asarray(rate, dtype=float), flows.shape[:1]).copy()
+    times = None if times is None else np.asarray(times, dtype=float)
+    return _npv_and_slope(flows, growth, times)[0]
+
+
+def _initial_growth(flows: np.ndarray, times: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Per-stream starting point: the multiple of money annualized over the
+    gap between the flow-weighted times of inflows and outflows. Exact
+    for a single entry and exit.
+    """
+
+    t = np.arange(flows.shape[1], dtype=float) if times is None else times
+    inflow = np.maximum(flows, 0.0)
+    outflow = inflow - flows
+    paid_in, paid_out = outflow.sum(axis=1), inflow.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        span = (inflow @ t) / paid_out - (outflow @ t) / paid_in
+        growth = (paid_out / paid_in) ** (1.0 / span)
+    return np.where(np.isfinite(growth) & (growth > 0) & (span > 0), growth, 1.1)
+
+
+def _multiple_sign_changes(flows: np.ndarray) -> np.ndarray:
+    """
+    True where the flows change sign more than once (zeros ignored), the
+    only case in which NPV can have several roots.
+    """
+
+    last = flows.shape[1] - 1
+    positive, negative = flows > 0, flows < 0
+    first_pos = np.where(positive.any(axis=1), positive.argmax(axis=1), last + 1)
+    first_neg = np.where(negative.any(axis=1), negative.argmax(axis=1), last + 1)
+    last_pos = last - positive[:, ::-1].argmax(axis=1)
+    last_neg = last - negative[:, ::-1].argmax(axis=1)
+    return ~((last_neg < first_pos) | (last_pos < first_neg))
+
+
+def _other_roots_possible(flows: np.ndarray, growth: np.ndarray) -> np.ndarray:
+    """
+    Descartes' rule on NPV (a polynomial in v = 1 / (1 + r)) with the
+    found root divided out: no sign change means the root is unique.
+    """
+
+    v = 1.0 / growth
+    quotient = flows[:, -1]
+    positive, negative = quotient > 0, quotient < 0
+    for t in range(flows.shape[1] - 2, 0, -1):
+        quotient = flows[:, t] + v * quotient
+        positive |= quotient > 0
+        negative |= quotient < 0
+    return positive & negative
+
+
+def _scan(flows: np.ndarray, times: Optional[np.ndarray]):
+    """
+    Marks the GRID_GROWTH intervals where each stream's NPV changes sign.
+    """
+
+    values = np.empty((len(flows), len(GRID_GROWTH)))
+    for j, g in enumerate(GRID_GROWTH):
+        values[:, j] = _npv_and_slope(flows, np.full(len(flows), g), times)[0]
+    signs = np.sign(values)
+    return (signs[:, :-1] * signs[:, 1:]) < 0
+
+
+def _bisect(flows, lo, hi, times, tol, max_iter):
+    f_lo = _npv_and_slope(flows, lo, times)[0]
+    for _ in range(max_iter):
+        mid = np.sqrt(lo * hi)
+        f_mid = _npv_and_slope(flows, mid, times)[0]
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+        if np.all(hi / lo - 1 < tol):
+            break
+    return np.sqrt(lo * hi)
+
+
+def _solve(flows, times, guess, tol, max_iter) -> IRRResult:
+    n = len(flows)
+
+    # ------------------------
+    # Newton from each starting point
+    # ------------------------
+    growth = _initial_growth(flows, times) if guess is None else np.full(n, 1.0 + guess)
+    start = growth.copy()
+    active = np.ones(n, dtype=bool)
+    converged = np.zeros(n, dtype=bool)
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        value, slope = _npv_and_slope(flows[active], growth[active], times)
+        step = value / slope
+        stepped = growth[active] - step
+        done = np.abs(step) <= tol * np.abs(stepped)
+        # Leaving (0, inf) or a flat slope means Newton has failed for that stream
+        failed = ~np.isfinite(stepped) | (stepped <= 0)
+
+        idx = np.flatnonzero(active)
+        growth[idx] = np.where(failed, growth[idx], stepped)
+        converged[idx[done & ~failed]] = True
+        active[idx[done | failed]] = False
+        if not active.any():
+            break
+
+    # ------------------------
+    # Bracketing fallback and root counting
+    # ------------------------
+    multiple = np.zeros(n, dtype=bool)
+    suspect = _multiple_sign_changes(flows) & converged
+    if times is None and suspect.any():
+        rows = np.flatnonzero(suspect)
+        suspect[rows] = _other_roots_possible(flows[rows], growth[rows])
+    check = np.flatnonzero(~converged | suspect)
+    if check.size:
+        brackets = _scan(flows[check], times)
+        multiple[check] = brackets.sum(axis=1) > 1
+
+        retry = ~converged[check] & brackets.any(axis=1)
+        if retry.any():
+            rows = check[retry]
+            # Bracket nearest the starting point
+            centres = np.sqrt(GRID_GROWTH[:-1] * GRID_GROWTH[1:])
+            distance = np.where(brackets[retry], np.abs(np.log(centres / start[rows, None])), np.inf)
+            j = distance.argmin(axis=1)
+            growth[rows] = _bisect(flows[rows], GRID_GROWTH[j], GRID_GROWTH[j + 1], times, tol, 200)
+            converged[rows] = True
+            count("irr.bisection_fallback", rows.size)
+
+    rate = np.where(converged, growth - 1.0, np.nan)
+    count("irr.not_converged", int(n - converged.sum()))
+    return IRRResult(rate, converged, multiple, iterations)
+
+
+@timed("irr.solve")
+def irr(
+    cash_flows,
+    times: Optional[Sequence[float]] = None,
+    guess: Optional[float] = None,
+    tol: float = 1e-10,
+    max_iter: int = 50
+) -> IRRResult:
+    """
+    Solves NPV(rate) = 0 for each row of ``cash_flows``.
+
+    ``cash_flows`` is one stream (1-D) or a streams x periods array;
+    ``times`` are the period offsets in years (default 0, 1, 2, ...).
+    Newton starts from ``guess`` or, by default, from each stream's
+    annualized multiple. Where several roots exist the one Newton (or
+    the bracket nearest the starting point) finds is returned and
+    ``multiple_roots`` is set.
+    """
+
+    flows = _as_flows(cash_flows)
+    times = None if times is None else np.asarray(times, dtype=float)
+    # Far-off trial rates overflow NPV; those streams are caught as failures
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        return _solve(flows, times, guess, tol, max_iter)
+
+
+def _year_fractions(dates: Sequence) -> np.ndarray:
+    days = np.array([np.datetime64(d, "D") for d in dates]).astype("int64").astype(float)
+    return (days - days[0]) / DAYS_PER_YEAR
+
+
+def xirr(cash_flows, dates: Sequence, guess: Optional[float] = None, tol: float = 1e-10, max_iter: int = 50) -> IRRResult:
+    """
+    IRR for flows on calendar dates (Actual/365 from the first date).
+
+    ``dates`` are datetime.date / datetime objects or ISO strings.
+    """
+
+    return irr(cash_flows, times=_year_fractions(dates), guess=guess, tol=tol, max_iter=max_iter)
+
+
+def equity_cash_flows(
+    entry_equity,
+    exit_equity,
+    hold_years,
+    interim=None
+) -> np.ndarray:
+    """
+    Sponsor cash-flow matrix (streams x (max hold + 1)).
+
+    Year 0 is the equity cheque, the exit proceeds land in each stream's
+    own hold year and ``interim`` (streams x max hold, or one row for all
+    streams) adds dividends / recaps (positive) or fees (negative) in
+    years 1..hold. Flows after a stream's exit are ignored.
+    """
+
+    entry_equity = np.atleast_1d(np.asarray(entry_equity, dtype=float))
+    exit_equity = np.atleast_1d(np.asarray(exit_equity, dtype=float))
+    hold_years = np.atleast_1d(np.asarray(hold_years, dtype=int))
+    n = max(len(entry_equity), len(exit_equity), len(hold_years))
+    periods = int(hold_years.max())
+
+    flows = np.zeros((n, periods + 1))
+    flows[:, 0] = -np.broadcast_to(entry_equity, (n,))
+    if interim is not None:
+        interim = np.broadcast_to(np.atleast_2d(np.asarray(interim, dtype=float)), (n, periods))
+        years = np.arange(1, periods + 1)
+        flows[:, 1:] += np.where(years <= np.broadcast_to(hold_years, (n,))[:, None], interim, 0.0)
+    flows[np.arange(n), np.broadcast_to(hold_years, (n,))] += np.broadcast_to(exit_equity, (n,))
+    return flows
@@ -6,36 +6,79 @@ Runs a deterministic LBO calculation for a single case
 
 """
 
-from typing import Dict
+from typing import Dict, List, Optional
 
+import numpy as np
 
+from instrumentation import timed
+from lbo_types import CaseAssumptions, CaseResult, DealInputs, ResultBatch, as_mapping
+from schedules import SCHEDULE_FIELDS, ScheduleTable
+
+
+def _deal_values(user_inputs) -> tuple:
+    """
+    Deal inputs as a tuple, from a dict or a DealInputs.
+    """
+
+    if isinstance(user_inputs, DealInputs):
+        d = user_inputs
+        return (
+            d.revenue, d.ebitda, d.depreciation_amortization, d.capex,
+            d.tax_rate, d.debt_percentage, d.interest_rate, d.hold_period_years,
+        )
+    return (
+        user_inputs["revenue"],
+        user_inputs["ebitda"],
+        user_inputs["depreciation_amortization"],
+        user_inputs["capex"],
+        user_inputs["tax_rate"],
+        user_inputs["debt_percentage"],
+        user_inputs["interest_rate"],
+        user_inputs["hold_period_years"],
+    )
+
+
+def _case_values(case_assumptions) -> tuple:
+    """
+    Case assumptions as a tuple, from a dict or a CaseAssumptions.
+    """
+
+    if isinstance(case_assumptions, CaseAssumptions):
+        c = case_assumptions
+        return c.entry_multiple, c.revenue_growth, c.exit_multiple, c.margin_change_bps
+    return (
+        case_assumptions["entry_multiple"],
+        case_assumptions["revenue_growth"],
+        case_assumptions["exit_multiple"],
+        case_assumptions["margin_change_bps"],
+    )
+
+
+@timed("engine.run_lbo_case")
 def run_lbo_case(
     user_inputs: Dict,
-    case_assumptions: Dict
+    case_assumptions: Dict,
+    include_schedule: bool = False
 ) -> Dict:
     """
     Runs LBO calculations for one scenario.
+
+    Inputs may be dicts or DealInputs / CaseAssumptions. With
+    ``include_schedule`` the result also carries the year-by-year
+    projection under "schedule" (one dict per year).
     """
 
     # ------------------------
     # Unpack user inputs
     # ------------------------
-    revenue = user_inputs["revenue"]
-    ebitda = user_inputs["ebitda"]
-    da = user_inputs["depreciation_amortization"]
-    capex = user_inputs["capex"]
-    tax_rate = user_inputs["tax_rate"]
-    debt_pct = user_inputs["debt_percentage"]
-    interest_rate = user_inputs["interest_rate"]
-    hold_years = user_inputs["hold_period_years"]
+    revenue, ebitda, da, capex, tax_rate, debt_pct, interest_rate, hold_years = _deal_values(user_inputs)
 
     # ------------------------
     # Unpack case assumptions
     # ------------------------
-    entry_multiple = case_assumptions["entry_multiple"]
-    revenue_growth = case_assumptions["revenue_growth"] / 100
-    exit_multiple = case_assumptions["exit_multiple"]
-    margin_change = case_assumptions["margin_change_bps"] / 10000  # bps to decimal, annual change
+    entry_multiple, revenue_growth, exit_multiple, margin_change = _case_values(case_assumptions)
+    revenue_growth = revenue_growth / 100
+    margin_change = margin_change / 10000  # bps to decimal, annual change
 
     # ------------------------
     # Initial calculations
@@ -57,8 +100,9 @@ def run_lbo_case(
     debt = entry_debt
     current_revenue = revenue
     current_margin = initial_margin
+    schedule = []
 
-    for _ in range(hold_years):
+    for year in range(1, hold_years + 1):
         # Grow revenue
         current_revenue *= (1 + revenue_growth)
 
@@ -92,6 +136,20 @@ def run_lbo_case(
         # Use FCF to pay down debt (no increase if negative)
         debt = max(debt - fcf, 0)
 
+        if include_schedule:
+            schedule.append({
+                "year": year,
+                "revenue": current_revenue,
+                "ebitda": current_ebitda,
+                "depreciation_amortization": current_da,
+                "capex": current_capex,
+                "interest": interest,
+                "taxes": taxes,
+                "net_income": net_income,
+                "fcf": fcf,
+                "debt": debt,
+            })
+
     # ------------------------
     # Exit valuation
     # ------------------------
@@ -104,9 +162,387 @@ def run_lbo_case(
     money_multiple = exit_equity / entry_equity if entry_equity > 0 else 0
     irr = (money_multiple ** (1 / hold_years)) - 1 if money_multiple > 0 else 0
 
-    return {
+    results = {
         "entry_equity": entry_equity,
         "exit_equity": exit_equity,
         "money_multiple": round(money_multiple, 2),
         "irr": round(irr * 100, 2)
-    }
\ No newline at end of file
+    }
+    if include_schedule:
+        results["schedule"] = schedule
+    return results
+
+
+# ------------------------
+# Batch (vectorized) engine
+# ------------------------
+
+USER_INPUT_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "tax_rate",
+    "debt_percentage",
+    "interest_rate",
+    "hold_period_years",
+)
+
+CASE_FIELDS = (
+    "entry_multiple",
+    "revenue_growth",
+    "exit_multiple",
+    "margin_change_bps",
+)
+
+RESULT_DTYPE = np.dtype([
+    ("entry_equity", "f8"),
+    ("exit_equity", "f8"),
+    ("money_multiple", "f8"),
+    ("irr", "f8"),
+])
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of Python's round(x, 2).
+
+    np.round scales by 100 and rounds the (inexact) product, which
+    disagrees with the built-in round on values such as 2.675. Here the
+    product is computed exactly (Dekker two-product) so the
+    half-to-even decision is made on the true binary value.
+    """
+    x = np.asarray(values, dtype=float)
+    p = x * 100.0
+
+    split = 134217729.0 * x
+    x_hi = split - (split - x)
+    x_lo = x - x_hi
+    err = (x_hi * 100.0 - p) + x_lo * 100.0
+
+    floor_p = np.floor(p)
+    frac = p - floor_p
+    k = np.where(frac > 0.5, floor_p + 1, floor_p)
+
+    tie = frac == 0.5
+    up = tie & ((err > 0) | ((err == 0) & (np.fmod(floor_p, 2) != 0)))
+    k = np.where(up, floor_p + 1, k)
+
+    out = k / 100.0
+    return np.where(np.isfinite(p), out, x)
+
+
+def _unpack_batch(user_inputs: Dict, case_assumptions: Dict) -> Dict:
+    """
+    Converts scalar-or-array inputs to float arrays without broadcasting
+    them, so values that do not vary are only computed once.
+    """
+
+    user_inputs = as_mapping(user_inputs)
+    case_assumptions = as_mapping(case_assumptions)
+
+    values = {}
+    for field in USER_INPUT_FIELDS:
+        source = case_assumptions if field in case_assumptions else user_inputs
+        values[field] = np.asarray(source[field], dtype=float)
+    for field in CASE_FIELDS:
+        values[field] = np.asarray(case_assumptions[field], dtype=float)
+
+    hold = values["hold_period_years"]
+    if np.any(hold != np.floor(hold)) or np.any(hold < 1):
+        raise ValueError("hold_period_years must be a positive whole number")
+    values["hold_period_years"] = hold.astype(int)
+    return values
+
+
+@timed("engine.project_batch")
+def project_batch(user_inputs: Dict, case_assumptions: Dict, include_schedule: bool = False) -> Dict:
+    """
+    Projects many cases at once and returns unrounded arrays.
+
+    Every entry of ``case_assumptions`` is a scalar or array; any user
+    input may also be overridden per case by adding it to
+    ``case_assumptions``. Inputs broadcast against each other with
+    NumPy rules, so a (n, 1) array against a (1, m) array yields an
+    (n, m) grid, and parts of the projection that depend only on one
+    axis are computed once for that axis.
+
+    Mirrors run_lbo_case step for step (same operation order, margin
+    clamp, tax floor on EBT and no-negative-debt rule).
+
+    With ``include_schedule`` the result also carries "schedule": one
+    (*shape, max hold) array per SCHEDULE_FIELDS entry, NaN in the
+    years after a case's exit.
+    """
+
+    v = _unpack_batch(user_inputs, case_assumptions)
+
+    revenue = v["revenue"]
+    ebitda = v["ebitda"]
+    tax_rate = v["tax_rate"]
+    interest_rate = v["interest_rate"]
+    hold_years = v["hold_period_years"]
+
+    revenue_growth = v["revenue_growth"] / 100
+    margin_change = v["margin_change_bps"] / 10000
+
+    # ------------------------
+    # Initial calculations
+    # ------------------------
+    positive = revenue > 0
+    safe_revenue = np.where(positive, revenue, 1.0)
+    initial_margin = np.where(positive, ebitda / safe_revenue, 0.0)
+    initial_da_pct = np.where(positive, v["depreciation_amortization"] / safe_revenue, 0.0)
+    initial_capex_pct = np.where(positive, v["capex"] / safe_revenue, 0.0)
+
+    # ------------------------
+    # Entry valuation
+    # ------------------------
+    entry_ev = ebitda * v["entry_multiple"]
+    entry_debt = entry_ev * v["debt_percentage"]
+    entry_equity = entry_ev - entry_debt
+
+    # ------------------------
+    # Project cash flows
+    # ------------------------
+    debt = entry_debt
+    current_revenue = revenue
+    current_margin = initial_margin
+    current_ebitda = np.zeros(())
+
+    max_hold = int(hold_years.max())
+    uniform_hold = bool(np.all(hold_years == max_hold))
+
+    schedule = None
+    if include_schedule:
+        full_shape = np.broadcast_shapes(*(value.shape for value in v.values()))
+        schedule = {name: np.empty(full_shape + (max_hold,)) for name in SCHEDULE_FIELDS}
+
+    for year in range(max_hold):
+        next_revenue = current_revenue * (1 + revenue_growth)
+        next_margin = np.maximum(0, np.minimum(current_margin + margin_change, 1))
+        next_ebitda = next_revenue * next_margin
+
+        current_da = next_revenue * initial_da_pct
+        current_capex = next_revenue * initial_capex_pct
+
+        interest = debt * interest_rate
+
+        ebit = next_ebitda - current_da
+        ebt = ebit - interest
+        taxes = np.maximum(ebt, 0) * tax_rate
+
+        net_income = ebt - taxes
+        fcf = net_income + current_da - current_capex
+
+        next_debt = np.maximum(debt - fcf, 0)
+
+        if schedule is not None:
+            row = (next_revenue, next_ebitda, current_da, current_capex, interest, taxes, net_income, fcf, next_debt)
+            for name, value in zip(SCHEDULE_FIELDS, row):
+                schedule[name][..., year] = value if uniform_hold else np.where(year < hold_years, value, np.nan)
+
+        if uniform_hold:
+            current_revenue, current_margin = next_revenue, next_margin
+            current_ebitda, debt = next_ebitda, next_debt
+        else:
+            # Cases with a shorter hold period keep their exit-year state
+            active = year < hold_years
+            current_revenue = np.where(active, next_revenue, current_revenue)
+            current_margin = np.where(active, next_margin, current_margin)
+            current_ebitda = np.where(active, next_ebitda, current_ebitda)
+            debt = np.where(active, next_debt, debt)
+
+    # ------------------------
+    # Exit valuation
+    # ------------------------
+    exit_ev = current_ebitda * v["exit_multiple"]
+    exit_equity = exit_ev - debt
+
+    # ------------------------
+    # Returns
+    # ------------------------
+    entry_positive = entry_equity > 0
+    money_multiple = np.where(
+        entry_positive, exit_equity / np.where(entry_positive, entry_equity, 1.0), 0.0
+    )
+    mm_positive = money_multiple > 0
+    irr = np.where(
+        mm_positive,
+        np.power(np.where(mm_positive, money_multiple, 1.0), 1 / hold_years) - 1,
+        0.0,
+    )
+
+    shape = np.broadcast_shapes(entry_equity.shape, exit_equity.shape, irr.shape)
+    results = {
+        "entry_equity": np.broadcast_to(entry_equity, shape),
+        "exit_equity": np.broadcast_to(exit_equity, shape),
+        "money_multiple": np.broadcast_to(money_multiple, shape),
+        "irr": np.broadcast_to(irr, shape),
+    }
+    if schedule is not None:
+        results["schedule"] = schedule
+        results["hold_period_years"] = np.broadcast_to(hold_years, schedule["revenue"].shape[:-1])
+    return results
+
+
+def project_schedules(user_inputs: Dict, case_assumptions: Dict) -> ScheduleTable:
+    """
+    Year-by-year projection of every case as a columnar ScheduleTable.
+
+    Inputs broadcast as in project_batch; cases are numbered in C order
+    of the broadcast shape (for a (deals, 1) x (1, 3) grid, case
+    3 * deal + scenario). Values match run_lbo_case's schedule exactly.
+    """
+
+    projected = project_batch(user_inputs, case_assumptions, include_schedule=True)
+    max_hold = projected["schedule"]["revenue"].shape[-1]
+    columns = {name: values.reshape(-1, max_hold) for name, values in projected["schedule"].items()}
+    return ScheduleTable.from_grid(columns, projected["hold_period_years"].reshape(-1))
+
+
+EXIT_CURVE_FIELDS = ("ebitda", "debt", "exit_equity", "money_multiple", "irr")
+
+
+@timed("engine.project_exit_curve")
+def project_exit_curve(user_inputs: Dict, case_assumptions: Dict, max_years: Optional[int] = None) -> Dict:
+    """
+    Exit valuation and returns for every exit year 1..N from one pass.
+
+    Year k of the curve equals project_batch with hold_period_years = k
+    (the projection up to year k does not depend on the hold period),
+    so an N-year sweep costs one N-year projection instead of N runs.
+    ``max_years`` defaults to the longest hold period in the inputs.
+
+    Returns EXIT_CURVE_FIELDS as (*shape, N) arrays (IRR as a decimal),
+    "entry_equity" shaped like the inputs, "exit_year" (1..N) and
+    "best_year", the IRR-maximizing exit per case.
+    """
+
+    v = _unpack_batch(user_inputs, case_assumptions)
+    n_years = int(max_years) if max_years is not None else int(v["hold_period_years"].max())
+    if n_years < 1:
+        raise ValueError("max_years must be at least 1")
+
+    revenue = v["revenue"]
+    revenue_growth = v["revenue_growth"] / 100
+    margin_change = v["margin_change_bps"] / 10000
+
+    positive = revenue > 0
+    safe_revenue = np.where(positive, revenue, 1.0)
+    initial_margin = np.where(positive, v["ebitda"] / safe_revenue, 0.0)
+    initial_da_pct = np.where(positive, v["depreciation_amortization"] / safe_revenue, 0.0)
+    initial_capex_pct = np.where(positive, v["capex"] / safe_revenue, 0.0)
+
+    entry_ev = v["ebitda"] * v["entry_multiple"]
+    entry_debt = entry_ev * v["debt_percentage"]
+    entry_equity = entry_ev - entry_debt
+    entry_positive = entry_equity > 0
+    safe_entry = np.where(entry_positive, entry_equity, 1.0)
+
+    shape = np.broadcast_shapes(*(value.shape for name, value in v.items() if name != "hold_period_years"))
+    curve = {name: np.empty(shape + (n_years,)) for name in EXIT_CURVE_FIELDS}
+
+    debt = entry_debt
+    current_revenue = revenue
+    current_margin = initial_margin
+
+    # Same operations, in the same order, as project_batch
+    for year in range(n_years):
+        current_revenue = current_revenue * (1 + revenue_growth)
+        current_margin = np.maximum(0, np.minimum(current_margin + margin_change, 1))
+        current_ebitda = current_revenue * current_margin
+
+        current_da = current_revenue * initial_da_pct
+        current_capex = current_revenue * initial_capex_pct
+        interest = debt * v["interest_rate"]
+
+        ebt = (current_ebitda - current_da) - interest
+        taxes = np.maximum(ebt, 0) * v["tax_rate"]
+        fcf = (ebt - taxes) + current_da - current_capex
+        debt = np.maximum(debt - fcf, 0)
+
+        exit_equity = current_ebitda * v["exit_multiple"] - debt
+        money_multiple = np.where(entry_positive, exit_equity / safe_entry, 0.0)
+        mm_positive = money_multiple > 0
+        irr = np.where(mm_positive, np.power(np.where(mm_positive, money_multiple, 1.0), 1 / (year + 1)) - 1, 0.0)
+
+        for name, value in zip(EXIT_CURVE_FIELDS, (current_ebitda, debt, exit_equity, money_multiple, irr)):
+            curve[name][..., year] = value
+
+    curve["entry_equity"] = np.broadcast_to(entry_equity, shape)
+    curve["exit_year"] = np.arange(1, n_years + 1)
+    curve["best_year"] = curve["irr"].argmax(axis=-1) + 1
+    return curve
+
+
+def exit_year_curve(user_inputs: Dict, case_assumptions: Dict, max_years: Optional[int] = None) -> List[Dict]:
+    """
+    One case's curve as rows shaped like run_lbo_case output (rounded
+    money multiple, IRR in percent) plus "exit_year".
+    """
+
+    curve = project_exit_curve(user_inputs, case_assumptions, max_years)
+    rows = zip(
+        curve["exit_year"].tolist(),
+        curve["exit_equity"].reshape(-1).tolist(),
+        _round2(curve["money_multiple"].reshape(-1)).tolist(),
+        _round2(curve["irr"].reshape(-1) * 100).tolist(),
+    )
+    entry_equity = float(curve["entry_equity"].reshape(-1)[0])
+    return [
+        {
+            "exit_year": year,
+            "entry_equity": entry_equity,
+            "exit_equity": exit_equity,
+            "money_multiple": money_multiple,
+            "irr": irr,
+        }
+        for year, exit_equity, money_multiple, irr in rows
+    ]
+
+
+def run_lbo_batch(
+    user_inputs: Dict,
+    case_assumptions: Dict,
+    as_frame: bool = False
+):
+    """
+    Runs LBO calculations for many scenarios in one vectorized pass.
+
+    Returns a structured array (fields from RESULT_DTYPE) shaped like
+    the broadcast inputs, or a pandas DataFrame when ``as_frame`` is
+    set. Money multiple and IRR are rounded exactly as run_lbo_case
+    rounds them.
+    """
+
+    projected = project_batch(user_inputs, case_assumptions)
+    shape = projected["irr"].shape
+
+    results = np.empty(shape, dtype=RESULT_DTYPE)
+    results["entry_equity"] = projected["entry_equity"]
+    results["exit_equity"] = projected["exit_equity"]
+    results["money_multiple"] = _round2(projected["money_multiple"])
+    results["irr"] = _round2(projected["irr"] * 100)
+
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame(results.reshape(-1))
+    return results
+
+
+def run_case(deal: DealInputs, case: CaseAssumptions) -> CaseResult:
+    """
+    Typed counterpart of run_lbo_case.
+    """
+
+    return CaseResult.from_dict(run_lbo_case(deal, case))
+
+
+def run_case_batch(deals, cases) -> ResultBatch:
+    """
+    Typed counterpart of run_lbo_batch: takes DealBatch / CaseBatch (or
+    single typed records, which broadcast) and returns a ResultBatch.
+    """
+
+    return ResultBatch.from_structured(run_lbo_batch(deals, cases))
@@ -0,0 +1,249 @@
+"""
+
+Compact typed representations of deals, cases and results.
+
+Single records are frozen, slotted dataclasses: cheap to create,
+hashable (usable as cache keys) and attribute-accessed instead of
+string-keyed. Batches are struct-of-arrays: one contiguous NumPy array
+per field, so millions of cases live in a handful of buffers instead of
+millions of small dicts. Every type converts to and from the dict
+shapes used elsewhere in the code base.
+
+
+"""
+
+from dataclasses import dataclass, fields
+from typing import Dict, Iterable, Union
+
+import numpy as np
+
+
+@dataclass(frozen=True, slots=True)
+class DealInputs:
+    """
+    User-provided deal facts (the dict validated by validate_user_inputs).
+    """
+
+    revenue: float
+    ebitda: float
+    depreciation_amortization: float
+    capex: float
+    tax_rate: float
+    debt_percentage: float
+    interest_rate: float
+    hold_period_years: int
+    industry: str = ""
+    geography: str = ""
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "DealInputs":
+        return cls(
+            revenue=values["revenue"],
+            ebitda=values["ebitda"],
+            depreciation_amortization=values["depreciation_amortization"],
+            capex=values["capex"],
+            tax_rate=values["tax_rate"],
+            debt_percentage=values["debt_percentage"],
+            interest_rate=values["interest_rate"],
+            hold_period_years=values["hold_period_years"],
+            industry=values.get("industry", ""),
+            geography=values.get("geography", ""),
+        )
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True, slots=True)
+class CaseAssumptions:
+    """
+    Point assumptions for one scenario (a case from build_cases).
+    """
+
+    entry_multiple: float
+    revenue_growth: float
+    exit_multiple: float
+    margin_change_bps: float
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "CaseAssumptions":
+        return cls(
+            entry_multiple=values["entry_multiple"],
+            revenue_growth=values["revenue_growth"],
+            exit_multiple=values["exit_multiple"],
+            margin_change_bps=values["margin_change_bps"],
+        )
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True, slots=True)
+class CaseResult:
+    """
+    Headline returns for one scenario (the dict from run_lbo_case).
+    """
+
+    entry_equity: float
+    exit_equity: float
+    money_multiple: float
+    irr: float
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "CaseResult":
+        return cls(
+            entry_equity=values["entry_equity"],
+            exit_equity=values["exit_equity"],
+            money_multiple=values["money_multiple"],
+            irr=values["irr"],
+        )
+
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+DEAL_NUMERIC_FIELDS = tuple(f.name for f in fields(DealInputs) if f.name not in ("industry", "geography"))
+CASE_NUMERIC_FIELDS = tuple(f.name for f in fields(CaseAssumptions))
+RESULT_NUMERIC_FIELDS = tuple(f.name for f in fields(CaseResult))
+
+
+# ------------------------
+# Struct-of-arrays batches
+# ------------------------
+
+class _ArrayBatch:
+    """
+    Shared behaviour for batches holding one array per field.
+    """
+
+    __slots__ = ("_arrays",)
+    record_type = None
+    numeric_fields = ()
+    integer_fields = ()
+
+    def __init__(self, **arrays):
+        missing = [name for name in self.numeric_fields if name not in arrays]
+        if missing:
+            raise ValueError(f"Missing batch fields: {', '.join(missing)}")
+        self._arrays = {
+            name: np.ascontiguousarray(value, dtype=float) for name, value in arrays.items()
+            if name in self.numeric_fields
+        }
+        self._arrays.update({
+            name: np.asarray(value) for name, value in arrays.items()
+            if name not in self.numeric_fields
+        })
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Private/dunder lookups (e.g. from pickle) must not touch _arrays
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._arrays[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(self._arrays[self.numeric_fields[0]])
+
+    def __getitem__(self, index: int):
+        values = {}
+        for name, array in self._arrays.items():
+            value = array[index]
+            value = value.item() if isinstance(value, np.generic) else value
+            values[name] = int(value) if name in self.integer_fields else value
+        return self.record_type(**values)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def as_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Field name -> array mapping accepted wherever the engine takes a dict.
+        """
+        return dict(self._arrays)
+
+    @classmethod
+    def from_records(cls, records: Iterable):
+        """
+        Builds a batch from dicts or typed records.
+        """
+
+        records = list(records)
+        names = [f.name for f in fields(cls.record_type)]
+        columns = {name: [] for name in names}
+        for record in records:
+            get = record.get if isinstance(record, dict) else (lambda n, r=record: getattr(r, n))
+            for name in names:
+                columns[name].append(get(name))
+        return cls(**columns)
+
+    def to_records(self) -> list:
+        return [record.to_dict() for record in self]
+
+
+class DealBatch(_ArrayBatch):
+    """
+    Many deals as one array per input field (plus industry/geography).
+    """
+
+    __slots__ = ()
+    record_type = DealInputs
+    numeric_fields = DEAL_NUMERIC_FIELDS
+    integer_fields = ("hold_period_years",)
+
+
+class CaseBatch(_ArrayBatch):
+    """
+    Many cases as one array per assumption.
+    """
+
+    __slots__ = ()
+    record_type = CaseAssumptions
+    numeric_fields = CASE_NUMERIC_FIELDS
+
+
+class ResultBatch(_ArrayBatch):
+    """
+    Many results as one array per metric.
+    """
+
+    __slots__ = ()
+    record_type = CaseResult
+    numeric_fields = RESULT_NUMERIC_FIELDS
+
+    @classmethod
+    def from_structured(cls, results: np.ndarray) -> "ResultBatch":
+        """
+        Splits the structured array returned by run_lbo_batch into one
+        contiguous array per metric.
+        """
+        flat = results.reshape(-1)
+        return cls(**{name: flat[name] for name in RESULT_NUMERIC_FIELDS})
+
+
+# ------------------------
+# Adapters
+# ------------------------
+
+def as_mapping(values: Union[Dict, DealInputs, CaseAssumptions, CaseResult, _ArrayBatch]):
+    """
+    Presents any supported input as a field -> value mapping.
+    """
+
+    if isinstance(values, dict):
+        return values
+    if isinstance(values, _ArrayBatch):
+        return values.as_arrays()
+    if isinstance(values, (DealInputs, CaseAssumptions, CaseResult)):
+        return values.to_dict()
+    raise TypeError(f"Unsupported input type: {type(values).__name__}")
+
+
+def as_deal_inputs(values: Union[Dict, DealInputs]) -> DealInputs:
+    return values if isinstance(values, DealInputs) else DealInputs.from_dict(values)
+
+
+def as_case_assumptions(values: Union[Dict, CaseAssumptions]) -> CaseAssumptions:
+    return values if isinstance(values, CaseAssumptions) else CaseAssumptions.from_dict(values)
@@ -0,0 +1,313 @@
+"""
+
+Monte Carlo simulation over the AI-generated assumption ranges.
+
+Instead of collapsing each [low, high] range to its midpoint (see
+case_constructor.py), entry multiple, exit multiple, revenue growth and
+margin change are sampled from the ranges and every path is run through
+the batch LBO engine.
+
+
+"""
+
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import timed
+from engine_backends import project
+from lbo_engine import project_exit_curve
+
+
+SAMPLED_VARIABLES = (
+    "entry_multiple",
+    "exit_multiple",
+    "revenue_growth",
+    "margin_change_bps",
+)
+
+DISTRIBUTIONS = ("uniform", "triangular", "normal")
+
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Normal ranges are read as a 90% interval: low and high sit at +/- 1.645 sd
+NORMAL_RANGE_Z = 1.6448536269514722
+
+
+def assumption_ranges(ai_assumptions: Dict, case: str = "base") -> Dict[str, Tuple[float, float]]:
+    """
+    Returns the (low, high) sampling range for each variable.
+
+    ``case`` is "downside", "base", "upside" or "full" (lowest low to
+    highest high across all three cases). Margin change is a single
+    value per case, so its range spans the neighbouring cases:
+    downside -> [downside, base], base -> [downside, upside],
+    upside -> [base, upside].
+    """
+
+    cases = ["downside", "base", "upside"]
+    if case not in cases and case != "full":
+        raise ValueError(f"Unknown case: {case}")
+
+    ranges = {}
+    for variable in ("entry_multiple", "exit_multiple", "revenue_growth"):
+        if case == "full":
+            low = min(min(ai_assumptions[variable][c]) for c in cases)
+            high = max(max(ai_assumptions[variable][c]) for c in cases)
+        else:
+            low, high = sorted(ai_assumptions[variable][case])
+        ranges[variable] = (float(low), float(high))
+
+    margins = ai_assumptions["margin_change_bps"]
+    neighbours = {
+        "downside": ("downside", "base"),
+        "base": ("downside", "upside"),
+        "upside": ("base", "upside"),
+        "full": ("downside", "upside"),
+    }[case]
+    bounds = [float(margins[c]) for c in neighbours]
+    ranges["margin_change_bps"] = (min(bounds), max(bounds))
+
+    return ranges
+
+
+def correlation_matrix(correlation=None) -> np.ndarray:
+    """
+    Builds the correlation matrix over SAMPLED_VARIABLES.
+
+    Accepts None (independent), a full square matrix, or a dict of
+    pairwise correlations such as
+    {("entry_multiple", "exit_multiple"): 0.6}.
+    """
+
+    n = len(SAMPLED_VARIABLES)
+    if correlation is None:
+        return np.eye(n)
+
+    if isinstance(correlation, dict):
+        matrix = np.eye(n)
+        for (a, b), rho in correlation.items():
+            i, j = SAMPLED_VARIABLES.index(a), SAMPLED_VARIABLES.index(b)
+            matrix[i, j] = matrix[j, i] = rho
+    else:
+        matrix = np.asarray(correlation, dtype=float)
+
+    if matrix.shape != (n, n) or not np.allclose(matrix, matrix.T):
+        raise ValueError("Correlation matrix must be symmetric and match the sampled variables")
+    if not np.allclose(np.diag(matrix), 1) or np.any(np.abs(matrix) > 1):
+        raise ValueError("Correlations must lie in [-1, 1] with a unit diagonal")
+    if np.linalg.eigvalsh(matrix).min() < -1e-10:
+        raise ValueError("Correlation matrix must be positive semi-definite")
+
+    return matrix
+
+
+def _norm_cdf(z: np.ndarray) -> np.ndarray:
+    """
+    Standard normal CDF (Abramowitz & Stegun 7.1.26, |error| < 1.5e-7).
+    """
+    x = np.abs(z) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+
+def _from_uniform(u: np.ndarray, low: float, high: float, distribution: str) -> np.ndarray:
+    """
+    Maps uniforms in (0, 1) onto a [low, high] range.
+    """
+
+    width = high - low
+    if distribution == "uniform":
+        return low + u * width
+
+    if distribution == "triangular":
+        # Mode at the midpoint, matching the deterministic case
+        return np.where(
+            u < 0.5,
+            low + np.sqrt(u * width * width / 2),
+            high - np.sqrt((1 - u) * width * width / 2),
+        )
+
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+
+def sample_assumptions(
+    ranges: Dict[str, Tuple[float, float]],
+    n: int,
+    distributions: Optional[Dict[str, str]] = None,
+    correlation=None,
+    rng: Optional[np.random.Generator] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Draws ``n`` correlated samples for each variable in SAMPLED_VARIABLES.
+
+    Correlation is applied with a Gaussian copula, so it holds across
+    mixed distributions.
+    """
+
+    rng = rng or np.random.default_rng()
+    distributions = {**{v: "triangular" for v in SAMPLED_VARIABLES}, **(distributions or {})}
+    for variable, distribution in distributions.items():
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution for {variable}: {distribution}")
+
+    matrix = correlation if isinstance(correlation, np.ndarray) else correlation_matrix(correlation)
+    z = rng.standard_normal((len(SAMPLED_VARIABLES), n))
+    if not np.array_equal(matrix, np.eye(len(SAMPLED_VARIABLES))):
+        # eigh rather than Cholesky so perfectly correlated inputs still work
+        eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+        z = (eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))) @ z
+
+    samples = {}
+    for i, variable in enumerate(SAMPLED_VARIABLES):
+        low, high = ranges[variable]
+        distribution = distributions[variable]
+        if distribution == "normal":
+            mean, sd = (low + high) / 2, (high - low) / (2 * NORMAL_RANGE_Z)
+            samples[variable] = mean + sd * z[i]
+        else:
+            samples[variable] = _from_uniform(_norm_cdf(z[i]), low, high, distribution)
+
+    return samples
+
+
+def _simulate_chunk(args) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Runs one chunk of paths; module-level so it can be sent to a process pool.
+
+    With ``exit_years`` the third result is the (paths, years) IRR of
+    every exit year, from the same single projection pass.
+    """
+
+    user_inputs, ranges, distributions, matrix, size, seed, exit_years = args
+    rng = np.random.default_rng(seed)
+    samples = sample_assumptions(ranges, size, distributions, matrix, rng)
+    projected = project(user_inputs, samples)
+    curve = None
+    if exit_years:
+        curve = project_exit_curve(user_inputs, samples, exit_years)["irr"] * 100
+    return projected["irr"] * 100, np.array(projected["money_multiple"]), curve
+
+
+def _summarize_curve(curve: np.ndarray, hurdle_irr: float) -> Dict:
+    """
+    Per exit year: mean and median IRR, P(IRR >= hurdle) and the share of
+    paths for which that year is the IRR-maximizing exit.
+    """
+
+    n_years = curve.shape[1]
+    best = np.bincount(curve.argmax(axis=1), minlength=n_years) / len(curve)
+    return {
+        "exit_year": list(range(1, n_years + 1)),
+        "irr_mean": [round(float(v), 2) for v in curve.mean(axis=0)],
+        "irr_median": [round(float(v), 2) for v in np.median(curve, axis=0)],
+        "prob_irr_above_hurdle": [round(float(v), 4) for v in (curve >= hurdle_irr).mean(axis=0)],
+        "prob_optimal": [round(float(v), 4) for v in best],
+    }
+
+
+def _summarize(values: np.ndarray, percentiles: Sequence[float]) -> Dict:
+    """
+    Mean, standard deviation and percentiles of one output metric.
+    """
+
+    points = np.percentile(values, percentiles)
+    return {
+        "mean": round(float(values.mean()), 2),
+        "std": round(float(values.std()), 2),
+        "percentiles": {p: round(float(v), 2) for p, v in zip(percentiles, points)},
+    }
+
+
+@timed("montecarlo.run_monte_carlo")
+def run_monte_carlo(
+    user_inputs: Dict,
+    ai_assumptions: Dict,
+    case: str = "base",
+    n_paths: int = 100_000,
+    distributions: Optional[Dict[str, str]] = None,
+    correlation=None,
+    hurdle_irr: float = 20.0,
+    hurdle_moic: Optional[float] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    chunk_size: int = 100_000,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    return_samples: bool = False,
+    exit_years: Optional[int] = None
+) -> Dict:
+    """
+    Simulates ``n_paths`` LBO outcomes and summarises IRR and MOIC.
+
+    Paths are generated in chunks of ``chunk_size`` so peak memory does
+    not grow with ``n_paths``. With ``workers`` > 1 the chunks run on
+    the shared scheduler pool. Each chunk has its own seed derived from
+    ``seed``, so results are reproducible whatever the worker count.
+
+    IRR figures and ``hurdle_irr`` are percentages, as in run_lbo_case.
+
+    ``exit_years`` = N adds "exit_curve": IRR statistics for exiting in
+    each of years 1..N on every path (see project_exit_curve).
+    """
+
+    if n_paths <= 0:
+        raise ValueError("n_paths must be positive")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    ranges = assumption_ranges(ai_assumptions, case)
+    matrix = correlation_matrix(correlation)
+
+    sizes = [chunk_size] * (n_paths // chunk_size)
+    if n_paths % chunk_size:
+        sizes.append(n_paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (user_inputs, ranges, distributions, matrix, size, chunk_seed, exit_years)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+
+    irr = np.empty(n_paths)
+    moic = np.empty(n_paths)
+    curve = np.empty((n_paths, exit_years)) if exit_years else None
+
+    if workers and workers > 1 and len(tasks) > 1:
+        from scheduler import get_executor
+
+        chunks = get_executor(workers).map(_simulate_chunk, tasks)
+    else:
+        chunks = map(_simulate_chunk, tasks)
+
+    offset = 0
+    for chunk_irr, chunk_moic, chunk_curve in chunks:
+        irr[offset:offset + len(chunk_irr)] = chunk_irr
+        moic[offset:offset + len(chunk_moic)] = chunk_moic
+        if curve is not None:
+            curve[offset:offset + len(chunk_irr)] = chunk_curve
+        offset += len(chunk_irr)
+
+    results = {
+        "case": case,
+        "n_paths": n_paths,
+        "ranges": ranges,
+        "irr": _summarize(irr, percentiles),
+        "money_multiple": _summarize(moic, percentiles),
+        "hurdle_irr": hurdle_irr,
+        "prob_irr_above_hurdle": round(float((irr >= hurdle_irr).mean()), 4),
+        "prob_capital_loss": round(float((moic < 1).mean()), 4),
+    }
+
+    if hurdle_moic is not None:
+        results["hurdle_moic"] = hurdle_moic
+        results["prob_moic_above_hurdle"] = round(float((moic >= hurdle_moic).mean()), 4)
+
+    if curve is not None:
+        results["exit_curve"] = _summarize_curve(curve, hurdle_irr)
+
+    if return_samples:
+        results["samples"] = {"irr": irr, "money_multiple": moic}
+
+    return results
@@ -0,0 +1,127 @@
+import datetime
+
+import streamlit as st
+
+from case_constructor import CASE_ORDER
+from results_store import GROUP_COLUMNS, get_default_store
+
+# Every run recorded in the results store (by the main page or
+# batch_runner.py --store), filtered, aggregated and compared side by side
+
+
+@st.cache_resource
+def get_results_store():
+    return get_default_store()
+
+
+st.set_page_config(page_title="Scenario Comparison", layout="wide")
+
+st.title("Scenario Comparison")
+
+store = get_results_store()
+
+if store.count() == 0:
+    st.info("No runs recorded yet. Generate an LBO on the main page, or run batch_runner.py with --store.")
+    st.stop()
+
+# FILTERS
+with st.sidebar:
+    st.header("Filters")
+    industries = st.multiselect("Industry", store.distinct("industry"))
+    geographies = st.multiselect("Geography", store.distinct("geography"))
+    scenarios = st.multiselect("Case", list(CASE_ORDER), default=["base"])
+    today = datetime.date.today()
+    dates = st.date_input("Recorded between", (today - datetime.timedelta(days=90), today))
+    irr_range = st.slider("IRR (%)", min_value=-100.0, max_value=200.0, value=(-100.0, 200.0), step=1.0)
+    group_by = st.multiselect(
+        "Group by", [c for c in GROUP_COLUMNS if c != "label"], default=["industry"]
+    )
+
+filters = {
+    "industry": industries or None,
+    "geography": geographies or None,
+    "scenario": scenarios or None,
+    "min_irr": irr_range[0] if irr_range[0] > -100.0 else None,
+    "max_irr": irr_range[1] if irr_range[1] < 200.0 else None,
+}
+if isinstance(dates, (tuple, list)) and len(dates) == 2:
+    filters["since"] = datetime.datetime.combine(dates[0], datetime.time.min).timestamp()
+    filters["until"] = datetime.datetime.combine(dates[1] + datetime.timedelta(days=1), datetime.time.min).timestamp()
+
+# OVERVIEW
+totals = store.summary((), **filters)[0]
+cols = st.columns(3)
+cols[0].metric("Scenarios", f"{totals['scenarios']:,}")
+cols[1].metric("Mean IRR (%)", f"{totals['irr_mean']:.2f}%" if totals["irr_mean"] is not None else "-")
+cols[2].metric("Mean Money Multiple", f"{totals['money_multiple_mean']:.2f}x" if totals["money_multiple_mean"] is not None else "-")
+
+if totals["scenarios"] == 0:
+    st.warning("No scenarios match these filters.")
+    st.stop()
+
+# BY GROUP
+if group_by:
+    st.header("By " + " × ".join(c.replace("_", " ").title() for c in group_by))
+    groups = store.summary(group_by, **filters)
+    for group in groups:
+        group["group"] = " / ".join(str(group[c]) for c in group_by)
+    st.bar_chart({"group": [g["group"] for g in groups], "Mean IRR (%)": [g["irr_mean"] for g in groups]}, x="group", y="Mean IRR (%)")
+    st.dataframe(
+        [
+            {
+                **{c.replace("_", " ").title(): g[c] for c in group_by},
+                "Scenarios": g["scenarios"],
+                "Mean IRR (%)": round(g["irr_mean"], 2),
+                "Min IRR (%)": g["irr_min"],
+                "Max IRR (%)": g["irr_max"],
+                "Mean Money Multiple (x)": round(g["money_multiple_mean"], 2),
+            }
+            for g in groups
+        ],
+        use_container_width=True,
+    )
+
+# SCENARIOS
+st.header("Scenarios")
+rows = store.scenarios(limit=5000, **filters)
+st.caption(f"Entry multiple against IRR for the {len(rows):,} most recent matching scenarios.")
+st.scatter_chart(
+    {
+        "entry_multiple": [r["entry_multiple"] for r in rows],
+        "irr": [r["irr"] for r in rows],
+        "scenario": [r["scenario"] for r in rows],
+    },
+    x="entry_multiple",
+    y="irr",
+    color="scenario",
+)
+
+with st.expander("Top scenarios by IRR"):
+    st.dataframe(store.scenarios(order_by="irr", limit=50, **filters), use_container_width=True)
+
+# RUN COMPARISON
+st.header("Compare Runs")
+recent = store.runs(limit=200)
+labels = {
+    run["key"]: (
+        f"{run['label'] or run['industry']} / {run['geography']} - "
+        f"{datetime.datetime.fromtimestamp(run['created_at']):%Y-%m-%d %H:%M} ({run['key'][:8]})"
+    )
+    for run in recent
+}
+selected = st.multiselect("Runs", list(labels), default=list(labels)[:3], format_func=labels.get)
+if selected:
+    st.dataframe(
+        [
+            {
+                "Run": labels[row["key"]],
+                **{
+                    f"{name.capitalize()} {metric}": row[f"{name}_{field}"]
+                    for name in CASE_ORDER
+                    for field, metric in (("irr", "IRR (%)"), ("money_multiple", "MoM (x)"))
+                },
+            }
+            for row in store.compare(selected)
+        ],
+        use_container_width=True,
+    )
@@ -0,0 +1,544 @@
+"""
+
+Persistent, content-addressed store of model runs.
+
+Every run (deal inputs + AI assumptions + analysis options such as the
+Monte Carlo settings or a capital structure) is keyed by a hash of the
+values that determine its results, so recording an identical run twice
+only bumps its hit count and looking it up replaces recomputing it.
+
+SQLite layout:
+
+    runs         one row per run (content hash -> integer id): context,
+                 inputs, sensitivities and Monte Carlo summary (JSON),
+                 hit count and timestamps
+    assumptions  assumption sets, stored once however many runs share them
+    scenarios    one row per (run, case) with the headline metrics and
+                 case assumptions, denormalized with industry, geography
+                 and date so cross-deal filters and aggregates are plain
+                 indexed scans
+
+Indexes cover industry, geography, date and IRR; the industry index also
+carries the metrics, so summaries grouped by industry, geography and case
+are answered from the index alone.
+
+
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import settings
+from case_constructor import CASE_ORDER, build_cases
+from instrumentation import count, timed
+from lbo_engine import CASE_FIELDS, USER_INPUT_FIELDS
+from lbo_types import as_mapping
+
+
+DEFAULT_STORE_PATH = os.path.join(".lbo_cache", "results.sqlite")
+
+CACHE_KIB = 64 * 1024
+# Refresh planner statistics after inserting this many scenarios at once
+ANALYZE_ROWS = 10_000
+
+METRIC_FIELDS = ("irr", "money_multiple", "entry_equity", "exit_equity")
+
+# Columns a scenario query may filter, group or sort on
+SCENARIO_COLUMNS = (
+    ("run_id", "created_at", "label", "industry", "geography", "scenario", "hold_period_years", "debt_percentage")
+    + METRIC_FIELDS
+    + CASE_FIELDS
+)
+GROUP_COLUMNS = ("industry", "geography", "scenario", "label", "hold_period_years")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY,"
+    " key TEXT NOT NULL UNIQUE,"
+    " created_at REAL NOT NULL,"
+    " last_seen REAL NOT NULL,"
+    " hits INTEGER NOT NULL DEFAULT 0,"
+    " label TEXT,"
+    " industry TEXT,"
+    " geography TEXT,"
+    " inputs TEXT NOT NULL,"
+    " assumptions_key TEXT NOT NULL,"
+    " sensitivities TEXT,"
+    " monte_carlo TEXT,"
+    " options TEXT)",
+    "CREATE TABLE IF NOT EXISTS assumptions ("
+    " key TEXT PRIMARY KEY,"
+    " value TEXT NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS scenarios ("
+    " run_id INTEGER NOT NULL,"
+    " scenario TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " label TEXT,"
+    " industry TEXT,"
+    " geography TEXT,"
+    " hold_period_years INTEGER,"
+    " debt_percentage REAL,"
+    + ", ".join(f" {field} REAL" for field in METRIC_FIELDS + CASE_FIELDS)
+    + ")",
+    "CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_scenarios_run ON scenarios (run_id, scenario)",
+    "CREATE INDEX IF NOT EXISTS idx_scenarios_industry"
+    " ON scenarios (industry, geography, scenario, irr, money_multiple)",
+    "CREATE INDEX IF NOT EXISTS idx_scenarios_geography ON scenarios (geography, scenario, irr)",
+    "CREATE INDEX IF NOT EXISTS idx_scenarios_created ON scenarios (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_scenarios_irr ON scenarios (scenario, irr)",
+)
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=_jsonable)
+
+
+def _payload(value) -> Optional[str]:
+    # Results keep their key order (sensitivity grids run low to high)
+    return None if value is None else json.dumps(value, separators=(",", ":"), default=_jsonable)
+
+
+def _jsonable(value):
+    # NumPy scalars/arrays and DataFrames (two-way grids) inside results
+    if hasattr(value, "to_dict") and hasattr(value, "columns"):
+        return value.to_dict(orient="split")
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _context(text) -> str:
+    return " ".join(str(text or "").split()).casefold()
+
+
+def _inputs(user_inputs: Dict) -> Dict:
+    user_inputs = as_mapping(user_inputs)
+    values = {field: float(user_inputs[field]) for field in USER_INPUT_FIELDS}
+    values["hold_period_years"] = int(values["hold_period_years"])
+    values["industry"] = user_inputs.get("industry")
+    values["geography"] = user_inputs.get("geography")
+    return values
+
+
+def _assumptions_key(ai_assumptions: Dict) -> str:
+    return hashlib.sha256(_canonical(ai_assumptions).encode()).hexdigest()
+
+
+def run_key(
+    user_inputs: Dict,
+    ai_assumptions: Dict,
+    assumptions_key: Optional[str] = None,
+    options: Optional[Dict] = None
+) -> str:
+    """
+    Content hash of everything that determines a run's results: the
+    numeric inputs, the (normalized) deal context, the assumptions (pass
+    ``assumptions_key`` when it is already known) and the analysis
+    ``options`` (Monte Carlo settings, grid selection, capital structure
+    ...). Labels, deal ids and timestamps do not count.
+    """
+
+    return _run_key(_inputs(user_inputs), assumptions_key or _assumptions_key(ai_assumptions), options)
+
+
+def _run_key(inputs: Dict, assumptions_key: str, options: Optional[Dict] = None) -> str:
+    inputs = {**inputs, "industry": _context(inputs["industry"]), "geography": _context(inputs["geography"])}
+    content = {"inputs": inputs, "assumptions": assumptions_key}
+    # Runs without options keep the keys they had before options existed
+    if options:
+        content["options"] = options
+    return hashlib.sha256(_canonical(content).encode()).hexdigest()
+
+
+class ResultsStore:
+    """
+    SQLite-backed run history. ``path=None`` keeps it in memory. Safe to
+    share between threads (one connection behind a lock).
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_STORE_PATH):
+        self.path = path
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path is not None:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        # Bulk inserts touch every index; a larger page cache keeps them in memory
+        self._db.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        # Stores created before runs carried their analysis options
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(runs)")}
+        if "options" not in columns:
+            self._db.execute("ALTER TABLE runs ADD COLUMN options TEXT")
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.execute("PRAGMA optimize")
+            self._db.close()
+
+    def optimize(self) -> None:
+        """
+        Refreshes the statistics the query planner uses to choose between
+        the indexes (e.g. the covering industry index for summaries).
+        """
+
+        with self._lock:
+            self._db.execute("ANALYZE")
+
+    # ------------------------
+    # Writing
+    # ------------------------
+    def record(
+        self,
+        user_inputs: Dict,
+        ai_assumptions: Dict,
+        cases: Dict,
+        sensitivities: Optional[Dict] = None,
+        monte_carlo: Optional[Dict] = None,
+        label: Optional[str] = None,
+        options: Optional[Dict] = None
+    ) -> str:
+        """
+        Stores one run (``cases`` maps case name to its results) and
+        returns its key. ``options`` are the analysis settings that
+        produced the sensitivities and Monte Carlo results; they are part
+        of the key. An identical run already stored is not written
+        again; its hit count and last-seen time are updated.
+        """
+
+        entry = {
+            "inputs": user_inputs,
+            "assumptions": ai_assumptions,
+            "cases": cases,
+            "sensitivities": sensitivities,
+            "monte_carlo": monte_carlo,
+            "label": label,
+            "options": options,
+        }
+        return self.record_many([entry])[0]
+
+    @timed("results_store.record_many")
+    def record_many(self, entries: Iterable[Dict]) -> List[str]:
+        """
+        record() for many runs in one transaction. Each entry has
+        "inputs", "assumptions" and "cases", optionally "sensitivities",
+        "monte_carlo", "label" and "options".
+        """
+
+        now = time.time()
+        keys, runs, scenarios = [], {}, {}
+        # Runs usually share a handful of assumption sets: hash and expand each
+        # once (the set itself is kept in the tuple, so its id stays unique)
+        assumption_sets = {}
+        for entry in entries:
+            user_inputs, ai_assumptions = as_mapping(entry["inputs"]), entry["assumptions"]
+            shared = assumption_sets.get(id(ai_assumptions))
+            if shared is None:
+                shared = assumption_sets[id(ai_assumptions)] = (
+                    _assumptions_key(ai_assumptions), ai_assumptions, build_cases(ai_assumptions)
+                )
+            assumptions_key, _, case_values = shared
+
+            inputs = _inputs(user_inputs)
+            options = entry.get("options") or None
+            key = _run_key(inputs, assumptions_key, options)
+            keys.append(key)
+            if key in runs:
+                continue
+            label = entry.get("label")
+            runs[key] = (
+                key, now, now, label, inputs["industry"], inputs["geography"], _canonical(inputs), assumptions_key,
+                _payload(entry.get("sensitivities")),
+                _payload(entry.get("monte_carlo")),
+                None if options is None else _canonical(options),
+            )
+            context = (now, label, inputs["industry"], inputs["geography"],
+                       inputs["hold_period_years"], inputs["debt_percentage"])
+            scenarios[key] = rows = []
+            for scenario, results in entry["cases"].items():
+                results = as_mapping(results)
+                case = case_values.get(scenario)
+                rows.append(
+                    (scenario,) + context
+                    + tuple(float(results[field]) for field in METRIC_FIELDS)
+                    + tuple(None if case is None else float(case[field]) for field in CASE_FIELDS)
+                )
+
+        with self._lock, self._db:
+            existing = self._ids(list(runs))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO assumptions (key, value) VALUES (?, ?)",
+                {(k, _canonical(v)) for k, v, _ in assumption_sets.values()},
+            )
+            self._db.executemany(
+                "UPDATE runs SET hits = hits + 1, last_seen = ? WHERE key = ?",
+                [(now, key) for key in existing],
+            )
+            fresh = [key for key in runs if key not in existing]
+            self._db.executemany(
+                "INSERT INTO runs (key, created_at, last_seen, label, industry, geography, inputs, assumptions_key,"
+                " sensitivities, monte_carlo, options) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [runs[key] for key in fresh],
+            )
+            ids = self._ids(fresh)
+            placeholders = ", ".join("?" * (8 + len(METRIC_FIELDS) + len(CASE_FIELDS)))
+            self._db.executemany(
+                f"INSERT INTO scenarios (run_id, scenario, created_at, label, industry, geography,"
+                f" hold_period_years, debt_percentage, {', '.join(METRIC_FIELDS + CASE_FIELDS)})"
+                f" VALUES ({placeholders})",
+                [(ids[key],) + row for key in fresh for row in scenarios[key]],
+            )
+        count("results_store.duplicates", len(keys) - len(fresh))
+        if sum(len(scenarios[key]) for key in fresh) >= ANALYZE_ROWS:
+            self.optimize()
+        return keys
+
+    def _ids(self, keys: Sequence[str]) -> Dict[str, int]:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = self._db.execute(f"SELECT key, id FROM runs WHERE key IN ({', '.join('?' * len(part))})", part)
+            found.update((row[0], row[1]) for row in rows)
+        return found
+
+    # ------------------------
+    # Lookup
+    # ------------------------
+    def get(self, key: str) -> Optional[Dict]:
+        return self.get_many([key]).get(key)
+
+    def lookup(self, user_inputs: Dict, ai_assumptions: Dict, options: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        The stored run with exactly these inputs, assumptions and options,
+        if any.
+        """
+
+        return self.get(run_key(user_inputs, ai_assumptions, options=options))
+
+    @timed("results_store.get_many")
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict]:
+        """
+        Full stored runs (inputs, assumptions, cases, sensitivities, Monte
+        Carlo, options) by key; missing keys are left out.
+        """
+
+        runs = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                marks = ", ".join("?" * len(part))
+                rows = self._db.execute(
+                    "SELECT runs.*, assumptions.value AS assumption_set FROM runs"
+                    " JOIN assumptions ON assumptions.key = runs.assumptions_key"
+                    f" WHERE runs.key IN ({marks})",
+                    part,
+                ).fetchall()
+                by_id = {}
+                for row in rows:
+                    by_id[row["id"]] = runs[row["key"]] = {
+                        "key": row["key"],
+                        "id": row["id"],
+                        "created_at": row["created_at"],
+                        "last_seen": row["last_seen"],
+                        "hits": row["hits"],
+                        "label": row["label"],
+                        "inputs": json.loads(row["inputs"]),
+                        "assumptions": json.loads(row["assumption_set"]),
+                        "sensitivities": None if row["sensitivities"] is None else json.loads(row["sensitivities"]),
+                        "monte_carlo": None if row["monte_carlo"] is None else json.loads(row["monte_carlo"]),
+                        "options": None if row["options"] is None else json.loads(row["options"]),
+                        "cases": {},
+                    }
+                if not by_id:
+                    continue
+                scenario_rows = self._db.execute(
+                    f"SELECT run_id, scenario, {', '.join(METRIC_FIELDS)} FROM scenarios"
+                    f" WHERE run_id IN ({', '.join('?' * len(by_id))})",
+                    list(by_id),
+                )
+                for row in scenario_rows:
+                    by_id[row["run_id"]]["cases"][row["scenario"]] = {field: row[field] for field in METRIC_FIELDS}
+        count("results_store.hits", len(runs))
+        return runs
+
+    # ------------------------
+    # Queries
+    # ------------------------
+    @staticmethod
+    def _where(filters: Dict):
+        """
+        WHERE clause for scenario filters: industry / geography / scenario
+        / label (a value or a list), since / until (epoch seconds) and
+        min_irr / max_irr (percent).
+        """
+
+        clauses, params = [], []
+        for column in ("industry", "geography", "scenario", "label"):
+            value = filters.get(column)
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            if not values:
+                continue
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        for key, clause in (("since", "created_at >= ?"), ("until", "created_at < ?"),
+                            ("min_irr", "irr >= ?"), ("max_irr", "irr <= ?")):
+            if filters.get(key) is not None:
+                clauses.append(clause)
+                params.append(filters[key])
+        unknown = set(filters) - {"industry", "geography", "scenario", "label", "since", "until", "min_irr", "max_irr"}
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, sql: str, params: List) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    @timed("results_store.scenarios")
+    def scenarios(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        order_by: str = "created_at",
+        descending: bool = True,
+        limit: Optional[int] = 1000,
+        **filters
+    ) -> List[Dict]:
+        """
+        Scenario rows matching ``filters`` (see _where), newest first by
+        default.
+        """
+
+        columns = list(columns or SCENARIO_COLUMNS)
+        unknown = [c for c in columns + [order_by] if c not in SCENARIO_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(columns)} FROM scenarios{where} ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._select(sql, params)
+
+    @timed("results_store.summary")
+    def summary(self, group_by: Sequence[str] = ("industry",), **filters) -> List[Dict]:
+        """
+        Scenario count and IRR / money multiple statistics per group
+        (one column name or several).
+        """
+
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        unknown = [c for c in group_by if c not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by: {', '.join(unknown)}")
+        where, params = self._where(filters)
+        keys = ", ".join(group_by)
+        select = (keys + ", ") if group_by else ""
+        sql = (
+            f"SELECT {select}COUNT(*) AS scenarios,"
+            " AVG(irr) AS irr_mean, MIN(irr) AS irr_min, MAX(irr) AS irr_max,"
+            " AVG(money_multiple) AS money_multiple_mean"
+            f" FROM scenarios{where}"
+        )
+        if group_by:
+            sql += f" GROUP BY {keys} ORDER BY {keys}"
+        return self._select(sql, params)
+
+    def count(self, **filters) -> int:
+        where, params = self._where(filters)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM scenarios{where}", params).fetchone()[0]
+
+    def distinct(self, column: str) -> List:
+        """
+        Values of a group column, e.g. for filter widgets (index-only for
+        industry and geography).
+        """
+
+        if column not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT DISTINCT {column} FROM scenarios WHERE {column} IS NOT NULL ORDER BY {column}"
+            )
+            return [row[0] for row in rows]
+
+    def runs(self, limit: Optional[int] = 100) -> List[Dict]:
+        """
+        Most recent runs (key, label, context, hits), newest first.
+        """
+
+        sql = "SELECT key, created_at, last_seen, hits, label, industry, geography FROM runs ORDER BY created_at DESC"
+        params = []
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._select(sql, params)
+
+    def frame(self, **query):
+        """
+        scenarios() as a pandas DataFrame.
+        """
+
+        import pandas as pd
+
+        return pd.DataFrame(self.scenarios(**query))
+
+    def compare(self, keys: Sequence[str]) -> List[Dict]:
+        """
+        Side by side: one row per run with each case's IRR and money
+        multiple, in the order given.
+        """
+
+        runs = self.get_many(keys)
+        rows = []
+        for key in keys:
+            run = runs.get(key)
+            if run is None:
+                continue
+            row = {
+                "key": key,
+                "label": run["label"],
+                "industry": run["inputs"]["industry"],
+                "geography": run["inputs"]["geography"],
+                "created_at": run["created_at"],
+            }
+            for scenario in CASE_ORDER:
+                metrics = run["cases"].get(scenario, {})
+                row[f"{scenario}_irr"] = metrics.get("irr")
+                row[f"{scenario}_money_multiple"] = metrics.get("money_multiple")
+            rows.append(row)
+        return rows
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store() -> ResultsStore:
+    """
+    Process-wide store at LBO_RESULTS_PATH (default DEFAULT_STORE_PATH).
+    """
+
+    global _default_store
+
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ResultsStore(settings.get("LBO_RESULTS_PATH") or DEFAULT_STORE_PATH)
+        return _default_store
@@ -0,0 +1,258 @@
+"""
+
+Process-pool scheduler for large scenario batches.
+
+``map_arrays`` runs a vectorized kernel over N scenarios split into
+chunks across a shared ProcessPoolExecutor:
+
+    - input arrays are copied once into multiprocessing.shared_memory
+      and workers attach to them by name, so no task pickles data
+    - every worker writes its slice of the result straight into one
+      preallocated shared output buffer
+    - chunk size adapts to the measured cost of a probe chunk, and jobs
+      whose estimated cost is below the pool's overhead stay in-process
+
+The pool is created lazily and reused across calls (the app, batch
+runner and Monte Carlo all share it), since starting workers costs far
+more than most individual jobs.
+
+
+"""
+
+import atexit
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+import settings
+from instrumentation import count, stage
+
+
+# Jobs estimated to run for less than this stay in the calling process
+PARALLEL_THRESHOLD_S = 0.25
+# Aim for chunks of roughly this duration: long enough to amortize
+# dispatch, short enough to balance load across workers
+TARGET_CHUNK_S = 0.05
+MIN_CHUNK = 1024
+PROBE_SIZE = 2048
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """
+    Worker count from LBO_WORKERS, else the number of CPUs.
+    """
+
+    configured = settings.get("LBO_WORKERS")
+    return int(configured) if configured else (os.cpu_count() or 1)
+
+
+def get_executor(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Shared process pool, sized by the first caller (``workers``, else
+    default_workers()) so --workers and LBO_WORKERS cap the process
+    count. It is never replaced while the process runs (other threads
+    may be submitting to it), so a later caller asking for more workers
+    than it has is capped at its size.
+    """
+
+    global _executor, _executor_workers
+
+    workers = workers or default_workers()
+    with _executor_lock:
+        if _executor is None:
+            with stage("scheduler.pool_start"):
+                _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_workers = workers
+        elif workers > _executor_workers:
+            count("scheduler.workers_capped")
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor, _executor_workers
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor, _executor_workers = None, 0
+
+
+atexit.register(shutdown)
+
+
+# ------------------------
+# Shared-memory arrays
+# ------------------------
+
+class SharedArrays:
+    """
+    Named arrays copied into shared memory for the lifetime of a job.
+
+    ``specs`` (name -> (block, shape, dtype)) is what travels to the
+    workers; ``arrays`` are the parent's views. Use as a context
+    manager so the blocks are always unlinked.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], empty: bool = False):
+        self._blocks = []
+        self.specs = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            if not empty:
+                view[...] = array
+            self.specs[name] = (block.name, array.shape, array.dtype)
+            self.arrays[name] = view
+
+    def close(self) -> None:
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach(specs: Dict) -> Tuple[Dict[str, np.ndarray], list]:
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return arrays, blocks
+
+
+def _run_chunk(kernel: Callable, input_specs: Dict, output_spec: Dict, constants, start: int, stop: int) -> int:
+    """
+    Worker side: attach, run the kernel on [start, stop), write the
+    result into the shared output.
+    """
+
+    inputs, blocks = _attach(input_specs)
+    outputs, out_blocks = _attach(output_spec)
+    try:
+        result = kernel({name: array[start:stop] for name, array in inputs.items()}, constants)
+        outputs["out"][start:stop] = result
+    finally:
+        # Views must go before the blocks can be closed
+        del inputs, outputs
+        for block in blocks + out_blocks:
+            block.close()
+    return stop - start
+
+
+# ------------------------
+# Scheduling
+# ------------------------
+
+def plan_chunks(n: int, seconds_per_item: float, workers: int) -> int:
+    """
+    Chunk size targeting TARGET_CHUNK_S per chunk, but never so large
+    that some workers sit idle.
+    """
+
+    by_cost = int(TARGET_CHUNK_S / seconds_per_item) if seconds_per_item > 0 else n
+    by_balance = math.ceil(n / (2 * workers))
+    return max(MIN_CHUNK, min(by_cost, by_balance))
+
+
+def map_arrays(
+    kernel: Callable,
+    arrays: Dict[str, np.ndarray],
+    out_dtype,
+    constants=None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    parallel_threshold_s: float = PARALLEL_THRESHOLD_S
+) -> np.ndarray:
+    """
+    Runs ``kernel(slice_of_arrays, constants)`` over the leading axis of
+    ``arrays`` and returns the concatenated result as one array of
+    ``out_dtype``.
+
+    ``kernel`` must be a module-level function (workers import it by
+    name) returning something assignable to ``len(slice)`` rows of
+    ``out_dtype``. ``constants`` is pickled once per chunk, so keep it
+    small; anything scenario-sized belongs in ``arrays``. Small jobs,
+    ``workers`` <= 1 or a single CPU run in-process.
+    """
+
+    lengths = {len(a) for a in arrays.values()}
+    if len(lengths) != 1:
+        raise ValueError("All scheduler inputs need the same leading length")
+    n = lengths.pop()
+    workers = workers if workers is not None else default_workers()
+    out_dtype = np.dtype(out_dtype)
+
+    if workers <= 1 or n <= PROBE_SIZE:
+        count("scheduler.in_process")
+        out = np.empty(n, dtype=out_dtype)
+        out[:] = kernel(arrays, constants)
+        return out
+
+    # ------------------------
+    # Probe: the first chunk runs here and prices the rest
+    # ------------------------
+    started = time.perf_counter()
+    probe = kernel({name: a[:PROBE_SIZE] for name, a in arrays.items()}, constants)
+    per_item = (time.perf_counter() - started) / PROBE_SIZE
+
+    remaining = n - PROBE_SIZE
+    if chunk_size is None and per_item * remaining < parallel_threshold_s:
+        count("scheduler.in_process")
+        out = np.empty(n, dtype=out_dtype)
+        out[:PROBE_SIZE] = probe
+        out[PROBE_SIZE:] = kernel({name: a[PROBE_SIZE:] for name, a in arrays.items()}, constants)
+        return out
+
+    size = chunk_size or plan_chunks(remaining, per_item, workers)
+    executor = get_executor(workers)
+    count("scheduler.parallel")
+
+    with stage("scheduler.share_inputs"):
+        shared_in = SharedArrays(arrays)
+    # Only shape and dtype are used; the workers fill the shared block
+    shared_out = SharedArrays({"out": np.empty(n, dtype=out_dtype)}, empty=True)
+    futures = []
+    try:
+        shared_out.arrays["out"][:PROBE_SIZE] = probe
+        futures = [
+            executor.submit(
+                _run_chunk, kernel, shared_in.specs, shared_out.specs, constants, start, min(start + size, n)
+            )
+            for start in range(PROBE_SIZE, n, size)
+        ]
+        count("scheduler.chunks", len(futures))
+        with stage("scheduler.wait"):
+            for future in futures:
+                future.result()
+        # One copy out of shared memory before the block is unlinked
+        out = shared_out.arrays["out"].copy()
+    except BaseException:
+        # Workers still attached to the blocks must finish before unlinking
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+    finally:
+        shared_in.close()
+        shared_out.close()
+    return out
@@ -0,0 +1,304 @@
+"""
+
+Columnar year-by-year projections.
+
+A ScheduleTable is one flat NumPy array per column in long format (one
+row per case-year, ordered by case then year):
+
+    case, year, revenue, ebitda, depreciation_amortization, capex,
+    interest, taxes, net_income, fcf, debt
+
+plus any extra integer columns a caller adds (e.g. the deal's row in a
+batch). Built from the engine's (cases, years) grids the columns are
+reshaped views, and per-case access, pandas/Arrow conversion and
+memory-mapped reopening all avoid copying the float data.
+
+Tables can be saved as Parquet, Arrow IPC (".arrow" / ".feather") or a
+directory of raw column files; ScheduleWriter appends batch after batch
+to any of the three, and open_schedules maps IPC files and directories
+back without reading them into RAM.
+
+
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+SCHEDULE_FIELDS = (
+    "revenue",
+    "ebitda",
+    "depreciation_amortization",
+    "capex",
+    "interest",
+    "taxes",
+    "net_income",
+    "fcf",
+    "debt",
+)
+
+KEY_COLUMNS = ("case", "year")
+
+IPC_SUFFIXES = (".arrow", ".feather", ".ipc")
+META_FILE = "schedule.json"
+
+
+class ScheduleTable:
+    """
+    Long-format schedule columns. ``columns`` maps names to equal-length
+    1-D arrays and must include "case" and "year", sorted by case.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], metadata: Optional[Dict] = None):
+        self.columns = dict(columns)
+        self.metadata = dict(metadata or {})
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Schedule columns must all have the same length")
+        missing = [key for key in KEY_COLUMNS if key not in self.columns]
+        if missing:
+            raise ValueError(f"Schedule is missing key columns: {', '.join(missing)}")
+        self._bounds = None
+
+    @classmethod
+    def from_grid(cls, grid: Dict[str, np.ndarray], hold_years: np.ndarray, metadata: Optional[Dict] = None) -> "ScheduleTable":
+        """
+        From (cases, max hold) arrays, NaN after each case's exit. With
+        a uniform hold period every column is a view of ``grid``.
+        """
+
+        hold_years = np.asarray(hold_years, dtype=np.int64)
+        n, max_hold = next(iter(grid.values())).shape
+        case = np.repeat(np.arange(n, dtype=np.int64), max_hold)
+        year = np.tile(np.arange(1, max_hold + 1, dtype=np.int64), n)
+        columns = {"case": case, "year": year}
+        columns.update({name: np.ascontiguousarray(values).reshape(-1) for name, values in grid.items()})
+
+        if np.any(hold_years != max_hold):
+            keep = year <= np.repeat(hold_years, max_hold)
+            columns = {name: values[keep] for name, values in columns.items()}
+        return cls(columns, metadata)
+
+    # ------------------------
+    # Access
+    # ------------------------
+    def __len__(self) -> int:
+        return len(self.columns["case"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def fields(self) -> List[str]:
+        return [name for name in self.columns if name not in KEY_COLUMNS]
+
+    @property
+    def n_cases(self) -> int:
+        return len(self._case_bounds()[0])
+
+    def _case_bounds(self):
+        # Row range of each case, found once (cases are contiguous)
+        if self._bounds is None:
+            case = np.asarray(self.columns["case"])
+            starts = np.flatnonzero(np.r_[True, case[1:] != case[:-1]]) if len(case) else np.zeros(0, dtype=np.int64)
+            stops = np.r_[starts[1:], len(case)].astype(np.int64)
+            self._bounds = (case[starts], starts, stops)
+        return self._bounds
+
+    def case(self, case_id: int) -> Dict[str, np.ndarray]:
+        """
+        One case's columns (views, not copies).
+        """
+
+        ids, starts, stops = self._case_bounds()
+        position = np.searchsorted(ids, case_id)
+        if position >= len(ids) or ids[position] != case_id:
+            raise KeyError(f"No case {case_id} in schedule")
+        rows = slice(int(starts[position]), int(stops[position]))
+        return {name: values[rows] for name, values in self.columns.items()}
+
+    def records(self, case_id: int) -> List[Dict]:
+        """
+        One case as run_lbo_case's list of yearly dicts.
+        """
+
+        columns = self.case(case_id)
+        names = ["year"] + [name for name in SCHEDULE_FIELDS if name in columns]
+        return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+    def select(self, mask: np.ndarray) -> "ScheduleTable":
+        """
+        Rows where ``mask`` is True, e.g. ``table["year"] <= 3``.
+        """
+
+        return ScheduleTable({name: values[mask] for name, values in self.columns.items()}, self.metadata)
+
+    # ------------------------
+    # Conversion
+    # ------------------------
+    def to_frame(self, case_id: Optional[int] = None):
+        """
+        pandas DataFrame over the columns (one case indexed by year when
+        ``case_id`` is given), for st.line_chart and friends.
+        """
+
+        import pandas as pd
+
+        if case_id is None:
+            return pd.DataFrame(self.columns, copy=False)
+        columns = self.case(case_id)
+        return pd.DataFrame(
+            {name: columns[name] for name in self.fields},
+            index=pd.Index(columns["year"], name="year"),
+            copy=False,
+        )
+
+    def to_arrow(self):
+        """
+        pyarrow Table wrapping the column buffers; schedule metadata is
+        kept in the schema.
+        """
+
+        import pyarrow as pa
+
+        table = pa.table({name: pa.array(np.asarray(values)) for name, values in self.columns.items()})
+        return table.replace_schema_metadata({"schedule": json.dumps(self.metadata)})
+
+    @classmethod
+    def from_arrow(cls, table) -> "ScheduleTable":
+        metadata = json.loads((table.schema.metadata or {}).get(b"schedule", b"{}"))
+        columns = {}
+        for name in table.column_names:
+            column = table.column(name)
+            # Single-chunk columns (memory-mapped IPC) convert without a copy
+            columns[name] = column.chunk(0).to_numpy() if column.num_chunks == 1 else column.to_numpy()
+        return cls(columns, metadata)
+
+    def save(self, path: str) -> str:
+        with ScheduleWriter(path, self.metadata) as writer:
+            writer.write(self)
+        return path
+
+
+# ------------------------
+# Storage
+# ------------------------
+
+class ScheduleWriter:
+    """
+    Appends ScheduleTables to one file or directory:
+
+        *.parquet              - a Parquet file, one row group per write
+        *.arrow / .feather     - an Arrow IPC file, one record batch per write
+        anything else          - a directory with one raw little-endian
+                                 file per column and a JSON header,
+                                 reopened with np.memmap
+
+    Every write must have the same columns. Use as a context manager.
+    """
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.rows = 0
+        self._columns = None
+        self._writer = None
+        self._files = None
+
+    def _open(self, table: ScheduleTable) -> None:
+        self._columns = {name: np.asarray(values).dtype.newbyteorder("<") for name, values in table.columns.items()}
+        if self.path.endswith(".parquet") or self.path.endswith(IPC_SUFFIXES):
+            schema = table.to_arrow().schema.with_metadata({"schedule": json.dumps(self.metadata)})
+            if self.path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, schema)
+            else:
+                import pyarrow as pa
+
+                self._writer = pa.ipc.new_file(self.path, schema)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            self._files = {name: open(os.path.join(self.path, f"{name}.bin"), "wb") for name in self._columns}
+
+    def write(self, table: ScheduleTable) -> None:
+        if self._columns is None:
+            self._open(table)
+        if list(table.columns) != list(self._columns):
+            raise ValueError("Every schedule written to one file needs the same columns")
+
+        if self._files is not None:
+            for name, values in table.columns.items():
+                np.asarray(values, dtype=self._columns[name]).tofile(self._files[name])
+        elif self.path.endswith(".parquet"):
+            self._writer.write_table(table.to_arrow().replace_schema_metadata(self._writer.schema.metadata))
+        else:
+            for batch in table.to_arrow().to_batches():
+                self._writer.write_batch(batch)
+        self.rows += len(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            header = {
+                "rows": self.rows,
+                "columns": {name: dtype.str for name, dtype in self._columns.items()},
+                "metadata": self.metadata,
+            }
+            with open(os.path.join(self.path, META_FILE), "w") as f:
+                json.dump(header, f)
+
+    def __enter__(self) -> "ScheduleWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_schedules(path: str, columns: Optional[Sequence[str]] = None) -> ScheduleTable:
+    """
+    Reopens a saved schedule. Directories and Arrow IPC files are
+    memory-mapped, so slicing only pages in the rows touched; Parquet is
+    read (optionally just ``columns`` plus the keys).
+    """
+
+    wanted = None if columns is None else list(dict.fromkeys(list(KEY_COLUMNS) + list(columns)))
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return ScheduleTable.from_arrow(pq.read_table(path, columns=wanted, memory_map=True))
+
+    if path.endswith(IPC_SUFFIXES):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        return ScheduleTable.from_arrow(table.select(wanted) if wanted else table)
+
+    with open(os.path.join(path, META_FILE)) as f:
+        header = json.load(f)
+    names = wanted or list(header["columns"])
+    mapped = {}
+    for name in names:
+        dtype = np.dtype(header["columns"][name])
+        if header["rows"] == 0:
+            mapped[name] = np.empty(0, dtype=dtype)
+        else:
+            mapped[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(header["rows"],))
+    return ScheduleTable(mapped, header["metadata"])
+
+
+def concat(tables: Iterable[ScheduleTable]) -> ScheduleTable:
+    """
+    Stacks tables with the same columns (copies).
+    """
+
+    tables = list(tables)
+    names = list(tables[0].columns)
+    return ScheduleTable({name: np.concatenate([t.columns[name] for t in tables]) for name in names}, tables[0].metadata)
@@ -2,84 +2,274 @@
 sensitivity_analysis.py
 
 
-Performs one-way sensitivity analysis on key LBO assumptions
-using the base case as the anchor.
+Performs one-way and two-way sensitivity analysis on LBO assumptions
+and deal inputs using the base case as the anchor.
+
+Grid points are evaluated in one call to the batch engine. Axes are
+passed as (n, 1) and (1, m) arrays, so any part of the projection that
+depends on only one axis (e.g. the whole operating path and debt
+schedule when the other axis is the exit multiple) is computed once per
+value of that axis rather than once per cell.
 """
 
-from typing import Dict, List
-from lbo_engine import run_lbo_case
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from instrumentation import timed
+from engine_backends import run_batch, run_batch_parallel
+from lbo_engine import CASE_FIELDS, USER_INPUT_FIELDS
+from lbo_types import as_mapping
+
+
+# Default step per variable, in the variable's own units
+DEFAULT_STEPS = {
+    "entry_multiple": 0.5,
+    "exit_multiple": 0.5,
+    "revenue_growth": 1.0,
+    "margin_change_bps": 25.0,
+    "debt_percentage": 0.05,
+    "interest_rate": 0.005,
+    "tax_rate": 0.01,
+    "hold_period_years": 1,
+}
+
+# Values outside these bounds are dropped from a generated range
+VARIABLE_BOUNDS = {
+    "entry_multiple": (0, None),
+    "exit_multiple": (0, None),
+    "debt_percentage": (0, 1),
+    "interest_rate": (0, None),
+    "tax_rate": (0, 1),
+    "hold_period_years": (1, None),
+}
+
+# The one-way tables shown in the app
+DEFAULT_SENSITIVITIES = {
+    "entry_multiple": {"step": 0.5, "n": 2},
+    "exit_multiple": {"step": 0.5, "n": 2},
+    "revenue_growth": {"step": 1.0, "n": 2},
+}
+
+
+def _decimals(value: float, limit: int = 10) -> int:
+    """
+    Decimal places needed to write ``value`` (at most ``limit``).
+    """
+
+    text = f"{abs(float(value)):.{limit}f}".rstrip("0")
+    return len(text.split(".")[1]) if "." in text else 0
 
 
 def generate_range(center: float, step: float, n: int) -> List[float]:
     """
     Generates a symmetric range around a center value.
 
+    Values are rounded to 2 decimals, or to the step's own precision
+    when finer, so small steps (e.g. 0.005 on a rate) stay distinct.
+
     Example:
     center=9, step=0.5, n=2
     → [8.0, 8.5, 9.0, 9.5, 10.0]
     """
-    return [round(center + i * step, 2) for i in range(-n, n + 1)]
+    decimals = max(2, _decimals(step))
+    return [round(center + i * step, decimals) for i in range(-n, n + 1)]
 
 
-def sensitivity_analysis(
+def base_value(user_inputs: Dict, base_case: Dict, variable: str) -> float:
+    """
+    Current value of a case assumption or deal input.
+    """
+
+    if variable in CASE_FIELDS:
+        return as_mapping(base_case)[variable]
+    if variable in USER_INPUT_FIELDS:
+        return as_mapping(user_inputs)[variable]
+    raise ValueError(f"Unknown sensitivity variable: {variable}")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+
+
+def _number(spec: Dict, key: str, variable: str) -> float:
+    if not _is_number(spec[key]):
+        raise ValueError(f"'{key}' for {variable} must be a number")
+    return spec[key]
+
+
+def sensitivity_values(
     user_inputs: Dict,
-    base_case: Dict
-) -> Dict:
+    base_case: Dict,
+    variable: str,
+    spec: Optional[Dict] = None
+) -> List[float]:
     """
-    Runs sensitivity analysis for key assumptions.
+    Resolves a range spec into the values to test for one variable.
+
+    ``spec`` may hold explicit ``values``, or a ``step`` with either
+    ``n`` points per side or a ``width`` either side of the base value.
+    Missing entries fall back to DEFAULT_STEPS and n=2.
     """
 
-    results = {}
+    spec = spec or {}
+    if "values" in spec:
+        values = spec["values"]
+        if not isinstance(values, (list, tuple, np.ndarray)) or not all(_is_number(v) for v in values):
+            raise ValueError(f"'values' for {variable} must be a list of numbers")
+        return list(dict.fromkeys(float(v) for v in values))
 
-    # -----------------------
-    # Entry Multiple
-    # -----------------------
-    entry_values = generate_range(
-        base_case["entry_multiple"], step=0.5, n=2
-    )
+    step = _number(spec, "step", variable) if "step" in spec else DEFAULT_STEPS.get(variable)
+    if step is None or step <= 0:
+        raise ValueError(f"A positive step is required for {variable}")
+    if "n" in spec:
+        n = _number(spec, "n", variable)
+        if n < 0 or n != int(n):
+            raise ValueError(f"'n' for {variable} must be a non-negative whole number")
+        n = int(n)
+    elif "width" in spec:
+        n = int(round(_number(spec, "width", variable) / step))
+    else:
+        n = 2
 
-    entry_sensitivity = {}
-    for val in entry_values:
-        modified_case = base_case.copy()
-        modified_case["entry_multiple"] = val
+    values = generate_range(base_value(user_inputs, base_case, variable), step, n)
 
-        irr = run_lbo_case(user_inputs, modified_case)["irr"]
-        entry_sensitivity[val] = irr
+    low, high = VARIABLE_BOUNDS.get(variable, (None, None))
+    values = [
+        v for v in values
+        if (low is None or v >= low) and (high is None or v <= high)
+    ]
+    if variable == "hold_period_years":
+        values = sorted({int(round(v)) for v in values})
+    # Grid rows and columns are labelled by value, so each appears once
+    return list(dict.fromkeys(values))
 
-    results["entry_multiple"] = entry_sensitivity
 
-    # -----------------------
-    # Exit Multiple
-    # -----------------------
-    exit_values = generate_range(
-        base_case["exit_multiple"], step=0.5, n=2
-    )
+def _evaluate(
+    user_inputs: Dict,
+    base_case: Dict,
+    overrides: Dict,
+    metric: str,
+    workers: Optional[int] = None,
+    structure=None
+) -> np.ndarray:
+    """
+    Runs the batch engine (on the active backend, or under a capital
+    ``structure``) with some variables replaced by arrays; with
+    ``workers``, grids large enough to pay for it are spread over the
+    scheduler's process pool.
+    """
 
-    exit_sensitivity = {}
-    for val in exit_values:
-        modified_case = base_case.copy()
-        modified_case["exit_multiple"] = val
+    case = dict(as_mapping(base_case))
+    case.update(overrides)
+    if workers is not None:
+        return run_batch_parallel(user_inputs, case, workers, structure=structure)[metric]
+    return run_batch(user_inputs, case, structure=structure)[metric]
 
-        irr = run_lbo_case(user_inputs, modified_case)["irr"]
-        exit_sensitivity[val] = irr
 
-    results["exit_multiple"] = exit_sensitivity
+def one_way_sensitivity(
+    user_inputs: Dict,
+    base_case: Dict,
+    variable: str,
+    values: Sequence[float],
+    metric: str = "irr",
+    engine=None,
+    structure=None
+) -> Dict:
+    """
+    Maps each tested value of ``variable`` to the resulting metric.
 
-    # -----------------------
-    # Revenue Growth
-    # -----------------------
-    growth_values = generate_range(
-        base_case["revenue_growth"], step=1.0, n=2
-    )
+    With an IncrementalEngine the points are run one by one through its
+    layer caches, so only the layers ``variable`` touches are recomputed.
+    ``structure`` (a CapitalStructure) replaces the single-tranche debt.
+    """
 
-    growth_sensitivity = {}
-    for val in growth_values:
-        modified_case = base_case.copy()
-        modified_case["revenue_growth"] = val
+    if engine is not None and structure is None:
+        user_inputs, base_case = as_mapping(user_inputs), as_mapping(base_case)
+        table = {}
+        for val in values:
+            if variable in CASE_FIELDS:
+                result = engine.run(user_inputs, {**base_case, variable: val})
+            else:
+                result = engine.run({**user_inputs, variable: val}, base_case)
+            table[val] = result[metric]
+        return table
 
-        irr = run_lbo_case(user_inputs, modified_case)["irr"]
-        growth_sensitivity[val] = irr
+    outcome = _evaluate(user_inputs, base_case, {variable: np.asarray(values)}, metric, structure=structure)
+    return {val: float(result) for val, result in zip(values, outcome)}
 
-    results["revenue_growth"] = growth_sensitivity
+
+@timed("sensitivity.sensitivity_analysis")
+def sensitivity_analysis(
+    user_inputs: Dict,
+    base_case: Dict,
+    variables: Optional[Dict[str, Dict]] = None,
+    metric: str = "irr",
+    engine=None,
+    structure=None
+) -> Dict:
+    """
+    Runs one-way sensitivity analysis for key assumptions.
+
+    ``variables`` maps each variable (case assumption or deal input) to
+    a range spec accepted by sensitivity_values; it defaults to
+    DEFAULT_SENSITIVITIES. ``engine`` is an optional IncrementalEngine;
+    ``structure`` an optional CapitalStructure.
+    """
+
+    variables = DEFAULT_SENSITIVITIES if variables is None else variables
+
+    results = {}
+    for variable, spec in variables.items():
+        values = sensitivity_values(user_inputs, base_case, variable, spec)
+        results[variable] = one_way_sensitivity(user_inputs, base_case, variable, values, metric, engine, structure)
 
     return results
+
+
+@timed("sensitivity.two_way_sensitivity")
+def two_way_sensitivity(
+    user_inputs: Dict,
+    base_case: Dict,
+    row_variable: str,
+    col_variable: str,
+    row_spec: Optional[Dict] = None,
+    col_spec: Optional[Dict] = None,
+    metric: str = "irr",
+    workers: Optional[int] = None,
+    structure=None
+):
+    """
+    Builds a two-way grid (rows x columns) of the chosen metric.
+
+    Returns a pandas DataFrame indexed by the row values with one column
+    per column value. Set ``workers`` to spread very large grids over
+    the process pool (small grids still run in-process); ``structure``
+    is an optional CapitalStructure.
+    """
+
+    import pandas as pd
+
+    if row_variable == col_variable:
+        raise ValueError("Two-way sensitivity needs two different variables")
+
+    row_values = sensitivity_values(user_inputs, base_case, row_variable, row_spec)
+    col_values = sensitivity_values(user_inputs, base_case, col_variable, col_spec)
+
+    grid = _evaluate(
+        user_inputs,
+        base_case,
+        {
+            row_variable: np.asarray(row_values)[:, None],
+            col_variable: np.asarray(col_values)[None, :],
+        },
+        metric,
+        workers,
+        structure,
+    )
+
+    return pd.DataFrame(
+        grid,
+        index=pd.Index(row_values, name=row_variable),
+        columns=pd.Index(col_values, name=col_variable),
+    )
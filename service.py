@@ -0,0 +1,571 @@
+"""
+
+Local HTTP/JSON service over the LBO pipeline.
+
+Endpoints (POST bodies and responses are JSON unless noted):
+
+    GET  /health        liveness
+    GET  /metrics       request counts, latency percentiles, batch sizes
+    POST /validate      {"inputs": deal}                 -> every rule broken
+    POST /assumptions   {"inputs": deal}                 -> assumption ranges
+    POST /run-cases     {"inputs": deal or [deals], "assumptions"?: {...}}
+    POST /sensitivity   {"inputs": deal, "assumptions"?, "variables"?}
+    POST /export        {"inputs": deal, "assumptions"?} -> .xlsx bytes
+
+Case runs from concurrent requests are coalesced by a MicroBatcher: the
+first queued deal opens a batch, which closes after ``max_wait_ms`` or
+``max_batch`` deals and then runs as one vectorized engine call. The
+queue is bounded; when it is full (or every connection slot is busy)
+the service answers 503 with Retry-After instead of queueing without
+limit. Connections are HTTP/1.1 keep-alive.
+
+Usage:
+    python service.py --port 8000 --provider benchmark --max-wait-ms 2
+
+
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import instrumentation
+from inputs import user_input_errors
+from assumption_cache import AssumptionCache, get_default_cache
+from assumption_generator import validate_assumptions
+from assumption_providers import PROVIDERS, AssumptionProvider, get_provider
+from case_constructor import CASE_ORDER, build_case_batch, build_cases
+from lbo_engine import CASE_FIELDS, USER_INPUT_FIELDS, run_lbo_batch
+from sensitivity_analysis import sensitivity_analysis
+
+
+MAX_BATCH = 512
+MAX_WAIT_MS = 2.0
+MAX_QUEUE = 4096
+MAX_CONNECTIONS = 256
+MAX_BODY_BYTES = 1 << 20
+REQUEST_TIMEOUT_S = 30.0
+KEEPALIVE_TIMEOUT_S = 15.0
+LATENCY_WINDOW = 8192
+
+RESULT_FIELDS = ("entry_equity", "exit_equity", "money_multiple", "irr")
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+OVERLOADED_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"Content-Length: 33\r\n\r\n"
+    b'{"error": "Too many connections"}'
+)
+
+
+class Overloaded(RuntimeError):
+    """
+    Raised when the batch queue is full.
+    """
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ------------------------
+# Metrics
+# ------------------------
+
+def _percentiles(values, points=(50, 90, 99)) -> Dict:
+    if not values:
+        return {}
+    array = np.fromiter(values, dtype=float)
+    summary = {f"p{p}": float(v) for p, v in zip(points, np.percentile(array, points))}
+    summary["max"] = float(array.max())
+    return summary
+
+
+class ServiceMetrics:
+    """
+    Thread-safe counters plus rolling windows (the last LATENCY_WINDOW
+    observations) for request latency and batch size.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.started = time.time()
+        self._window = window
+        self._lock = threading.Lock()
+        self.counters = {}
+        self._latency = {}
+        self._batch_sizes = deque(maxlen=window)
+        self._batch_seconds = deque(maxlen=window)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.counters[f"requests.{route}"] = self.counters.get(f"requests.{route}", 0) + 1
+            self.counters[f"status.{status}"] = self.counters.get(f"status.{status}", 0) + 1
+            window = self._latency.get(route)
+            if window is None:
+                window = self._latency[route] = deque(maxlen=self._window)
+            window.append(seconds * 1000)
+
+    def batch(self, size: int, seconds: float) -> None:
+        with self._lock:
+            self.counters["batches"] = self.counters.get("batches", 0) + 1
+            self.counters["batched_deals"] = self.counters.get("batched_deals", 0) + size
+            self._batch_sizes.append(size)
+            self._batch_seconds.append(seconds * 1000)
+
+    def snapshot(self, queue_depth: int = 0) -> Dict:
+        with self._lock:
+            latency = {route: {"count": len(w), **_percentiles(w)} for route, w in self._latency.items()}
+            sizes = list(self._batch_sizes)
+            batches = {
+                "size": {"mean": float(np.mean(sizes)) if sizes else 0.0, **_percentiles(sizes)},
+                "run_ms": _percentiles(self._batch_seconds),
+            }
+            return {
+                "uptime_s": time.time() - self.started,
+                "queue_depth": queue_depth,
+                "counters": dict(self.counters),
+                "latency_ms": latency,
+                "batches": batches,
+            }
+
+
+# ------------------------
+# Micro-batching
+# ------------------------
+
+class MicroBatcher:
+    """
+    Coalesces single-deal case runs into batched engine calls on one
+    background thread. ``submit`` returns a Future with the three case
+    results; it raises Overloaded instead of blocking when ``max_queue``
+    deals are already waiting.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+        max_queue: int = MAX_QUEUE,
+        metrics: Optional[ServiceMetrics] = None
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.metrics = metrics or ServiceMetrics()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name="lbo-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, user_inputs: Dict, ai_assumptions: Dict) -> Future:
+        if self._stopped:
+            raise RuntimeError("Batcher is closed")
+        future = Future()
+        try:
+            self._queue.put_nowait((user_inputs, build_case_batch(ai_assumptions), future))
+        except queue.Full:
+            self.metrics.count("rejected.queue_full")
+            raise Overloaded("Scenario queue is full; retry shortly")
+        return future
+
+    def close(self) -> None:
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch: List) -> None:
+        started = time.perf_counter()
+        try:
+            results = self._evaluate(batch)
+        except Exception:
+            # One bad deal must not fail its neighbours: retry one by one
+            for item in batch:
+                try:
+                    item[2].set_result(self._evaluate([item])[0])
+                except Exception as e:
+                    item[2].set_exception(e)
+        else:
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+        self.metrics.batch(len(batch), time.perf_counter() - started)
+
+    @staticmethod
+    def _evaluate(batch: List) -> List[Dict]:
+        # (deals, 1) inputs against (deals, 3) cases: one engine call
+        inputs = {
+            field: np.array([float(deal[field]) for deal, _, _ in batch])[:, None] for field in USER_INPUT_FIELDS
+        }
+        cases = {field: np.stack([getattr(cases, field) for _, cases, _ in batch]) for field in CASE_FIELDS}
+        with instrumentation.stage("service.batch"):
+            results = run_lbo_batch(inputs, cases)
+        return [
+            {
+                name: {field: float(results[field][row, col]) for field in RESULT_FIELDS}
+                for col, name in enumerate(CASE_ORDER)
+            }
+            for row in range(len(batch))
+        ]
+
+
+# ------------------------
+# Endpoints
+# ------------------------
+
+class LBOService:
+    """
+    Endpoint logic, independent of the HTTP layer. Each handler takes
+    the decoded JSON body and returns (status, body, content type).
+    """
+
+    def __init__(
+        self,
+        provider: AssumptionProvider,
+        batcher: Optional[MicroBatcher] = None,
+        metrics: Optional[ServiceMetrics] = None,
+        request_timeout: float = REQUEST_TIMEOUT_S
+    ):
+        self.metrics = metrics or ServiceMetrics()
+        self.provider = provider
+        self.batcher = batcher or MicroBatcher(metrics=self.metrics)
+        self.request_timeout = request_timeout
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics_report,
+            ("POST", "/validate"): self.validate,
+            ("POST", "/assumptions"): self.assumptions,
+            ("POST", "/run-cases"): self.run_cases,
+            ("POST", "/sensitivity"): self.sensitivity,
+            ("POST", "/export"): self.export,
+        }
+
+    def close(self) -> None:
+        self.batcher.close()
+
+    # ------------------------
+    # Helpers
+    # ------------------------
+    @staticmethod
+    def _deal(payload: Dict) -> Dict:
+        deal = payload.get("inputs")
+        if not isinstance(deal, dict):
+            raise HTTPError(400, "Body needs an 'inputs' object")
+        errors = user_input_errors(deal)
+        if errors:
+            raise HTTPError(400, errors)
+        return deal
+
+    def _assumptions(self, payload: Dict, deal: Dict) -> Dict:
+        if payload.get("assumptions") is not None:
+            validate_assumptions(payload["assumptions"])
+            return payload["assumptions"]
+        try:
+            return self.provider.get(deal)
+        except LookupError as e:
+            raise HTTPError(422, str(e))
+
+    def _cases(self, deals: List[Dict], assumptions: List[Dict]) -> List[Dict]:
+        futures = [self.batcher.submit(deal, ai) for deal, ai in zip(deals, assumptions)]
+        deadline = time.perf_counter() + self.request_timeout
+        try:
+            return [future.result(timeout=max(0.0, deadline - time.perf_counter())) for future in futures]
+        except FutureTimeout:
+            raise HTTPError(504, "Timed out waiting for the engine")
+
+    # ------------------------
+    # Handlers
+    # ------------------------
+    def health(self, payload: Dict) -> Tuple:
+        return 200, {"status": "ok"}, None
+
+    def metrics_report(self, payload: Dict) -> Tuple:
+        report = self.metrics.snapshot(self.batcher.depth)
+        if instrumentation.PROFILER.enabled:
+            report["profile"] = instrumentation.PROFILER.report()
+        return 200, report, None
+
+    def validate(self, payload: Dict) -> Tuple:
+        deal = payload.get("inputs")
+        if not isinstance(deal, dict):
+            raise HTTPError(400, "Body needs an 'inputs' object")
+        errors = user_input_errors(deal)
+        return 200, {"valid": not errors, "errors": errors}, None
+
+    def assumptions(self, payload: Dict) -> Tuple:
+        deal = payload.get("inputs")
+        if not isinstance(deal, dict):
+            raise HTTPError(400, "Body needs an 'inputs' object")
+        return 200, {"assumptions": self._assumptions({}, deal)}, None
+
+    def run_cases(self, payload: Dict) -> Tuple:
+        if isinstance(payload.get("inputs"), list):
+            deals = payload["inputs"]
+            errors = {
+                i: user_input_errors(deal) if isinstance(deal, dict) else ["Deal must be an object"]
+                for i, deal in enumerate(deals)
+            }
+            errors = {i: e for i, e in errors.items() if e}
+            if errors:
+                raise HTTPError(400, errors)
+            # Could never fit in the queue, so retrying (503) would not help
+            if len(deals) > self.batcher.max_queue:
+                raise HTTPError(413, f"At most {self.batcher.max_queue} deals per request")
+            if payload.get("assumptions") is not None:
+                validate_assumptions(payload["assumptions"])
+                assumptions = [payload["assumptions"]] * len(deals)
+            else:
+                assumptions = self.provider.get_many(deals)
+                failed = {i: str(a) for i, a in enumerate(assumptions) if isinstance(a, Exception)}
+                if failed:
+                    raise HTTPError(422, failed)
+            results = self._cases(deals, assumptions)
+            return 200, {"results": [{"cases": r, "assumptions": a} for r, a in zip(results, assumptions)]}, None
+
+        deal = self._deal(payload)
+        ai_assumptions = self._assumptions(payload, deal)
+        return 200, {"cases": self._cases([deal], [ai_assumptions])[0], "assumptions": ai_assumptions}, None
+
+    def sensitivity(self, payload: Dict) -> Tuple:
+        deal = self._deal(payload)
+        variables = payload.get("variables")
+        if variables is not None and not (
+            isinstance(variables, dict) and all(spec is None or isinstance(spec, dict) for spec in variables.values())
+        ):
+            raise HTTPError(400, "'variables' must map each variable to a range object (or null)")
+        metric = payload.get("metric", "irr")
+        if metric not in RESULT_FIELDS:
+            raise HTTPError(400, f"'metric' must be one of {', '.join(RESULT_FIELDS)}")
+        base_case = build_cases(self._assumptions(payload, deal))["base"]
+        tables = sensitivity_analysis(deal, base_case, variables, metric)
+        return 200, {var: {str(k): v for k, v in table.items()} for var, table in tables.items()}, None
+
+    def export(self, payload: Dict) -> Tuple:
+        from exporter import convert_to_excel
+
+        deal = self._deal(payload)
+        ai_assumptions = self._assumptions(payload, deal)
+        results = self._cases([deal], [ai_assumptions])[0]
+        sensitivities = sensitivity_analysis(deal, build_cases(ai_assumptions)["base"])
+        return 200, convert_to_excel(deal, ai_assumptions, results, sensitivities), XLSX_TYPE
+
+
+# ------------------------
+# HTTP layer
+# ------------------------
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT_S
+    server_version = "LBOService/1.0"
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        started = time.perf_counter()
+        service = self.server.service
+        path = self.path.split("?", 1)[0]
+        handler = service.routes.get((method, path))
+        headers = {}
+        try:
+            # Read the body even for unknown routes so keep-alive stays in sync
+            raw = self._read_body() if method == "POST" else b"{}"
+            if handler is None:
+                known = any(route == path for _, route in service.routes)
+                raise HTTPError(405 if known else 404, f"No route for {method} {path}")
+            status, body, content_type = handler(self._parse_json(raw))
+        except HTTPError as e:
+            status, body, content_type = e.status, {"error": e.message}, None
+        except Overloaded as e:
+            status, body, content_type = 503, {"error": str(e)}, None
+            headers["Retry-After"] = "1"
+        except ValueError as e:
+            status, body, content_type = 400, {"error": str(e)}, None
+        except Exception as e:
+            status, body, content_type = 500, {"error": f"{type(e).__name__}: {e}"}, None
+        self._send(status, body, content_type, headers)
+        service.metrics.observe(path if handler is not None else "unmatched", status, time.perf_counter() - started)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            raise HTTPError(413, f"Body over {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length) if length else b"{}"
+
+    @staticmethod
+    def _parse_json(raw: bytes) -> Dict:
+        try:
+            payload = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return payload
+
+    def _send(self, status: int, body, content_type: Optional[str], headers: Dict) -> None:
+        if content_type is None:
+            data, content_type = json.dumps(body).encode(), "application/json"
+        else:
+            data = body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class LBOServer(ThreadingHTTPServer):
+    """
+    Thread-per-connection server with a cap on open connections; extra
+    connections get an immediate 503 rather than a thread.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, service: LBOService, max_connections: int = MAX_CONNECTIONS, verbose: bool = False):
+        super().__init__(address, RequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address) -> None:
+        if not self._slots.acquire(blocking=False):
+            self.service.metrics.count("rejected.connections")
+            try:
+                request.sendall(OVERLOADED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address) -> None:
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    provider: Optional[AssumptionProvider] = None,
+    max_batch: int = MAX_BATCH,
+    max_wait_ms: float = MAX_WAIT_MS,
+    max_queue: int = MAX_QUEUE,
+    max_connections: int = MAX_CONNECTIONS,
+    verbose: bool = False
+) -> LBOServer:
+    """
+    Builds (but does not start) a server; call ``serve_forever`` and,
+    when done, ``shutdown``, ``server_close`` and ``service.close``.
+    Port 0 picks a free port (see ``server_address``).
+    """
+
+    metrics = ServiceMetrics()
+    batcher = MicroBatcher(max_batch, max_wait_ms, max_queue, metrics)
+    service = LBOService(provider or get_provider("llm"), batcher, metrics)
+    return LBOServer((host, port), service, max_connections, verbose)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the LBO pipeline over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument(
+        "--provider",
+        choices=PROVIDERS,
+        default="llm",
+        help="Assumption source when a request carries no assumptions.",
+    )
+    parser.add_argument("--offline", action="store_true", help="Only use cached assumptions; never call the LLM.")
+    parser.add_argument("--cache", help="Assumption cache path (defaults to the shared cache).")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most deals per engine call.")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Longest a deal waits for its batch to fill.")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Queued deals before requests get 503.")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS, help="Open connections before new ones get 503.")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage timings (shown in /metrics).")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        instrumentation.enable()
+
+    cache = AssumptionCache(args.cache) if args.cache else get_default_cache()
+    provider = get_provider(args.provider, cache=cache, offline=args.offline)
+    server = make_server(
+        args.host, args.port, provider,
+        args.max_batch, args.max_wait_ms, args.max_queue, args.max_connections, args.verbose,
+    )
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+
+
+if __name__ == "__main__":
+    main()
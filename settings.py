@@ -0,0 +1,37 @@
+"""
+
+Environment settings, read lazily.
+
+The .env file is loaded on the first lookup rather than at import time,
+so importing a module never pays for python-dotenv or a filesystem scan.
+Variables already set in the process environment take precedence.
+
+
+"""
+
+import os
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_environment() -> None:
+    """
+    Loads .env once per process.
+    """
+
+    global _loaded
+
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
+
+
+def get(name: str, default: str = "") -> str:
+    load_environment()
+    return os.environ.get(name, default)
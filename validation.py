@@ -0,0 +1,362 @@
+"""
+
+Compiled validation for deal inputs and assumption ranges.
+
+Rules are declared once and compiled into checks that run two ways:
+
+    record  - one dict; the caller raises on the first broken rule or
+              collects them all
+    batch   - a list of dicts, a dict of columns or a DataFrame; each
+              rule is one vectorized pass and the result is a per-row
+              failure mask instead of an exception on the first bad row
+
+``compile_schema`` turns the JSON schema used for Gemini's structured
+output into the equivalent nested checks, so AI answers are held to the
+same shape the model was asked for.
+
+
+"""
+
+import math
+from collections.abc import Mapping
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+NUMBER_TYPES = (int, float, np.integer, np.floating)
+CASES = ("downside", "base", "upside")
+
+_MISSING = object()
+
+
+# ------------------------
+# Batch columns
+# ------------------------
+
+class Columns:
+    """
+    Column access over a batch of records, a mapping of arrays or a
+    DataFrame, with numeric conversions computed once per field.
+    """
+
+    def __init__(self, data):
+        self._columns = {}
+        self._numbers = {}
+        if hasattr(data, "columns") and hasattr(data, "to_numpy"):
+            self.size = len(data)
+            self._get = lambda field: data[field].to_numpy() if field in data.columns else None
+        elif isinstance(data, Mapping):
+            arrays = {name: np.asarray(column) for name, column in data.items()}
+            self.size = len(next(iter(arrays.values()))) if arrays else 0
+            self._get = arrays.get
+        else:
+            records = list(data)
+            self.size = len(records)
+
+            def get(field):
+                column = np.empty(len(records), dtype=object)
+                column[:] = [record.get(field, _MISSING) for record in records]
+                return column
+
+            self._get = get
+
+    def values(self, field: str) -> Optional[np.ndarray]:
+        if field not in self._columns:
+            self._columns[field] = self._get(field)
+        return self._columns[field]
+
+    def missing(self, field: str) -> np.ndarray:
+        column = self.values(field)
+        if column is None:
+            return np.ones(self.size, dtype=bool)
+        if column.dtype == object:
+            return column == _MISSING
+        return np.zeros(self.size, dtype=bool)
+
+    def numbers(self, field: str):
+        """
+        (float values, is-number mask); non-numbers read as NaN. Bools
+        count as numbers, as in the record checks.
+        """
+
+        if field not in self._numbers:
+            column = self.values(field)
+            if column is None:
+                values, is_number = np.full(self.size, np.nan), np.zeros(self.size, dtype=bool)
+            elif column.dtype.kind in "biuf":
+                values, is_number = column.astype(float), np.ones(self.size, dtype=bool)
+            elif column.dtype == object and set(map(type, column)) <= {int, float, bool}:
+                values, is_number = column.astype(float), np.ones(self.size, dtype=bool)
+            else:
+                is_number = np.fromiter((isinstance(v, NUMBER_TYPES) for v in column), dtype=bool, count=len(column))
+                values = np.full(self.size, np.nan)
+                values[is_number] = column[is_number].astype(float)
+            self._numbers[field] = (values, is_number)
+        return self._numbers[field]
+
+    def text(self, field: str) -> np.ndarray:
+        """
+        True where the field is a non-blank string.
+        """
+
+        column = self.values(field)
+        if column is None:
+            return np.zeros(self.size, dtype=bool)
+        if column.dtype.kind == "U":
+            return np.char.strip(column) != ""
+        return np.fromiter((isinstance(v, str) and bool(v.strip()) for v in column), dtype=bool, count=len(column))
+
+
+# ------------------------
+# Rules
+# ------------------------
+
+class Check(NamedTuple):
+    """
+    One compiled rule. ``record(values)`` and ``batch(columns)`` are
+    True where the rule is broken.
+    """
+
+    message: str
+    record: Callable[[Mapping], bool]
+    batch: Callable[[Columns], np.ndarray]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, NUMBER_TYPES)
+
+
+def non_negative_number(field: str) -> List[Check]:
+    """
+    Required, numeric, finite and >= 0.
+    """
+
+    return [
+        Check(f"Missing input: {field}", lambda r: field not in r, lambda c: c.missing(field)),
+        Check(
+            f"{field} must be a number",
+            lambda r: field in r and not _is_number(r[field]),
+            lambda c: ~c.numbers(field)[1] & ~c.missing(field),
+        ),
+        Check(
+            f"{field} must be finite",
+            lambda r: _is_number(r.get(field)) and not math.isfinite(r[field]),
+            lambda c: c.numbers(field)[1] & ~np.isfinite(c.numbers(field)[0]),
+        ),
+        Check(
+            f"{field} cannot be negative",
+            lambda r: _is_number(r.get(field)) and r[field] < 0,
+            lambda c: c.numbers(field)[0] < 0,
+        ),
+    ]
+
+
+def between(
+    field: str,
+    low: Optional[float],
+    high: Optional[float],
+    message: str,
+    inclusive: bool = False
+) -> List[Check]:
+    """
+    ``low < value < high`` (``<=`` with ``inclusive``); either bound may
+    be None. Only numeric values are judged here.
+    """
+
+    low = -math.inf if low is None else low
+    high = math.inf if high is None else high
+
+    def inside(x):
+        return (low <= x) & (x <= high) if inclusive else (low < x) & (x < high)
+
+    return [
+        Check(
+            message,
+            lambda r: _is_number(r.get(field)) and not inside(r[field]),
+            lambda c: c.numbers(field)[1] & ~inside(c.numbers(field)[0]),
+        )
+    ]
+
+
+def whole_number(field: str, message: str) -> List[Check]:
+    return [
+        Check(
+            message,
+            lambda r: _is_number(r.get(field)) and math.isfinite(r[field]) and not float(r[field]).is_integer(),
+            lambda c: np.isfinite(c.numbers(field)[0]) & (np.mod(c.numbers(field)[0], 1) != 0),
+        )
+    ]
+
+
+def required_text(field: str, message: str) -> List[Check]:
+    return [
+        Check(
+            message,
+            lambda r: not (isinstance(r.get(field), str) and r[field].strip()),
+            lambda c: ~c.text(field),
+        )
+    ]
+
+
+def compile_rules(*rules: Sequence[Check]) -> List[Check]:
+    """
+    Flattens rule groups into one ordered list of checks.
+    """
+
+    return [check for group in rules for check in group]
+
+
+class BatchValidation(NamedTuple):
+    """
+    Result of a batch check: ``valid`` per row and, per broken rule (in
+    rule order), the mask of rows that break it.
+    """
+
+    valid: np.ndarray
+    failures: Dict[str, np.ndarray]
+
+    def errors(self, row: int) -> List[str]:
+        return [message for message, mask in self.failures.items() if mask[row]]
+
+    def first_errors(self) -> List[Optional[str]]:
+        """
+        The first broken rule per row (None if valid), i.e. the message
+        a record check would raise.
+        """
+
+        first = np.full(len(self.valid), None, dtype=object)
+        for message, mask in self.failures.items():
+            first[mask & (first == None)] = message  # noqa: E711 (elementwise)
+        return first.tolist()
+
+
+def record_errors(checks: List[Check], record: Mapping) -> List[str]:
+    return [check.message for check in checks if check.record(record)]
+
+
+def batch_errors(checks: List[Check], data) -> BatchValidation:
+    columns = data if isinstance(data, Columns) else Columns(data)
+    valid = np.ones(columns.size, dtype=bool)
+    failures = {}
+    # Comparisons against NaN (non-numbers) are expected to be False
+    with np.errstate(invalid="ignore"):
+        for check in checks:
+            mask = np.asarray(check.batch(columns), dtype=bool)
+            if mask.any():
+                failures[check.message] = failures.get(check.message, False) | mask
+                valid &= ~mask
+    return BatchValidation(valid, failures)
+
+
+# ------------------------
+# JSON schema
+# ------------------------
+
+def compile_schema(schema: Dict, path: str = "value") -> Callable[[object], List[str]]:
+    """
+    Compiles the JSON-schema subset used for structured output (object,
+    array, number, string; properties, required, items, min/maxItems,
+    enum) into a function returning every violation.
+    """
+
+    kind = schema.get("type")
+
+    if kind == "object":
+        properties = {
+            name: compile_schema(sub, f"{path}.{name}") for name, sub in schema.get("properties", {}).items()
+        }
+        required = tuple(schema.get("required", ()))
+
+        def check(value):
+            if not isinstance(value, Mapping):
+                return [f"{path} must be an object"]
+            errors = [f"Missing key in {path}: {name}" for name in required if name not in value]
+            for name, sub in properties.items():
+                if name in value:
+                    errors.extend(sub(value[name]))
+            return errors
+
+        return check
+
+    if kind == "array":
+        items = compile_schema(schema["items"], f"{path}[]") if "items" in schema else None
+        min_items = schema.get("minItems", 0)
+        max_items = schema.get("maxItems")
+
+        def check(value):
+            if not isinstance(value, (list, tuple)):
+                return [f"{path} must be an array"]
+            if len(value) < min_items or (max_items is not None and len(value) > max_items):
+                return [f"{path} must have {min_items}{'' if max_items == min_items else '+'} items"]
+            errors = []
+            if items is not None:
+                for item in value:
+                    errors.extend(items(item))
+            return errors
+
+        return check
+
+    if kind == "number":
+        def check(value):
+            if isinstance(value, bool) or not isinstance(value, NUMBER_TYPES) or not math.isfinite(value):
+                return [f"{path} must be a finite number"]
+            return []
+
+        return check
+
+    if kind == "string":
+        enum = tuple(schema.get("enum", ()))
+
+        def check(value):
+            if not isinstance(value, str):
+                return [f"{path} must be a string"]
+            if enum and value not in enum:
+                return [f"{path} must be one of {', '.join(enum)}"]
+            return []
+
+        return check
+
+    return lambda value: []
+
+
+def _is_pair(schema: Dict) -> bool:
+    return schema.get("type") == "array" and schema.get("minItems") == schema.get("maxItems") == 2
+
+
+def compile_assumption_schema(
+    schema: Dict,
+    signed_fields: Sequence[str] = ("margin_change_bps",),
+    path: str = "assumptions"
+) -> Callable[[Mapping], List[str]]:
+    """
+    compile_schema plus the conventions the schema states in prose:
+    every [low, high] range is ordered, and ``signed_fields`` run
+    downside <= base <= upside with downside <= 0 <= upside.
+    """
+
+    structure = compile_schema(schema, path)
+    ranges = [
+        (name, case)
+        for name, sub in schema["properties"].items()
+        for case, case_schema in sub.get("properties", {}).items()
+        if _is_pair(case_schema)
+    ]
+
+    def check(value):
+        errors = structure(value)
+        if errors:
+            return errors
+        for name, case in ranges:
+            low, high = value[name][case]
+            if low > high:
+                errors.append(f"{path}.{name}.{case} must be [low, high] with low <= high")
+        for name in signed_fields:
+            downside, base, upside = (value[name][case] for case in CASES)
+            if not downside <= base <= upside:
+                errors.append(f"{path}.{name} must satisfy downside <= base <= upside")
+            if downside > 0 or upside < 0:
+                errors.append(f"{path}.{name} downside must be <= 0 and upside >= 0")
+        return errors
+
+    return check